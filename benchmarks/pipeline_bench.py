@@ -0,0 +1,269 @@
+"""
+Times the stages of the notifier pipeline on synthetic competitions.
+
+    python benchmarks/pipeline_bench.py --sizes 1000 10000 --output new.json
+    python benchmarks/pipeline_bench.py --compare baseline.json new.json
+
+Results are written as JSON, so runs before and after a change can be compared.
+"""
+
+import argparse
+import json
+import logging
+import platform
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from io import StringIO
+from pathlib import Path
+from typing import Any, Callable
+
+from cube_comp import (
+    Competition,
+    CompetitionAPI,
+    CompetitionNotifier,
+    CompetitionNotifierOptions,
+    EmailService,
+    KnownCompetitions,
+)
+from cube_comp.competition_notifier import BaseCompetitionNotifierInvocation
+
+DEFAULT_SIZES = [1_000, 10_000]
+DEFAULT_REPEAT = 3
+# Slowdown, as a fraction, that --compare reports as a regression
+DEFAULT_THRESHOLD = 0.1
+
+CITIES = ["Chicago, IL", "Seattle, WA", "Boston, MA", "Austin, TX", "Denver, CO"]
+VENUES = ["Convention Center", "High School Gym", "Public Library", "Community Hall"]
+
+
+def synthetic_competitions(count: int, seed: int = 0) -> list[dict[str, Any]]:
+    "Returns `count` competitions, as returned by the WCA API"
+    rng = random.Random(seed)
+    first_date = date(2024, 1, 1)
+    competitions = []
+    for i in range(count):
+        id = f"SyntheticOpen{i:07d}"
+        start_date = first_date + timedelta(days=rng.randrange(3 * 365))
+        # Build new strings, as JSON decoding would, so interning is measured
+        city = "".join(rng.choice(CITIES))
+        venue = "".join(rng.choice(VENUES))
+        competitions.append(
+            {
+                "id": id,
+                "name": f"Synthetic Open {i}",
+                "short_name": f"Synthetic {i}",
+                "short_display_name": f"Synthetic {i}",
+                "start_date": start_date.isoformat(),
+                "results_posted_at": None,
+                "city": city,
+                "venue": venue,
+                "website": f"https://example.com/{id}/",
+            }
+        )
+    return competitions
+
+
+class SyntheticCompetitionAPI(CompetitionAPI):
+    def __init__(self, competitions: list[dict[str, Any]]) -> None:
+        self.competitions = competitions
+
+    def fetch_competitions(
+        self,
+        query: str | None,
+        country: str | None,
+        sort_desc=False,
+        announced_after: str | None = None,
+    ) -> list[dict[str, Any]]:
+        return self.competitions
+
+
+class NullEmailService(EmailService):
+    def __init__(self) -> None:
+        self.sent_content_length = 0
+
+    def configure_smtp(
+        self,
+        smtp_host: str,
+        smtp_port: int,
+        smtp_user: str | None = None,
+        smtp_password: str | None = None,
+    ) -> None:
+        pass
+
+    def send_email(
+        self, to_address: str, from_address: str, subject: str, content: str
+    ) -> None:
+        self.sent_content_length += len(content)
+
+
+def known_history(dicts: list[dict[str, Any]]) -> str:
+    # Half of the competitions, plus as many that are no longer listed
+    known_ids = [dict["id"] for dict in dicts[::2]]
+    known_ids += [f"PastOpen{i:07d}" for i in range(len(known_ids))]
+    return json.dumps(known_ids)
+
+
+# Each benchmark takes the synthetic API results, does its setup, and returns
+# the function to time.
+def bench_from_dict(dicts: list[dict[str, Any]]) -> Callable[[], Any]:
+    return lambda: [Competition.from_dict(dict) for dict in dicts]
+
+
+def bench_from_dicts(dicts: list[dict[str, Any]]) -> Callable[[], Any]:
+    return lambda: Competition.from_dicts(dicts)
+
+
+def bench_filter_competitions(dicts: list[dict[str, Any]]) -> Callable[[], Any]:
+    competitions = Competition.from_dicts(dicts)
+    history = known_history(dicts)
+
+    def run() -> Any:
+        known_comps = KnownCompetitions(StringIO(history))
+        return known_comps.filter_competitions(competitions)
+
+    return run
+
+
+def bench_render_competitions(dicts: list[dict[str, Any]]) -> Callable[[], Any]:
+    competitions = Competition.from_dicts(dicts)
+    invocation = BaseCompetitionNotifierInvocation(
+        CompetitionNotifierOptions(stdout_io=StringIO())
+    )
+    # Compile the template outside of the timed runs
+    invocation.render_competitions(competitions[:1])
+    return lambda: invocation.render_competitions(competitions)
+
+
+def bench_notify(dicts: list[dict[str, Any]]) -> Callable[[], Any]:
+    history = known_history(dicts)
+    notifier = CompetitionNotifier(SyntheticCompetitionAPI(dicts), NullEmailService())
+
+    def run() -> Any:
+        options = CompetitionNotifierOptions(
+            stdout_io=StringIO(),
+            known_competitions_io=StringIO(history),
+            email_to="bench@example.com",
+        )
+        notifier.notify(options)
+
+    return run
+
+
+BENCHMARKS: dict[str, Callable[[list[dict[str, Any]]], Callable[[], Any]]] = {
+    "from_dict": bench_from_dict,
+    "from_dicts": bench_from_dicts,
+    "filter_competitions": bench_filter_competitions,
+    "render_competitions": bench_render_competitions,
+    "notify": bench_notify,
+}
+
+
+def time_best(function: Callable[[], Any], repeat: int) -> float:
+    "Returns the fastest of `repeat` runs, in seconds"
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmarks(
+    names: list[str], sizes: list[int], repeat: int
+) -> dict[str, dict[str, float]]:
+    results: dict[str, dict[str, float]] = {name: {} for name in names}
+    for size in sizes:
+        dicts = synthetic_competitions(size)
+        for name in names:
+            seconds = time_best(BENCHMARKS[name](dicts), repeat)
+            results[name][str(size)] = seconds
+            print(f"{name:<20} {size:>9} {seconds * 1000:>12.2f} ms", file=sys.stderr)
+    return results
+
+
+def compare(baseline: dict[str, Any], current: dict[str, Any], threshold: float) -> int:
+    "Prints the change of each result, and returns the number of regressions"
+    regressions = 0
+    for name, sizes in current["results"].items():
+        for size, seconds in sizes.items():
+            base_seconds = baseline["results"].get(name, {}).get(size)
+            if base_seconds is None:
+                continue
+            ratio = seconds / base_seconds
+            marker = ""
+            if ratio > 1.0 + threshold:
+                marker = "  REGRESSION"
+                regressions += 1
+            print(f"{name:<20} {size:>9} {ratio:>8.2f}x{marker}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help="Numbers of competitions (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--benchmark",
+        choices=list(BENCHMARKS),
+        action="append",
+        help="Run only this benchmark (may be repeated)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=DEFAULT_REPEAT,
+        help="Keep the best of N runs (default: %(default)s)",
+        metavar="N",
+    )
+    parser.add_argument(
+        "--output", type=Path, help="Write results as JSON to FILE", metavar="FILE"
+    )
+    parser.add_argument(
+        "--compare",
+        type=Path,
+        nargs=2,
+        help="Compare two results files instead of running benchmarks",
+        metavar=("BASELINE", "CURRENT"),
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Report slowdowns over FRACTION as regressions (default: %(default)s)",
+        metavar="FRACTION",
+    )
+    args = parser.parse_args()
+
+    if args.compare is not None:
+        baseline_path, current_path = args.compare
+        baseline = json.loads(baseline_path.read_text())
+        current = json.loads(current_path.read_text())
+        return 1 if compare(baseline, current, args.threshold) > 0 else 0
+
+    # Per-competition log messages would dominate the timings
+    logging.basicConfig(level=logging.WARNING)
+    names = args.benchmark if args.benchmark is not None else list(BENCHMARKS)
+    results = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": run_benchmarks(names, args.sizes, args.repeat),
+    }
+    output = json.dumps(results, indent=2)
+    if args.output is not None:
+        args.output.write_text(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
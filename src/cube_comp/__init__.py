@@ -1,5 +1,116 @@
-from .competition import Competition
-from .competition_api import CompetitionAPI, WCACompetitionAPI
-from .competition_notifier import CompetitionNotifier, CompetitionNotifierOptions
-from .email_service import EmailService, SMTPEmailService
-from .known_competitions import KnownCompetitions
+import importlib
+from typing import TYPE_CHECKING, Any
+
+# The public names are imported from their modules on first use, so that
+# importing the package, for example to run the command line, does not also
+# import requests, jinja2, smtplib and asyncio before they are needed.
+_EXPORTS = {
+    "AsyncCompetitionAPI": ".async_competition_api",
+    "AsyncCompetitionAPIAdapter": ".async_competition_api",
+    "AsyncWCACompetitionAPI": ".async_competition_api",
+    "AsyncEmailService": ".async_email_service",
+    "AsyncEmailServiceAdapter": ".async_email_service",
+    "AsyncSMTPEmailService": ".async_email_service",
+    "BloomFilter": ".bloom_filter",
+    "Competition": ".competition",
+    "CompetitionAPI": ".competition_api",
+    "CompetitionAPIOptions": ".competition_api",
+    "WCACompetitionAPI": ".competition_api",
+    "CompetitionNotifier": ".competition_notifier",
+    "CompetitionNotifierOptions": ".competition_notifier",
+    "CompetitionWatcher": ".competition_watcher",
+    "EmailService": ".email_service",
+    "OutgoingEmail": ".email_service",
+    "SMTPEmailService": ".email_service",
+    "SMTPSession": ".email_service",
+    "EmailSpool": ".email_spool",
+    "SpoolingEmailService": ".email_spool",
+    "SpoolSender": ".email_spool",
+    "FetchCursor": ".fetch_cursor",
+    "FileLock": ".file_lock",
+    "GeoGridIndex": ".geo_index",
+    "CompetitionChanges": ".known_competitions",
+    "KnownCompetitions": ".known_competitions",
+    "KnownCompetitionsFile": ".known_competitions",
+    "KnownCompetitionsStore": ".known_competitions",
+    "open_known_competitions": ".known_competitions_factory",
+    "KnownCompetitionsLog": ".known_competitions_log",
+    "Instrumentation": ".metrics",
+    "MetricsRecorder": ".metrics",
+    "NullInstrumentation": ".metrics",
+    "CompetitionWriter": ".output_writers",
+    "CSVCompetitionWriter": ".output_writers",
+    "ICalendarCompetitionWriter": ".output_writers",
+    "NDJSONCompetitionWriter": ".output_writers",
+    "competition_writer": ".output_writers",
+    "ResponseCache": ".response_cache",
+    "CompetitionSearchIndex": ".search_index",
+    "LocalSearchCompetitionAPI": ".search_index",
+    "SnapshotCompetitionAPI": ".snapshot_competition_api",
+    "SQLiteKnownCompetitions": ".sqlite_known_competitions",
+    "Subscription": ".subscriptions",
+    "load_subscriptions": ".subscriptions",
+}
+
+__all__ = list(_EXPORTS)
+
+if TYPE_CHECKING:
+    from .async_competition_api import (
+        AsyncCompetitionAPI,
+        AsyncCompetitionAPIAdapter,
+        AsyncWCACompetitionAPI,
+    )
+    from .async_email_service import (
+        AsyncEmailService,
+        AsyncEmailServiceAdapter,
+        AsyncSMTPEmailService,
+    )
+    from .bloom_filter import BloomFilter
+    from .competition import Competition
+    from .competition_api import (
+        CompetitionAPI,
+        CompetitionAPIOptions,
+        WCACompetitionAPI,
+    )
+    from .competition_notifier import CompetitionNotifier, CompetitionNotifierOptions
+    from .competition_watcher import CompetitionWatcher
+    from .email_service import (
+        EmailService,
+        OutgoingEmail,
+        SMTPEmailService,
+        SMTPSession,
+    )
+    from .email_spool import EmailSpool, SpoolingEmailService, SpoolSender
+    from .fetch_cursor import FetchCursor
+    from .file_lock import FileLock
+    from .geo_index import GeoGridIndex
+    from .known_competitions import (
+        CompetitionChanges,
+        KnownCompetitions,
+        KnownCompetitionsFile,
+        KnownCompetitionsStore,
+    )
+    from .known_competitions_factory import open_known_competitions
+    from .known_competitions_log import KnownCompetitionsLog
+    from .metrics import Instrumentation, MetricsRecorder, NullInstrumentation
+    from .output_writers import (
+        CompetitionWriter,
+        CSVCompetitionWriter,
+        ICalendarCompetitionWriter,
+        NDJSONCompetitionWriter,
+        competition_writer,
+    )
+    from .response_cache import ResponseCache
+    from .search_index import CompetitionSearchIndex, LocalSearchCompetitionAPI
+    from .snapshot_competition_api import SnapshotCompetitionAPI
+    from .sqlite_known_competitions import SQLiteKnownCompetitions
+    from .subscriptions import Subscription, load_subscriptions
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,212 @@
+import asyncio
+import json
+import math
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Any, Callable, TypeVar
+
+from typing_extensions import Protocol
+
+from .competition_api import (
+    CompetitionAPI,
+    CompetitionAPIOptions,
+    WCACompetitionEndpoint,
+    _Page,
+    announced_after_args,
+)
+
+if TYPE_CHECKING:
+    import aiohttp
+
+_T = TypeVar("_T")
+
+
+class AsyncCompetitionAPI(Protocol):
+    async def fetch_competitions(
+        self,
+        query: str | None,
+        country: str | None,
+        sort_desc=False,
+        announced_after: str | None = None,
+    ) -> list[dict[str, Any]]:
+        "Fetches competitions with optional parameters"
+        ...
+
+
+# Runs a blocking CompetitionAPI on the default executor, so existing
+# implementations can be used with the asyncio pipeline.
+class AsyncCompetitionAPIAdapter(AsyncCompetitionAPI):
+    def __init__(self, competition_api: CompetitionAPI) -> None:
+        self.competition_api = competition_api
+
+    async def fetch_competitions(
+        self,
+        query: str | None,
+        country: str | None,
+        sort_desc=False,
+        announced_after: str | None = None,
+    ) -> list[dict[str, Any]]:
+        return await asyncio.to_thread(
+            self.competition_api.fetch_competitions,
+            query,
+            country,
+            sort_desc,
+            **announced_after_args(announced_after),
+        )
+
+
+# An asyncio version of WCACompetitionAPI built on aiohttp, which is an
+# optional dependency (`pip install cube-comp[async]`). Pages are fetched
+# concurrently, bounded by `max_workers`, over one keep-alive connection pool.
+class AsyncWCACompetitionAPI(WCACompetitionEndpoint, AsyncCompetitionAPI):
+    def __init__(
+        self,
+        options: CompetitionAPIOptions | None = None,
+        session: "aiohttp.ClientSession | None" = None,
+    ) -> None:
+        super().__init__(options)
+        self._session = session
+        self._owns_session = session is None
+
+    async def _get_session(self) -> "aiohttp.ClientSession":
+        if self._session is None:
+            import aiohttp
+
+            connector = aiohttp.TCPConnector(
+                limit=max(self.opts.pool_size, self.opts.max_workers)
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.opts.timeout),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and self._owns_session:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self) -> "AsyncWCACompetitionAPI":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def fetch_competitions(
+        self,
+        query: str | None,
+        country: str | None,
+        sort_desc=False,
+        announced_after: str | None = None,
+    ) -> list[dict[str, Any]]:
+        payload = self._payload(query, country, announced_after)
+        first_page = await self._fetch_page(payload, 1)
+        json_competitions = list(first_page.competitions)
+
+        page_count = self._page_count(first_page)
+        if page_count is not None:
+            semaphore = asyncio.Semaphore(self.opts.max_workers)
+
+            async def fetch_page(page_number: int) -> _Page:
+                async with semaphore:
+                    return await self._fetch_page(payload, page_number)
+
+            pages = await asyncio.gather(
+                *(fetch_page(page_number) for page_number in range(2, page_count + 1))
+            )
+            for page in pages:
+                json_competitions.extend(page.competitions)
+        else:
+            # Without a total we can only follow `next` links one at a time
+            page = first_page
+            page_number = 1
+            while page.has_next:
+                page_number += 1
+                page = await self._fetch_page(payload, page_number)
+                json_competitions.extend(page.competitions)
+
+        return self._sorted_unique(json_competitions, sort_desc)
+
+    async def _fetch_page(self, payload: dict[str, str], page_number: int) -> _Page:
+        import aiohttp
+
+        url = self._competitions_url
+        params = self._page_params(payload, page_number)
+        headers: dict[str, str] = {}
+        cached, fresh_page = await self._off_loop(self._cached_page, params, headers)
+        if fresh_page is not None:
+            return fresh_page
+
+        session = await self._get_session()
+        attempt = 0
+        while True:
+            self.logger.info("Sending request to URL %r with payload %r", url, params)
+            try:
+                async with session.get(url, params=params, headers=headers) as response:
+                    self.logger.info("Got response %r", response.status)
+                    body = await response.read()
+                    self._record_response(len(body))
+                    if response.status == 304 and cached is not None:
+                        return await self._off_loop(
+                            self._revalidated_page, params, cached
+                        )
+                    if (
+                        response.status in self.RETRY_STATUSES
+                        and attempt < self.opts.retries
+                    ):
+                        delay = self._retry_after(response.headers.get("Retry-After"))
+                    else:
+                        response.raise_for_status()
+                        return await self._off_loop(
+                            self._page_from_response,
+                            params,
+                            json.loads(body),
+                            response.headers,
+                            "next" in response.links,
+                        )
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= self.opts.retries:
+                    raise
+                delay = None
+
+            attempt += 1
+            if delay is None:
+                delay = self._backoff(attempt)
+            self.logger.info("Retrying in %.2f seconds", delay)
+            await asyncio.sleep(delay)
+
+    async def _off_loop(self, function: Callable[..., _T], *args: Any) -> _T:
+        """
+        Runs `function`, which may read or write the response cache, on a
+        thread, so that other page fetches go on during the disk I/O
+        """
+        if self.opts.cache is None:
+            return function(*args)
+        return await asyncio.to_thread(function, *args)
+
+    def _backoff(self, attempt: int) -> float:
+        backoff = self.opts.backoff_factor * 2 ** (attempt - 1)
+        return backoff + random.uniform(0, self.opts.backoff_jitter)
+
+    def _retry_after(self, value: str | None) -> float | None:
+        """
+        Returns the delay asked for by a Retry-After header, at most the request
+        timeout, or None to back off as usual
+        """
+        if value is None:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+            if retry_at.tzinfo is None:
+                retry_at = retry_at.replace(tzinfo=timezone.utc)
+            delay = (retry_at - datetime.now(timezone.utc)).total_seconds()
+        # "inf" and "nan" parse as floats, but would sleep forever or fail
+        if not math.isfinite(delay):
+            return None
+        return min(max(0.0, delay), self.opts.timeout)
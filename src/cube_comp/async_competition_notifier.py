@@ -0,0 +1,118 @@
+import asyncio
+from typing import Any, Sequence
+
+from .async_competition_api import AsyncCompetitionAPI
+from .async_email_service import AsyncEmailService
+from .command_error import CommandError
+from .competition import Competition
+from .competition_api import announced_after_args
+from .competition_notifier import (
+    BaseCompetitionNotifierInvocation,
+    CompetitionNotifierOptions,
+)
+
+
+# Kept apart from the blocking invocations, so that asyncio is only imported
+# when a notifier runs asynchronously.
+class AsyncCompetitionNotifierInvocation(BaseCompetitionNotifierInvocation):
+    def __init__(
+        self,
+        competition_api: AsyncCompetitionAPI,
+        email_service: AsyncEmailService,
+        options: CompetitionNotifierOptions,
+    ) -> None:
+        super().__init__(options)
+        self.competition_api = competition_api
+        self.email_service = email_service
+
+    async def __call__(self, *args: Any, **kwds: Any) -> Any:
+        with self.instrumentation.time_stage("fetch"):
+            competitions = await self.fetch_competitions()
+        competitions = self.near_competitions(competitions)
+        # Known competitions and the fetch cursor can wait for locks, and
+        # rendering is CPU bound, so they run in threads to keep the event loop
+        # free for the rest of the host
+        changes = await asyncio.to_thread(self.classify_competitions, competitions)
+        await self.output_competitions(changes.new, changes.changed)
+        await asyncio.to_thread(self.save_fetch_cursor)
+
+    async def fetch_competitions(self) -> list[Competition]:
+        combinations = self.fetch_combinations()
+        if len(combinations) == 1:
+            query, country = combinations[0]
+            return await self.fetch_competitions_for(query, country)
+
+        semaphore = asyncio.Semaphore(self.opts.fetch_workers)
+
+        async def fetch(query: str | None, country: str | None) -> list[Competition]:
+            async with semaphore:
+                return await self.fetch_competitions_for(query, country)
+
+        results = await asyncio.gather(
+            *(fetch(query, country) for query, country in combinations)
+        )
+        return self.merge_competitions(results)
+
+    async def fetch_competitions_for(
+        self, query: str | None, country: str | None
+    ) -> list[Competition]:
+        self.log_fetch(query, country)
+        announced_after = self.announced_after(query, country)
+        json_competitions = await self.competition_api.fetch_competitions(
+            query=query, country=country, **announced_after_args(announced_after)
+        )
+        self.observe_fetch(query, country, json_competitions, announced_after)
+        return self.competitions_from_dicts(json_competitions)
+
+    async def output_competitions(
+        self,
+        competitions: list[Competition],
+        changed_competitions: Sequence[Competition] = (),
+    ) -> None:
+        if self.opts.email_to is None:
+            await asyncio.to_thread(
+                self.print_competitions, competitions, changed_competitions
+            )
+        elif len(competitions) > 0 or len(changed_competitions) > 0:
+            await self.send_email(
+                competitions, self.opts.email_to, changed_competitions
+            )
+        else:
+            self.logger.info("No competitions, so skipping email")
+
+    async def send_email(
+        self,
+        competitions: list[Competition],
+        to_address: str,
+        changed_competitions: Sequence[Competition] = (),
+    ) -> None:
+        try:
+            self.logger.info(
+                "Emailing %r new and %r changed competitions to %r",
+                len(competitions),
+                len(changed_competitions),
+                to_address,
+            )
+
+            self.email_service.configure_smtp(
+                self.opts.smtp_host,
+                self.opts.smtp_port,
+                self.opts.smtp_user,
+                self.opts.smtp_password,
+            )
+
+            email = await asyncio.to_thread(
+                self.build_email, competitions, to_address, changed_competitions
+            )
+            with self.instrumentation.time_stage("smtp"):
+                await self.email_service.send_email(
+                    to_address=email.to_address,
+                    from_address=email.from_address,
+                    subject=email.subject,
+                    content=email.content,
+                )
+            self.instrumentation.increment("emails_sent")
+        except ConnectionRefusedError:
+            raise CommandError(
+                f"Cannot send email: Connection refused: {self.opts.smtp_host}"
+            )
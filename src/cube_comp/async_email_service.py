@@ -0,0 +1,66 @@
+import asyncio
+
+from typing_extensions import Protocol
+
+from .email_service import EmailService, SMTPEmailService
+
+
+class AsyncEmailService(Protocol):
+    def configure_smtp(
+        self,
+        smtp_host: str,
+        smtp_port: int,
+        smtp_user: str | None = None,
+        smtp_password: str | None = None,
+    ) -> None:
+        pass
+
+    async def send_email(
+        self, to_address: str, from_address: str, subject: str, content: str
+    ) -> None:
+        pass
+
+
+# Runs a blocking EmailService on the default executor, so existing
+# implementations can be used with the asyncio pipeline.
+class AsyncEmailServiceAdapter(AsyncEmailService):
+    def __init__(self, email_service: EmailService) -> None:
+        self.email_service = email_service
+
+    def configure_smtp(
+        self,
+        smtp_host: str,
+        smtp_port: int,
+        smtp_user: str | None = None,
+        smtp_password: str | None = None,
+    ) -> None:
+        self.email_service.configure_smtp(
+            smtp_host, smtp_port, smtp_user, smtp_password
+        )
+
+    async def send_email(
+        self, to_address: str, from_address: str, subject: str, content: str
+    ) -> None:
+        await asyncio.to_thread(
+            self.email_service.send_email, to_address, from_address, subject, content
+        )
+
+
+# An asyncio version of SMTPEmailService built on aiosmtplib, which is an
+# optional dependency (`pip install cube-comp[async]`).
+class AsyncSMTPEmailService(SMTPEmailService, AsyncEmailService):
+    async def send_email(  # type: ignore[override]
+        self, to_address: str, from_address: str, subject: str, content: str
+    ) -> None:
+        import aiosmtplib
+
+        msg = self._build_message(to_address, from_address, subject, content)
+        use_tls = self.smtp_port == 587
+        await aiosmtplib.send(
+            msg,
+            hostname=self.smtp_host,
+            port=self.smtp_port,
+            start_tls=use_tls,
+            username=self.smtp_user if use_tls else None,
+            password=self.smtp_password if use_tls else None,
+        )
@@ -0,0 +1,54 @@
+import hashlib
+import math
+from typing import Iterable
+
+
+# A set of strings that may answer "yes" for a string that was never added, with
+# a probability of about `error_rate` while it holds up to `capacity` strings,
+# but never answers "no" for one that was. It takes about 10 bits per string at
+# a 1% error rate, whatever the length of the strings. Strings cannot be removed,
+# so rebuild the filter to forget them.
+class BloomFilter:
+    DEFAULT_ERROR_RATE = 0.01
+
+    def __init__(
+        self,
+        capacity: int,
+        error_rate: float = DEFAULT_ERROR_RATE,
+        keys: Iterable[str] = (),
+    ) -> None:
+        if not 0 < error_rate < 1:
+            raise ValueError(f"Error rate must be between 0 and 1: {error_rate!r}")
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        bit_count = math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        self._bits = bytearray(math.ceil(bit_count / 8))
+        self.bit_count = len(self._bits) * 8
+        self.hash_count = max(1, round(self.bit_count / self.capacity * math.log(2)))
+        # Number of strings added, counting repeats
+        self.count = 0
+        for key in keys:
+            self.add(key)
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+    @property
+    def is_full(self) -> bool:
+        "Whether the filter holds more than `capacity` strings"
+        return self.count > self.capacity
+
+    def _positions(self, key: str) -> list[int]:
+        # Double hashing: every position comes from the two halves of one hash
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        step = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * step) % self.bit_count for i in range(self.hash_count)]
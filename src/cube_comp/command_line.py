@@ -1,21 +1,58 @@
 import argparse
+import contextlib
 import logging
+import os
 import sys
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 from .command_error import CommandError
-from .competition_api import WCACompetitionAPI
+from .competition_api import CompetitionAPI, CompetitionAPIOptions, WCACompetitionAPI
 from .competition_notifier import CompetitionNotifier, CompetitionNotifierOptions
-from .email_service import SMTPEmailService
+from .competition_watcher import CompetitionWatcher
+from .email_service import EmailService, SMTPEmailService
+from .fetch_cursor import FetchCursor
+from .file_lock import FileLock
+from .known_competitions import DEFAULT_SUBSCRIBER
+from .known_competitions_factory import known_competitions_path, open_known_competitions
+from .response_cache import ResponseCache
+
+# Modules that only some commands and options need are imported where they are
+# used, so that every run does not pay for them.
+if TYPE_CHECKING:
+    from .email_spool import EmailSpool, SpoolSender
+    from .metrics import MetricsRecorder
+    from .subscriptions import Subscription
 
 
 class CommandLine:
+    # Subcommands that may precede the regular arguments
+    COMMANDS = ("watch", "send-spool", "snapshot")
+
     def __init__(self) -> None:
         self.logger = logging.getLogger(__name__)
         self._log_option: str | None = None
         self.prog: str
+        self.command: str | None = None
+        self.watch_interval = 3600.0
+        self.watch_jitter = 0.1
         self.notifier_opts = CompetitionNotifierOptions(stdout_io=sys.stdout)
+        self.api_opts = CompetitionAPIOptions()
         self.known_comps_file: str | None = None
+        self.subscriber = DEFAULT_SUBSCRIBER
+        self.subscriptions_file: Path | None = None
+        self.smtp_connections = 1
+        self.spool_dir: Path | None = None
+        self.metrics_file: Path | None = None
+        self.incremental = False
+        self.snapshot_file: Path | None = None
+        self.local_search = False
+        self.search_index_dir: Path | None = None
+        # Countries to include in a snapshot; None for all of them
+        self.snapshot_countries: list[str | None] = [None]
+        self.resync_interval = FetchCursor.DEFAULT_RESYNC_INTERVAL
+        self.metrics: "MetricsRecorder | None" = None
+        self.output_file: Path | None = None
 
     def execute(self) -> int:
         try:
@@ -34,31 +71,337 @@ class CommandLine:
 
     def run(self) -> None:
         logging.basicConfig(level=self.log_level)
-        competition_api = WCACompetitionAPI()
-        email_service = SMTPEmailService()
-        notifier = CompetitionNotifier(competition_api, email_service)
+        try:
+            self._run()
+        finally:
+            # Also report the stages of a failed run
+            self._write_metrics()
 
-        if self.known_comps_file is None:
-            notifier.notify(self.notifier_opts)
-        else:
-            with open(self.known_comps_file, "a+") as known_comps_io:
-                self.notifier_opts.known_competitions_io = known_comps_io
+    def _run(self) -> None:
+        spool = None
+        if self.spool_dir is not None:
+            from .email_spool import EmailSpool
+
+            spool = EmailSpool(self.spool_dir)
+        if self.command == "send-spool":
+            self._send_spool(spool)
+            return
+        if self.command == "snapshot":
+            self._write_snapshot()
+            return
+
+        with contextlib.ExitStack() as stack:
+            competition_api: CompetitionAPI
+            if self.snapshot_file is not None:
+                from .snapshot_competition_api import SnapshotCompetitionAPI
+
+                competition_api = stack.enter_context(
+                    SnapshotCompetitionAPI(self.snapshot_file)
+                )
+            else:
+                competition_api = stack.enter_context(WCACompetitionAPI(self.api_opts))
+            if self.local_search:
+                from .search_index import LocalSearchCompetitionAPI
+
+                competition_api = LocalSearchCompetitionAPI(
+                    competition_api, self.search_index_dir
+                )
+            email_service: EmailService
+            if spool is not None:
+                from .email_spool import SpoolingEmailService
+
+                email_service = SpoolingEmailService(spool)
+            else:
+                email_service = SMTPEmailService(connections=self.smtp_connections)
+            notifier = CompetitionNotifier(competition_api, email_service)
+            if self.output_file is not None:
+                # Keep line endings as written; CSV and iCalendar use CRLF
+                self.notifier_opts.stdout_io = stack.enter_context(
+                    open(self.output_file, "w", newline="")
+                )
+
+            known_comps_stack = stack.enter_context(contextlib.ExitStack())
+            self._open_known_competitions(known_comps_stack)
+            subscriptions = self._load_subscriptions()
+
+            if self.command == "watch":
+                watcher = CompetitionWatcher(
+                    notifier,
+                    self.notifier_opts,
+                    interval=self.watch_interval,
+                    jitter=self.watch_jitter,
+                    subscriptions=subscriptions,
+                    on_poll=self._write_metrics,
+                )
+
+                def reload() -> None:
+                    self._reopen_known_competitions(known_comps_stack)
+                    watcher.subscriptions = self._load_subscriptions()
+
+                watcher.on_reload = reload
+                if spool is not None:
+                    # Deliver spooled email in the background while watching
+                    sender = self._spool_sender(spool)
+                    sender.start()
+                    stack.callback(sender.stop)
+                watcher.run()
+            elif subscriptions is not None:
+                notifier.notify_subscriptions(subscriptions, self.notifier_opts)
+            else:
                 notifier.notify(self.notifier_opts)
 
-    def parse_arguments(self) -> None:
-        parser = argparse.ArgumentParser()
+    def _write_metrics(self) -> None:
+        if self.metrics is None or self.metrics_file is None:
+            return
+        try:
+            self.metrics.write(self.metrics_file)
+        except OSError as e:
+            self.logger.error("Cannot write metrics to %r: %s", self.metrics_file, e)
+
+    def _write_snapshot(self) -> None:
+        from .snapshot_competition_api import SnapshotCompetitionAPI
+
+        if self.snapshot_file is None:
+            raise CommandError("snapshot requires --snapshot")
+        competitions = []
+        with WCACompetitionAPI(self.api_opts) as competition_api:
+            for country in self.snapshot_countries:
+                competitions.extend(competition_api.fetch_competitions(None, country))
+        count = SnapshotCompetitionAPI.write(self.snapshot_file, competitions)
+        self.logger.info("Wrote %r competitions to %r", count, self.snapshot_file)
+
+    def _send_spool(self, spool: "EmailSpool | None") -> None:
+        if spool is None:
+            raise CommandError("send-spool requires --spool-dir")
+        spool.recover()
+        sender = self._spool_sender(spool)
+        sender.drain()
+        if sender.failed_count > 0:
+            raise CommandError(
+                f"Cannot send {sender.failed_count} emails, "
+                f"{spool.pending_count()} pending, {spool.dead_count()} dead"
+            )
+
+    def _spool_sender(self, spool: "EmailSpool") -> "SpoolSender":
+        from .email_spool import SpoolSender
+
+        # Each worker sends its batches over its own connection
+        smtp_service = SMTPEmailService()
+        opts = self.notifier_opts
+        smtp_service.configure_smtp(
+            opts.smtp_host, opts.smtp_port, opts.smtp_user, opts.smtp_password
+        )
+        return SpoolSender(spool, smtp_service, workers=self.smtp_connections)
+
+    def _load_subscriptions(self) -> "list[Subscription] | None":
+        if self.subscriptions_file is None:
+            return None
+        from .subscriptions import load_subscriptions
+
+        return load_subscriptions(self.subscriptions_file)
+
+    def _reopen_known_competitions(self, stack: contextlib.ExitStack) -> None:
+        stack.close()
+        self.notifier_opts.known_competitions = None
+        self._open_known_competitions(stack)
+
+    def _open_known_competitions(self, stack: contextlib.ExitStack) -> None:
+        if self.known_comps_file is None:
+            if self.incremental:
+                raise CommandError("--incremental requires --known")
+            return
+        self.notifier_opts.known_competitions = open_known_competitions(
+            self.known_comps_file,
+            stack,
+            self.subscriber,
+            bloom_filter=self.notifier_opts.known_bloom_filter,
+            lock_timeout=self.notifier_opts.lock_timeout,
+        )
+        if self.incremental:
+            self.notifier_opts.fetch_cursor = FetchCursor(
+                self._fetch_cursor_path(),
+                self.resync_interval,
+                lock_timeout=self.notifier_opts.lock_timeout,
+            )
+
+    def _fetch_cursor_path(self) -> Path:
+        # Kept next to the known competitions, with one per SQLite subscriber
+        assert self.known_comps_file is not None
+        path = known_competitions_path(self.known_comps_file)
+        name = path.name
+        if self.known_comps_file.startswith("sqlite:"):
+            name += f".{self.subscriber}"
+        return path.with_name(f"{name}.cursor")
+
+    def parse_arguments(self, argv: list[str] | None = None) -> None:
+        if argv is None:
+            argv = sys.argv[1:]
+        prog = os.path.basename(sys.argv[0])
+        if len(argv) > 0 and argv[0] in self.COMMANDS:
+            self.command = argv[0]
+            argv = argv[1:]
+            prog = f"{prog} {self.command}"
+
+        from .output_writers import OUTPUT_FORMATS
+
+        parser = argparse.ArgumentParser(prog=prog)
         self.prog = parser.prog
+        if self.command == "watch":
+            parser.add_argument(
+                "--interval",
+                type=float,
+                help="Poll every SECONDS (default: %(default)s)",
+                metavar="SECONDS",
+                default=self.watch_interval,
+            )
+            parser.add_argument(
+                "--jitter",
+                type=float,
+                help="Randomly vary each interval by up to FRACTION of it "
+                "(default: %(default)s)",
+                metavar="FRACTION",
+                default=self.watch_jitter,
+            )
+        parser.add_argument(
+            "query", type=str, help="query string (may be repeated)", nargs="*"
+        )
         parser.add_argument(
-            "query", type=str, help="query string", nargs="?", default=None
+            "-c",
+            "--country",
+            type=str,
+            action="append",
+            help="ISO country code (may be repeated, default: US)",
+        )
+        parser.add_argument(
+            "--near",
+            type=str,
+            help="Only list competitions near LAT,LON, in decimal degrees; "
+            "write --near=LAT,LON if LAT is negative",
+            metavar="LAT,LON",
         )
         parser.add_argument(
-            "-c", "--country", type=str, help="ISO country code", default="US"
+            "--radius",
+            type=float,
+            help="With --near, list competitions within KM kilometres "
+            "(default: %(default)s)",
+            metavar="KM",
+            default=self.notifier_opts.radius_km,
         )
         parser.add_argument(
             "-k",
             "--known",
             type=str,
-            help="known competitions JSON file",
+            help="known competitions JSON file, log:FILE for an append-only log, "
+            "or sqlite:FILE for a SQLite database",
+            metavar="FILE",
+        )
+        parser.add_argument(
+            "--subscriber",
+            type=str,
+            help="Keep known competitions in a SQLite database under NAME",
+            metavar="NAME",
+            default=DEFAULT_SUBSCRIBER,
+        )
+        parser.add_argument(
+            "--bloom-filter",
+            action="store_true",
+            help="Keep a Bloom filter of SQLite known competitions in memory, to "
+            "look up fewer of them in large databases",
+        )
+        parser.add_argument(
+            "--lock-timeout",
+            type=float,
+            help="Wait up to SECONDS for other processes sharing the known "
+            "competitions (default: %(default)s)",
+            metavar="SECONDS",
+            default=FileLock.DEFAULT_TIMEOUT,
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only fetch competitions announced since the last run, keeping "
+            "a cursor next to the known competitions",
+        )
+        parser.add_argument(
+            "--resync-interval",
+            type=float,
+            help="With --incremental, fetch all competitions every SECONDS "
+            "(default: %(default)s)",
+            metavar="SECONDS",
+            default=self.resync_interval,
+        )
+        parser.add_argument(
+            "--subscriptions",
+            type=Path,
+            help="Notify every subscriber in a TOML or JSON FILE, instead of "
+            "using the query, country, known and email options",
+            metavar="FILE",
+        )
+        parser.add_argument(
+            "--spool-dir",
+            type=Path,
+            help="Queue emails in DIR instead of sending them; deliver them "
+            "with the send-spool command, or in the background when watching",
+            metavar="DIR",
+        )
+        parser.add_argument(
+            "--snapshot",
+            type=Path,
+            help="Query a local snapshot in FILE instead of the WCA API; the "
+            "snapshot command writes FILE",
+            metavar="FILE",
+        )
+        parser.add_argument(
+            "--local-search",
+            action="store_true",
+            help="Fetch each country once and match queries locally, instead "
+            "of sending them to the API",
+        )
+        parser.add_argument(
+            "--search-index-dir",
+            type=Path,
+            help="Keep local search indexes in DIR for an hour (implies "
+            "--local-search)",
+            metavar="DIR",
+        )
+        parser.add_argument(
+            "--cache-dir",
+            type=Path,
+            help="Cache API responses in DIR",
+            metavar="DIR",
+        )
+        parser.add_argument(
+            "--cache-ttl",
+            type=float,
+            help="Use cached API responses younger than SECONDS without "
+            "revalidating them",
+            metavar="SECONDS",
+            default=ResponseCache.DEFAULT_TTL,
+        )
+        parser.add_argument(
+            "--template-cache-dir",
+            type=Path,
+            help="Keep compiled templates in DIR",
+            metavar="DIR",
+        )
+        parser.add_argument(
+            "--metrics-file",
+            type=Path,
+            help="Write stage timings and counts to FILE, as JSON if it ends in "
+            ".json, otherwise for the Prometheus textfile collector",
+            metavar="FILE",
+        )
+        parser.add_argument(
+            "--format",
+            choices=OUTPUT_FORMATS,
+            help="Print competitions in this format (default: %(default)s)",
+            default=self.notifier_opts.output_format,
+        )
+        parser.add_argument(
+            "-o",
+            "--output",
+            type=Path,
+            help="Print competitions to FILE instead of standard output",
             metavar="FILE",
         )
         parser.add_argument(
@@ -80,6 +423,13 @@ class CommandLine:
             "--smtp-host", type=str, help="SMTP server host", metavar="HOST"
         )
         parser.add_argument("--smtp-port", type=int, help="SMTP port", default=0)
+        parser.add_argument(
+            "--smtp-connections",
+            type=int,
+            help="Send subscription emails over N SMTP connections",
+            metavar="N",
+            default=self.smtp_connections,
+        )
         parser.add_argument("--smtp-user", type=str, help="SMTP user")
         parser.add_argument(
             "--smtp-password-file", type=Path, help="SMTP password file"
@@ -93,23 +443,67 @@ class CommandLine:
             help="Set log level",
         )
 
-        args = parser.parse_args()
+        args = parser.parse_args(argv)
 
         opts = self.notifier_opts
 
-        opts.query = args.query
-        opts.country = args.country
+        opts.queries = args.query
+        opts.countries = args.country if args.country is not None else ["US"]
+        if args.near is not None:
+            from .geo_index import parse_coordinates
+
+            try:
+                opts.near = parse_coordinates(args.near)
+            except ValueError as e:
+                raise CommandError(f"Invalid --near: {e}")
+        if args.radius <= 0:
+            raise CommandError("--radius must be positive")
+        opts.radius_km = args.radius
         self.known_comps_file = args.known
+        self.snapshot_file = args.snapshot
+        self.search_index_dir = args.search_index_dir
+        self.local_search = args.local_search or self.search_index_dir is not None
+        if args.country is not None:
+            self.snapshot_countries = list(args.country)
+        self.subscriber = args.subscriber
+        opts.known_bloom_filter = args.bloom_filter
+        if args.lock_timeout < 0:
+            raise CommandError("--lock-timeout must not be negative")
+        opts.lock_timeout = args.lock_timeout
+        self.subscriptions_file = args.subscriptions
+        self.incremental = args.incremental
+        self.resync_interval = args.resync_interval
+        if self.incremental and self.subscriptions_file is not None:
+            raise CommandError("--incremental cannot be used with --subscriptions")
+        if args.cache_dir is not None:
+            self.api_opts.cache = ResponseCache(args.cache_dir, ttl=args.cache_ttl)
+
+        opts.template_cache_dir = args.template_cache_dir
+        self.metrics_file = args.metrics_file
+        if self.metrics_file is not None:
+            from .metrics import MetricsRecorder
 
+            self.metrics = MetricsRecorder()
+            opts.instrumentation = self.metrics
+            self.api_opts.instrumentation = self.metrics
         opts.email_to = args.email_to
+        opts.output_format = args.format
+        self.output_file = args.output
+        if opts.output_format != "text" and opts.email_to is not None:
+            raise CommandError("--format cannot be used with --email-to")
         opts.email_from = args.email_from
         opts.email_subject = args.email_subject
 
         if args.smtp_host is not None:
             opts.smtp_host = args.smtp_host
         opts.smtp_port = args.smtp_port
+        self.smtp_connections = args.smtp_connections
+        self.spool_dir = args.spool_dir
         self._parse_smtp_user_and_password(args, opts)
         self._log_option = args.log
+        if self.command == "watch":
+            self.watch_interval = args.interval
+            self.watch_jitter = args.jitter
 
     def _parse_smtp_user_and_password(
         self, args: argparse.Namespace, opts: CompetitionNotifierOptions
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
+import sys
 from dataclasses import dataclass
 from datetime import date
+from typing import Iterable
 
 
-@dataclass
+# Slots keep large result sets compact, and city and venue strings are interned
+# because many competitions share them.
+@dataclass(slots=True)
 class Competition:
     # Required
     id: str
@@ -18,19 +22,42 @@ class Competition:
 
     # Optional
     display_name: str | None = None
+    latitude: float | None = None
+    longitude: float | None = None
 
     @classmethod
     def from_dict(cls, dict: dict) -> Competition:
+        return cls._from_dict(dict, date.fromisoformat(dict["start_date"]))
+
+    @classmethod
+    def from_dicts(cls, dicts: Iterable[dict]) -> list[Competition]:
+        "Converts many dicts, decoding each distinct start date only once"
+        dates: dict[str, date] = {}
+        competitions = []
+        for dict in dicts:
+            start_date_str = dict["start_date"]
+            start_date = dates.get(start_date_str)
+            if start_date is None:
+                start_date = date.fromisoformat(start_date_str)
+                dates[start_date_str] = start_date
+            competitions.append(cls._from_dict(dict, start_date))
+        return competitions
+
+    @classmethod
+    def _from_dict(cls, dict: dict, start_date: date) -> Competition:
+        "Converts a dict whose start date has already been decoded"
         return cls(
             # Required
             id=dict["id"],
             name=dict["name"],
             short_name=dict["short_name"],
-            start_date=date.fromisoformat(dict["start_date"]),
+            start_date=start_date,
             results_posted=dict["results_posted_at"] is not None,
-            city=dict["city"],
-            venue=dict["venue"],
+            city=sys.intern(dict["city"]),
+            venue=sys.intern(dict["venue"]),
             website=dict["website"],
             # Optional
             display_name=dict.get("short_display_name"),
+            latitude=dict.get("latitude_degrees"),
+            longitude=dict.get("longitude_degrees"),
         )
@@ -1,18 +1,89 @@
 import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import date
-from typing import Any
+from typing import TYPE_CHECKING, Any, Iterator, Mapping
 
-import requests
 from typing_extensions import Protocol
 
+from .metrics import Instrumentation, NullInstrumentation
+from .response_cache import CachedResponse, ResponseCache
+
+if TYPE_CHECKING:
+    import requests
+
+
+def announced_after_args(announced_after: str | None) -> dict[str, str]:
+    """
+    Returns the keyword arguments that pass `announced_after` to
+    fetch_competitions(), if it is set. APIs written before it was added do
+    not take it, and still work for full fetches.
+    """
+    if announced_after is None:
+        return {}
+    return {"announced_after": announced_after}
+
 
 class CompetitionAPI(Protocol):
     def fetch_competitions(
-        self, query: str | None, country: str | None, sort_desc=False
+        self,
+        query: str | None,
+        country: str | None,
+        sort_desc=False,
+        announced_after: str | None = None,
     ) -> list[dict[str, Any]]:
-        "Fetches competitions with optional parameters"
+        """
+        Fetches competitions with optional parameters. With `announced_after`,
+        an ISO 8601 time, only competitions announced after it are returned.
+        """
         ...
 
+    def iter_competition_pages(
+        self,
+        query: str | None,
+        country: str | None,
+        announced_after: str | None = None,
+    ) -> Iterator[list[dict[str, Any]]]:
+        """
+        Yields the competitions of fetch_competitions() a page at a time, as
+        they arrive, by ascending start date. A page may repeat competitions of
+        earlier pages. By default, the whole result is one page.
+        """
+        yield self.fetch_competitions(
+            query, country, **announced_after_args(announced_after)
+        )
+
+
+@dataclass
+class CompetitionAPIOptions:
+    # Number of pages fetched in parallel
+    max_workers: int = 4
+    # Number of keep-alive connections kept open to the API host
+    pool_size: int = 4
+
+    retries: int = 3
+    # Retries sleep for backoff_factor * 2 ** (retry - 1) seconds, plus up to
+    # backoff_jitter seconds of random jitter. A Retry-After header takes
+    # precedence.
+    backoff_factor: float = 0.5
+    backoff_jitter: float = 0.5
+    # Connect and read timeout, in seconds
+    timeout: float = 30.0
+
+    cache: ResponseCache | None = None
+    # Receives HTTP request, byte and cache counts
+    instrumentation: Instrumentation = field(default_factory=NullInstrumentation)
+
+
+@dataclass
+class _Page:
+    competitions: list[dict[str, Any]]
+    total: int | None = None
+    per_page: int | None = None
+    has_next: bool = False
+
 
 # Basic documentation about the API:
 # https://docs.worldcubeassociation.org/knowledge_base/v0_api.html
@@ -22,30 +93,266 @@ class CompetitionAPI(Protocol):
 #
 # Code for the `Competition` model. The `search` method shows possible parameters:
 # https://github.com/thewca/worldcubeassociation.org/blob/master/WcaOnRails/app/models/competition.rb
-class WCACompetitionAPI(CompetitionAPI):
-    def __init__(self) -> None:
-        super().__init__()
+#
+# The endpoint is paginated. Each response carries `Total` and `Per-Page`
+# headers, plus a `Link` header with a `next` relation if there are more pages.
+#
+# This class holds the request building, caching and paging logic shared by the
+# blocking and asyncio clients.
+class WCACompetitionEndpoint:
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, options: CompetitionAPIOptions | None = None) -> None:
         self.logger = logging.getLogger(__name__)
         self._base_url = "https://www.worldcubeassociation.org/api/v0"
+        self.opts = options if options is not None else CompetitionAPIOptions()
 
     @property
     def _competitions_url(self) -> str:
         url = self._base_url + "/competitions"
         return url
 
-    def fetch_competitions(
-        self, query: str | None, country: str | None, sort_desc=False
-    ) -> list[dict[str, Any]]:
-        url = self._competitions_url
+    def _payload(
+        self,
+        query: str | None,
+        country: str | None,
+        announced_after: str | None = None,
+    ) -> dict[str, str]:
         today = date.today().isoformat()
         payload = {"start": today, "sort": "start_date"}
         if query:
             payload["q"] = query
         if country:
             payload["country_iso2"] = country
-        self.logger.info("Sending request to URL %r with payload %r", url, payload)
-        response = requests.get(url, params=payload)
+        if announced_after:
+            payload["announced_after"] = announced_after
+        return payload
+
+    def _page_params(self, payload: dict[str, str], page_number: int) -> dict[str, str]:
+        params = dict(payload)
+        if page_number > 1:
+            params["page"] = str(page_number)
+        return params
+
+    def _page_count(self, first_page: _Page) -> int | None:
+        if first_page.total is None or not first_page.per_page:
+            return None
+        return max(1, math.ceil(first_page.total / first_page.per_page))
+
+    def _cached_page(
+        self, params: dict[str, str], headers: dict[str, str]
+    ) -> tuple[CachedResponse | None, _Page | None]:
+        # Returns the cached entry, if any, and a page if the entry is fresh
+        # enough to skip the request. Adds conditional request headers to
+        # `headers` for stale entries.
+        cache = self.opts.cache
+        if cache is None:
+            return None, None
+        cached = cache.get(params)
+        if cached is None:
+            return None, None
+        if cache.is_fresh(cached):
+            self.logger.info("Using cached response for payload %r", params)
+            self.opts.instrumentation.increment("http_cache_hits")
+            return cached, self._page_from_cache(cached)
+        if cached.etag is not None:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified is not None:
+            headers["If-Modified-Since"] = cached.last_modified
+        return cached, None
+
+    def _record_response(self, body_size: int) -> None:
+        self.opts.instrumentation.increment("http_requests")
+        self.opts.instrumentation.increment("http_response_bytes", body_size)
+
+    def _revalidated_page(
+        self, params: dict[str, str], cached: CachedResponse
+    ) -> _Page:
+        assert self.opts.cache is not None
+        self.logger.info("Cached response for payload %r is still valid", params)
+        self.opts.instrumentation.increment("http_not_modified")
+        cached.fetched_at = time.time()
+        self.opts.cache.put(params, cached)
+        return self._page_from_cache(cached)
+
+    def _page_from_response(
+        self,
+        params: dict[str, str],
+        competitions: list[dict[str, Any]],
+        headers: Mapping[str, str],
+        has_next: bool,
+    ) -> _Page:
+        page = _Page(
+            competitions=competitions,
+            total=self._int_header(headers, "Total"),
+            per_page=self._int_header(headers, "Per-Page"),
+            has_next=has_next,
+        )
+        if self.opts.cache is not None:
+            self.opts.cache.put(
+                params,
+                CachedResponse(
+                    competitions=page.competitions,
+                    fetched_at=time.time(),
+                    total=page.total,
+                    per_page=page.per_page,
+                    has_next=page.has_next,
+                    etag=headers.get("ETag"),
+                    last_modified=headers.get("Last-Modified"),
+                ),
+            )
+        return page
+
+    def _page_from_cache(self, cached: CachedResponse) -> _Page:
+        return _Page(
+            competitions=cached.competitions,
+            total=cached.total,
+            per_page=cached.per_page,
+            has_next=cached.has_next,
+        )
+
+    def _int_header(self, headers: Mapping[str, str], name: str) -> int | None:
+        value = headers.get(name)
+        if value is None:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            self.logger.warning("Ignoring invalid %r header: %r", name, value)
+            return None
+
+    def _sorted_unique(
+        self, json_competitions: list[dict[str, Any]], sort_desc: bool
+    ) -> list[dict[str, Any]]:
+        # Pages can overlap if competitions are added while we are fetching.
+        unique: dict[str, dict[str, Any]] = {}
+        for json_comp in json_competitions:
+            unique.setdefault(json_comp["id"], json_comp)
+        return sorted(
+            unique.values(),
+            key=lambda json_comp: (json_comp["start_date"], json_comp["id"]),
+            reverse=sort_desc,
+        )
+
+
+class WCACompetitionAPI(WCACompetitionEndpoint, CompetitionAPI):
+    def __init__(
+        self,
+        options: CompetitionAPIOptions | None = None,
+        session: "requests.Session | None" = None,
+    ) -> None:
+        super().__init__(options)
+        self._session = session if session is not None else self._create_session()
+
+    def _create_session(self) -> "requests.Session":
+        # Imported here, as requests is slow to import and not every command
+        # uses the API
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry = Retry(
+            total=self.opts.retries,
+            backoff_factor=self.opts.backoff_factor,
+            backoff_jitter=self.opts.backoff_jitter,
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=["GET"],
+            respect_retry_after_header=True,
+            # Let raise_for_status() report the final response
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=max(self.opts.pool_size, self.opts.max_workers),
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def close(self) -> None:
+        self._session.close()
+
+    def __enter__(self) -> "WCACompetitionAPI":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def fetch_competitions(
+        self,
+        query: str | None,
+        country: str | None,
+        sort_desc=False,
+        announced_after: str | None = None,
+    ) -> list[dict[str, Any]]:
+        json_competitions = [
+            json_comp
+            for page in self.iter_competition_pages(query, country, announced_after)
+            for json_comp in page
+        ]
+        return self._sorted_unique(json_competitions, sort_desc)
+
+    def iter_competition_pages(
+        self,
+        query: str | None,
+        country: str | None,
+        announced_after: str | None = None,
+    ) -> Iterator[list[dict[str, Any]]]:
+        payload = self._payload(query, country, announced_after)
+        first_page = self._fetch_page(payload, 1)
+        yield first_page.competitions
+
+        page_count = self._page_count(first_page)
+        if page_count is not None:
+            yield from self._iter_pages(payload, 2, page_count)
+        else:
+            # Without a total we can only follow `next` links one at a time
+            page = first_page
+            page_number = 1
+            while page.has_next:
+                page_number += 1
+                page = self._fetch_page(payload, page_number)
+                yield page.competitions
+
+    def _iter_pages(
+        self, payload: dict[str, str], first: int, last: int
+    ) -> Iterator[list[dict[str, Any]]]:
+        "Fetches pages in parallel, and yields them in order"
+        page_numbers = range(first, last + 1)
+        if len(page_numbers) == 0:
+            return
+
+        self.logger.info("Fetching pages %r to %r", first, last)
+        max_workers = min(self.opts.max_workers, len(page_numbers))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pages = executor.map(
+                lambda page_number: self._fetch_page(payload, page_number),
+                page_numbers,
+            )
+            for page in pages:
+                yield page.competitions
+
+    def _fetch_page(self, payload: dict[str, str], page_number: int) -> _Page:
+        url = self._competitions_url
+        params = self._page_params(payload, page_number)
+        headers: dict[str, str] = {}
+        cached, fresh_page = self._cached_page(params, headers)
+        if fresh_page is not None:
+            return fresh_page
+
+        self.logger.info("Sending request to URL %r with payload %r", url, params)
+        response = self._session.get(
+            url, params=params, headers=headers, timeout=self.opts.timeout
+        )
         self.logger.info("Got response %r", response)
+        self._record_response(len(response.content))
+
+        if response.status_code == 304 and cached is not None:
+            return self._revalidated_page(params, cached)
+
         response.raise_for_status()
-        json_competitions = response.json()
-        return json_competitions
+        return self._page_from_response(
+            params, response.json(), response.headers, "next" in response.links
+        )
@@ -1,15 +1,48 @@
+import contextlib
+import copy
+import functools
 import inspect
+import itertools
 import logging
-from dataclasses import dataclass
-from typing import Any, TextIO
-
-from jinja2 import Environment, PackageLoader, select_autoescape
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Generic,
+    Iterable,
+    Iterator,
+    Sequence,
+    TextIO,
+    TypeVar,
+    cast,
+)
 
 from .command_error import CommandError
 from .competition import Competition
-from .competition_api import CompetitionAPI
-from .email_service import EmailService
-from .known_competitions import KnownCompetitions
+from .competition_api import CompetitionAPI, announced_after_args
+from .email_service import EmailService, OutgoingEmail
+from .fetch_cursor import FetchCursor
+from .file_lock import FileLock
+from .known_competitions import (
+    CompetitionChanges,
+    KnownCompetitions,
+    KnownCompetitionsStore,
+)
+from .known_competitions_factory import open_known_competitions
+from .metrics import Instrumentation, NullInstrumentation
+
+# jinja2 and asyncio are slow to import, so they are imported on first use, as
+# are the modules that only some options need.
+if TYPE_CHECKING:
+    from jinja2 import Environment, Template
+
+    from .async_competition_api import AsyncCompetitionAPI
+    from .async_email_service import AsyncEmailService
+    from .geo_index import GeoGridIndex
+    from .subscriptions import Subscription
 
 
 @dataclass
@@ -18,11 +51,34 @@ class CompetitionNotifierOptions:
 
     query: str | None = None
     country: str | None = None
+    # Fetch every combination of these queries and countries, instead of
+    # the single query and country above.
+    queries: list[str] = field(default_factory=list)
+    countries: list[str] = field(default_factory=list)
+    fetch_workers: int = 4
     known_competitions_io: TextIO | None = None
+    # Takes precedence over known_competitions_io
+    known_competitions: KnownCompetitionsStore | None = None
+    # Put a Bloom filter in front of subscribers' SQLite known competitions
+    known_bloom_filter: bool = False
+    # Seconds to wait for other processes sharing subscribers' known competitions
+    lock_timeout: float = FileLock.DEFAULT_TIMEOUT
+    # Only fetch competitions announced since the last run
+    fetch_cursor: FetchCursor | None = None
+    # Only keep competitions within radius_km of this (latitude, longitude)
+    near: tuple[float, float] | None = None
+    radius_km: float = 100.0
 
     email_to: str | None = None
     email_from: str | None = None
     email_subject: str | None = None
+    # How printed competitions are written: one of OUTPUT_FORMATS. Emails are
+    # always text.
+    output_format: str = "text"
+    # Keep compiled templates in this directory, across processes
+    template_cache_dir: Path | None = None
+    # Receives stage timings and counts, for example a MetricsRecorder
+    instrumentation: Instrumentation = field(default_factory=NullInstrumentation)
 
     smtp_host = "localhost"
     smtp_port = 25
@@ -30,51 +86,468 @@ class CompetitionNotifierOptions:
     smtp_password: str | None = None
 
 
-class CompetitionNotifierInvocation:
+# Shared by every invocation in the process, so templates are only loaded and
+# compiled once. Package templates never change while running, so they are not
+# checked for changes either. With a `bytecode_cache_dir`, compiled templates
+# are also kept on disk for the next process.
+@functools.cache
+def _template_environment(bytecode_cache_dir: Path | None = None) -> "Environment":
+    from jinja2 import (
+        Environment,
+        FileSystemBytecodeCache,
+        PackageLoader,
+        select_autoescape,
+    )
+
+    bytecode_cache = None
+    if bytecode_cache_dir is not None:
+        bytecode_cache_dir.mkdir(parents=True, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(str(bytecode_cache_dir))
+    return Environment(
+        loader=PackageLoader("cube_comp"),
+        autoescape=select_autoescape(),
+        trim_blocks=True,
+        lstrip_blocks=True,
+        keep_trailing_newline=False,
+        auto_reload=False,
+        bytecode_cache=bytecode_cache,
+    )
+
+
+@functools.cache
+def _competitions_template(bytecode_cache_dir: Path | None = None) -> "Template":
+    env = _template_environment(bytecode_cache_dir)
+    return env.get_template("competitions.txt.j2")
+
+
+def _cleandoc_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Streams the same text as inspect.cleandoc() on the joined chunks: the first
+    line is stripped of leading whitespace, leading and trailing blank lines are
+    dropped, and tabs are expanded. The templates are not indented, so there is
+    no common margin to remove.
+    """
+    partial = ""
+    line_count = 0
+    blank_lines = 0
+
+    def clean(line: str) -> Iterator[str]:
+        nonlocal line_count, blank_lines
+        line = line.expandtabs()
+        if line_count == 0:
+            line = line.lstrip()
+        line_count += 1
+        if line == "":
+            blank_lines += 1
+        elif line_count == blank_lines + 1:
+            # First line of content
+            blank_lines = 0
+            yield line
+        else:
+            yield "\n" * (blank_lines + 1) + line
+            blank_lines = 0
+
+    for chunk in chunks:
+        *lines, partial = (partial + chunk).split("\n")
+        for line in lines:
+            yield from clean(line)
+    yield from clean(partial)
+
+
+def _whole_listing(
+    pages: Iterable[list[Competition]],
+) -> Iterator[list[Competition]]:
+    "Returns a listing as one page, fetching the pages when it is first needed"
+    yield [comp for page in pages for comp in page]
+
+
+_Page = TypeVar("_Page")
+
+
+# Wraps one stage of a lazy pipeline of pages, and records the time spent
+# producing them as one run of `stage`, once the pages run out or are no longer
+# wanted. The time spent in the `upstream` stage that it pulls from is not
+# counted, so stages that run interleaved are still timed apart. Without a
+# `stage`, nothing is recorded.
+class _TimedStage(Generic[_Page]):
     def __init__(
         self,
-        competition_api: CompetitionAPI,
-        email_service: EmailService,
-        options: CompetitionNotifierOptions,
+        instrumentation: Instrumentation,
+        stage: str | None,
+        pages: Iterable[_Page],
+        upstream: "_TimedStage[Any] | None" = None,
     ) -> None:
+        self.instrumentation = instrumentation
+        self.stage = stage
+        self.pages = pages
+        self.upstream = upstream
+        # Including the time spent upstream
+        self.total_seconds = 0.0
+
+    def __iter__(self) -> Iterator[_Page]:
+        iterator = iter(self.pages)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    page = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    self.total_seconds += time.perf_counter() - start
+                yield page
+        finally:
+            if self.stage is not None:
+                self.instrumentation.record_duration(self.stage, self.own_seconds)
+
+    @property
+    def own_seconds(self) -> float:
+        if self.upstream is None:
+            return self.total_seconds
+        return self.total_seconds - self.upstream.total_seconds
+
+
+# Stages shared by the blocking and asyncio invocations. Subclasses provide
+# the I/O bound stages: fetching competitions and sending email.
+class BaseCompetitionNotifierInvocation:
+    def __init__(self, options: CompetitionNotifierOptions) -> None:
         self.logger = logging.getLogger(__name__)
-        self.competition_api = competition_api
-        self.email_service = email_service
         self.opts = options
+        self.instrumentation = options.instrumentation
+        # Whether any fetch only asked for recently announced competitions
+        self.incremental = False
 
-    def __call__(self, *args: Any, **kwds: Any) -> Any:
-        competitions = self.fetch_competitions()
-        filtered_competitions = self.filter_competitions(competitions)
-        self.output_competitions(filtered_competitions)
+    def fetch_combinations(self) -> list[tuple[str | None, str | None]]:
+        queries: list[str | None] = list(self.opts.queries) or [self.opts.query]
+        countries: list[str | None] = list(self.opts.countries) or [self.opts.country]
+        return list(itertools.product(queries, countries))
 
-    def fetch_competitions(self) -> list[Competition]:
+    def log_fetch(self, query: str | None, country: str | None) -> None:
         self.logger.info(
-            "Fetching competitions with query: %r, country: %r",
-            self.opts.query,
-            self.opts.country,
-        )
-        json_competitions = self.competition_api.fetch_competitions(
-            query=self.opts.query, country=self.opts.country
+            "Fetching competitions with query: %r, country: %r", query, country
         )
-        competitions = [
-            self.competition_from_dict(json_comp) for json_comp in json_competitions
-        ]
-        return competitions
+
+    def announced_after(self, query: str | None, country: str | None) -> str | None:
+        cursor = self.opts.fetch_cursor
+        if cursor is None:
+            return None
+        announced_after = cursor.announced_after(query, country)
+        if announced_after is not None:
+            self.logger.info(
+                "Fetching competitions announced after %r", announced_after
+            )
+            self.incremental = True
+        return announced_after
+
+    def observe_fetch(
+        self,
+        query: str | None,
+        country: str | None,
+        json_competitions: list[dict[str, Any]],
+        announced_after: str | None,
+    ) -> None:
+        if self.opts.fetch_cursor is not None:
+            self.opts.fetch_cursor.observe(
+                query, country, json_competitions, full_sync=announced_after is None
+            )
+
+    def save_fetch_cursor(self) -> None:
+        # Only once the competitions have been output, so that a failed run
+        # fetches them again
+        if self.opts.fetch_cursor is not None:
+            self.opts.fetch_cursor.save()
+
+    def merge_competitions(
+        self, results: Iterable[list[Competition]]
+    ) -> list[Competition]:
+        merged: dict[str, Competition] = {}
+        for competitions in results:
+            for comp in competitions:
+                merged.setdefault(comp.id, comp)
+        self.logger.info("Merged %r unique competitions", len(merged))
+        return sorted(merged.values(), key=lambda comp: (comp.start_date, comp.id))
 
     def competition_from_dict(self, dict: dict[str, Any]) -> Competition:
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return Competition.from_dict(dict)
         self.logger.debug("Converting competition:\n%r", dict)
         competition = Competition.from_dict(dict)
         self.logger.debug("Converted competition %r", competition)
         return competition
 
+    def competitions_from_dicts(self, dicts: list[dict[str, Any]]) -> list[Competition]:
+        self.instrumentation.increment("competitions_fetched", len(dicts))
+        if self.logger.isEnabledFor(logging.DEBUG):
+            # Log each competition, at the cost of converting one at a time
+            return [self.competition_from_dict(dict) for dict in dicts]
+        return Competition.from_dicts(dicts)
+
+    def near_competitions(
+        self, competitions: list[Competition], geo_index: "GeoGridIndex | None" = None
+    ) -> list[Competition]:
+        """
+        Returns the competitions within the radius, if there is one. Pass the
+        `geo_index` of `competitions` to share it between invocations.
+        """
+        if self.opts.near is None:
+            return competitions
+        if geo_index is None:
+            from .geo_index import GeoGridIndex
+
+            geo_index = GeoGridIndex(competitions)
+        latitude, longitude = self.opts.near
+        near_comps = geo_index.within(latitude, longitude, self.opts.radius_km)
+        self.logger.info(
+            "Found %r competitions within %r km", len(near_comps), self.opts.radius_km
+        )
+        return near_comps
+
+    def known_competitions_store(self) -> KnownCompetitionsStore | None:
+        known_comps = self.opts.known_competitions
+        if known_comps is None and self.opts.known_competitions_io is not None:
+            known_comps = KnownCompetitions(self.opts.known_competitions_io)
+        if isinstance(known_comps, KnownCompetitions):
+            # An incremental fetch is not a full listing, so keep the IDs that
+            # were not fetched this time
+            known_comps.keep_unlisted = self.incremental
+        return known_comps
+
     def filter_competitions(self, competitions: list[Competition]) -> list[Competition]:
-        if self.opts.known_competitions_io is None:
+        return self.classify_competitions(competitions).new
+
+    def classify_competitions(
+        self, competitions: list[Competition]
+    ) -> CompetitionChanges:
+        known_comps = self.known_competitions_store()
+        if known_comps is None:
             self.logger.info("Not filtering competitions")
-            return competitions
+            return CompetitionChanges(new=competitions)
+
+        with self.instrumentation.time_stage("filter"):
+            changes = known_comps.classify_competitions(competitions)
+        self.instrumentation.increment("competitions_filtered", len(competitions))
+        self.count_changes(changes)
+        return changes
+
+    def classify_competition_pages(
+        self, pages: _TimedStage[list[Competition]]
+    ) -> _TimedStage[CompetitionChanges]:
+        "Classifies pages as they arrive, and returns the next stage of the pipeline"
+        known_comps = self.known_competitions_store()
+        if known_comps is None:
+            self.logger.info("Not filtering competitions")
+            all_new = (CompetitionChanges(new=page) for page in pages)
+            return _TimedStage(self.instrumentation, None, all_new, pages)
+
+        def counted(pages: Iterable[list[Competition]]) -> Iterator[list[Competition]]:
+            for page in pages:
+                self.instrumentation.increment("competitions_filtered", len(page))
+                yield page
+
+        def classified() -> Iterator[CompetitionChanges]:
+            for changes in known_comps.classify_competition_pages(counted(pages)):
+                self.count_changes(changes)
+                yield changes
+
+        return _TimedStage(self.instrumentation, "filter", classified(), pages)
+
+    def count_changes(self, changes: CompetitionChanges) -> None:
+        self.instrumentation.increment("competitions_new", len(changes.new))
+        self.instrumentation.increment("competitions_changed", len(changes.changed))
+
+    def print_competitions(
+        self,
+        competitions: list[Competition],
+        changed_competitions: Sequence[Competition] = (),
+    ) -> None:
+        changes = CompetitionChanges(competitions, list(changed_competitions))
+        self.print_competition_changes([changes])
+
+    def print_competition_changes(
+        self,
+        pages: Iterable[CompetitionChanges],
+        upstream: _TimedStage[Any] | None = None,
+    ) -> None:
+        """
+        Prints competitions as they arrive, except in the text format. Other
+        formats list changed competitions along with new ones. When the pages
+        are pulled through `upstream`, its time is not counted as rendering.
+        """
+        stdout_io = self.opts.stdout_io
+        output_format = self.opts.output_format
+        if output_format != "text":
+            from .output_writers import competition_writer
+
+            writer = competition_writer(output_format)
+            competitions = (
+                comp for changes in pages for comp in changes.new + changes.changed
+            )
+            upstream_before = upstream.total_seconds if upstream is not None else 0.0
+            start = time.perf_counter()
+            count = writer.write(competitions, stdout_io)
+            seconds = time.perf_counter() - start
+            if upstream is not None:
+                seconds -= upstream.total_seconds - upstream_before
+            self.instrumentation.record_duration("render", seconds)
+            self.logger.info("Wrote %r competitions as %s", count, output_format)
+            return
+
+        # The text template starts with the number of competitions
+        all_changes = self.merge_changes(pages)
+        self.logger.info(
+            "Printing %r new and %r changed competitions",
+            len(all_changes.new),
+            len(all_changes.changed),
+        )
+        with self.instrumentation.time_stage("render"):
+            for chunk in self.stream_competitions(all_changes.new, all_changes.changed):
+                stdout_io.write(chunk)
+            stdout_io.write("\n")
+
+    def merge_changes(self, pages: Iterable[CompetitionChanges]) -> CompetitionChanges:
+        all_changes = CompetitionChanges()
+        for changes in pages:
+            all_changes.extend(changes)
+        return all_changes
+
+    def email_addresses(self, to_address: str) -> tuple[str, str]:
+        "Returns the From address and subject for an email to `to_address`"
+        from_address = self.opts.email_from
+        if from_address is None:
+            from_address = to_address
+        subject = self.opts.email_subject
+        if subject is None:
+            subject = "WCA Competition Notification"
+        return from_address, subject
+
+    def build_email(
+        self,
+        competitions: list[Competition],
+        to_address: str,
+        changed_competitions: Sequence[Competition] = (),
+    ) -> OutgoingEmail:
+        with self.instrumentation.time_stage("render"):
+            rendered_content = self.render_competitions(
+                competitions, changed_competitions
+            )
+        from_address, subject = self.email_addresses(to_address)
+        return OutgoingEmail(
+            to_address=to_address,
+            from_address=from_address,
+            subject=subject,
+            content=rendered_content,
+        )
+
+    def render_competitions(
+        self,
+        competitions: list[Competition],
+        changed_competitions: Sequence[Competition] = (),
+    ) -> str:
+        return "".join(self.stream_competitions(competitions, changed_competitions))
 
-        known_comps = KnownCompetitions(self.opts.known_competitions_io)
-        filtered_comps = known_comps.filter_competitions(competitions)
-        return filtered_comps
+    def stream_competitions(
+        self,
+        competitions: list[Competition],
+        changed_competitions: Sequence[Competition] = (),
+    ) -> Iterator[str]:
+        "Renders competitions in chunks, without building the whole text first"
+        template = _competitions_template(self.opts.template_cache_dir)
+        return _cleandoc_lines(
+            template.generate(
+                competitions=competitions, changed_competitions=changed_competitions
+            )
+        )
+
+
+class CompetitionNotifierInvocation(BaseCompetitionNotifierInvocation):
+    def __init__(
+        self,
+        competition_api: CompetitionAPI,
+        email_service: EmailService,
+        options: CompetitionNotifierOptions,
+    ) -> None:
+        super().__init__(options)
+        self.competition_api = competition_api
+        self.email_service = email_service
+
+    def __call__(self, *args: Any, **kwds: Any) -> Any:
+        # Each page is converted, filtered and output before the next one is
+        # needed, so only the text template and email wait for every page
+        pages: Iterable[list[Competition]] = (
+            self.near_competitions(page) for page in self.fetch_competition_pages()
+        )
+        if self.opts.email_to is not None or self.opts.output_format == "text":
+            # Some stores record each page as known once it is classified, so
+            # when nothing is output until the last page, classify the listing
+            # only once every page has been fetched. Otherwise, a failed fetch
+            # would keep competitions on earlier pages from ever being output.
+            pages = _whole_listing(pages)
+        fetched_pages = _TimedStage(self.instrumentation, "fetch", pages)
+        classified_pages = self.classify_competition_pages(fetched_pages)
+        self.output_competition_changes(classified_pages)
+        self.save_fetch_cursor()
+
+    def fetch_competitions(self) -> list[Competition]:
+        combinations = self.fetch_combinations()
+        if len(combinations) == 1:
+            query, country = combinations[0]
+            return self.fetch_competitions_for(query, country)
+
+        max_workers = min(self.opts.fetch_workers, len(combinations))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(
+                lambda combination: self.fetch_competitions_for(*combination),
+                combinations,
+            )
+            return self.merge_competitions(results)
+
+    def fetch_competition_pages(self) -> Iterable[list[Competition]]:
+        """
+        Returns competitions a page at a time. Several queries or countries are
+        fetched in parallel and merged into one page, to keep them in order.
+        """
+        combinations = self.fetch_combinations()
+        if len(combinations) == 1:
+            query, country = combinations[0]
+            return self.fetch_competition_pages_for(query, country)
+        return [self.fetch_competitions()]
+
+    def fetch_competition_pages_for(
+        self, query: str | None, country: str | None
+    ) -> Iterator[list[Competition]]:
+        # Not a generator itself, so whether the fetch is incremental is known
+        # before the pages are filtered
+        self.log_fetch(query, country)
+        announced_after = self.announced_after(query, country)
+        json_pages = self.competition_api.iter_competition_pages(
+            query=query, country=country, **announced_after_args(announced_after)
+        )
+
+        def pages() -> Iterator[list[Competition]]:
+            # Pages can overlap if competitions are added while we are fetching
+            seen_ids: set[str] = set()
+            for json_competitions in json_pages:
+                self.observe_fetch(query, country, json_competitions, announced_after)
+                json_competitions = [
+                    json_comp
+                    for json_comp in json_competitions
+                    if json_comp["id"] not in seen_ids
+                ]
+                seen_ids.update(json_comp["id"] for json_comp in json_competitions)
+                yield self.competitions_from_dicts(json_competitions)
+
+        return pages()
+
+    def fetch_competitions_for(
+        self, query: str | None, country: str | None
+    ) -> list[Competition]:
+        self.log_fetch(query, country)
+        announced_after = self.announced_after(query, country)
+        json_competitions = self.competition_api.fetch_competitions(
+            query=query, country=country, **announced_after_args(announced_after)
+        )
+        self.observe_fetch(query, country, json_competitions, announced_after)
+        return self.competitions_from_dicts(json_competitions)
 
     def output_competitions(self, competitions: list[Competition]) -> None:
         if self.opts.email_to is None:
@@ -82,23 +555,38 @@ class CompetitionNotifierInvocation:
         else:
             self.email_competitions(competitions, self.opts.email_to)
 
-    def print_competitions(self, competitions: list[Competition]) -> None:
-        self.logger.info("Printing %r competitions", len(competitions))
-        rendered = self.render_competitions(competitions)
-        print(rendered, file=self.opts.stdout_io)
+    def output_competition_changes(
+        self, pages: _TimedStage[CompetitionChanges]
+    ) -> None:
+        if self.opts.email_to is None:
+            self.print_competition_changes(pages, upstream=pages)
+        else:
+            changes = self.merge_changes(pages)
+            self.email_competitions(changes.new, self.opts.email_to, changes.changed)
 
     def email_competitions(
-        self, competitions: list[Competition], email_address: str
+        self,
+        competitions: list[Competition],
+        email_address: str,
+        changed_competitions: Sequence[Competition] = (),
     ) -> None:
-        if len(competitions) > 0:
-            self.send_email(competitions, email_address)
+        if len(competitions) > 0 or len(changed_competitions) > 0:
+            self.send_email(competitions, email_address, changed_competitions)
         else:
             self.logger.info("No competitions, so skipping email")
 
-    def send_email(self, competitions: list[Competition], to_address: str) -> None:
+    def send_email(
+        self,
+        competitions: list[Competition],
+        to_address: str,
+        changed_competitions: Sequence[Competition] = (),
+    ) -> None:
         try:
             self.logger.info(
-                "Emailing %r competitions to %r", len(competitions), to_address
+                "Emailing %r new and %r changed competitions to %r",
+                len(competitions),
+                len(changed_competitions),
+                to_address,
             )
 
             self.email_service.configure_smtp(
@@ -108,49 +596,238 @@ class CompetitionNotifierInvocation:
                 self.opts.smtp_password,
             )
 
-            rendered_content = self.render_competitions(competitions)
-            from_address = self.opts.email_from
-            if from_address is None:
-                from_address = to_address
-            subject = self.opts.email_subject
-            if subject is None:
-                subject = "WCA Competition Notification"
-            self.email_service.send_email(
-                to_address=to_address,
-                from_address=from_address,
-                subject=subject,
-                content=rendered_content,
-            )
+            email = self.build_email(competitions, to_address, changed_competitions)
+            with self.instrumentation.time_stage("smtp"):
+                self.email_service.send_email(
+                    to_address=email.to_address,
+                    from_address=email.from_address,
+                    subject=email.subject,
+                    content=email.content,
+                )
+            self.instrumentation.increment("emails_sent")
         except ConnectionRefusedError:
             raise CommandError(
                 f"Cannot send email: Connection refused: {self.opts.smtp_host}"
             )
 
-    def render_competitions(self, competitions: list[Competition]) -> str:
-        env = Environment(
-            loader=PackageLoader("cube_comp"),
-            autoescape=select_autoescape(),
-            trim_blocks=True,
-            lstrip_blocks=True,
-            keep_trailing_newline=False,
+
+# Notifies many subscribers in one run. Subscribers are grouped by their query
+# and country, and each distinct combination is fetched once. Then every
+# subscriber gets their own known competitions filter and output, and all
+# emails are sent as one batch. Options that a subscription does not set, such
+# as the SMTP settings, come from `options`.
+class SubscriptionsInvocation:
+    def __init__(
+        self,
+        competition_api: CompetitionAPI,
+        email_service: EmailService,
+        subscriptions: "list[Subscription]",
+        options: CompetitionNotifierOptions,
+    ) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.competition_api = competition_api
+        self.email_service = email_service
+        self.subscriptions = subscriptions
+        self.opts = options
+        self.instrumentation = options.instrumentation
+
+    def __call__(self, *args: Any, **kwds: Any) -> Any:
+        with self.instrumentation.time_stage("fetch"):
+            competitions_by_key = self.fetch_competitions()
+        # Subscribers near different places share one index per fetch
+        geo_indexes: dict[tuple[str | None, str | None], "GeoGridIndex"] = {}
+        failures = []
+        emails: list[tuple[str, OutgoingEmail]] = []
+        for subscription in self.subscriptions:
+            competitions = competitions_by_key[subscription.fetch_key]
+            geo_index = None
+            if subscription.near is not None:
+                geo_index = geo_indexes.get(subscription.fetch_key)
+                if geo_index is None:
+                    from .geo_index import GeoGridIndex
+
+                    geo_index = GeoGridIndex(competitions)
+                    geo_indexes[subscription.fetch_key] = geo_index
+            try:
+                email = self.notify_subscriber(subscription, competitions, geo_index)
+                if email is not None:
+                    emails.append((subscription.name, email))
+            except Exception as e:
+                # Don't let one subscriber stop the others from being notified
+                self.logger.exception("Cannot notify %r: %s", subscription.name, e)
+                failures.append(subscription.name)
+
+        failures.extend(self.send_emails(emails))
+        if len(failures) > 0:
+            raise CommandError(
+                f"Cannot notify {len(failures)} subscribers: {', '.join(failures)}"
+            )
+
+    def fetch_competitions(
+        self,
+    ) -> dict[tuple[str | None, str | None], list[Competition]]:
+        keys = list(dict.fromkeys(sub.fetch_key for sub in self.subscriptions))
+        if len(keys) == 0:
+            return {}
+        self.logger.info(
+            "Fetching %r combinations for %r subscribers",
+            len(keys),
+            len(self.subscriptions),
         )
-        template = env.get_template("competitions.txt.j2")
-        rendered = template.render(competitions=competitions)
-        rendered = inspect.cleandoc(rendered)
-        return rendered
 
+        # Subscribers share fetches but not known competitions, so every
+        # subscriber needs the full listing.
+        fetch_options = copy.copy(self.opts)
+        fetch_options.fetch_cursor = None
+        fetcher = CompetitionNotifierInvocation(
+            self.competition_api, self.email_service, fetch_options
+        )
+        max_workers = min(self.opts.fetch_workers, len(keys))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(
+                lambda key: fetcher.fetch_competitions_for(*key), keys
+            )
+            return dict(zip(keys, results))
+
+    def notify_subscriber(
+        self,
+        subscription: "Subscription",
+        competitions: list[Competition],
+        geo_index: "GeoGridIndex | None" = None,
+    ) -> OutgoingEmail | None:
+        "Filters and prints competitions, or returns the email to send"
+        with contextlib.ExitStack() as stack:
+            options = self.subscriber_options(subscription)
+            if subscription.known is not None:
+                options.known_competitions = open_known_competitions(
+                    subscription.known,
+                    stack,
+                    subscription.name,
+                    bloom_filter=self.opts.known_bloom_filter,
+                    lock_timeout=self.opts.lock_timeout,
+                )
+            invocation = CompetitionNotifierInvocation(
+                self.competition_api, self.email_service, options
+            )
+            competitions = invocation.near_competitions(competitions, geo_index)
+            changes = invocation.classify_competitions(competitions)
 
+        if subscription.email_to is None:
+            invocation.print_competitions(changes.new, changes.changed)
+            return None
+        if len(changes) == 0:
+            self.logger.info(
+                "No competitions for %r, so skipping email", subscription.name
+            )
+            return None
+        return invocation.build_email(
+            changes.new, subscription.email_to, changes.changed
+        )
+
+    def send_emails(self, emails: list[tuple[str, OutgoingEmail]]) -> list[str]:
+        "Sends the emails, and returns the names of subscribers not reached"
+        if len(emails) == 0:
+            return []
+        self.logger.info("Sending %r emails", len(emails))
+        self.email_service.configure_smtp(
+            self.opts.smtp_host,
+            self.opts.smtp_port,
+            self.opts.smtp_user,
+            self.opts.smtp_password,
+        )
+        with self.instrumentation.time_stage("smtp"):
+            failed = self.email_service.send_emails([email for _, email in emails])
+        self.instrumentation.increment("emails_sent", len(emails) - len(failed))
+        self.instrumentation.increment("emails_failed", len(failed))
+        failed_ids = {id(email) for email in failed}
+        return [name for name, email in emails if id(email) in failed_ids]
+
+    def subscriber_options(
+        self, subscription: "Subscription"
+    ) -> CompetitionNotifierOptions:
+        # A shallow copy also keeps the SMTP settings, which are not fields
+        options = copy.copy(self.opts)
+        options.query = subscription.query
+        options.country = subscription.country
+        options.queries = []
+        options.countries = []
+        options.near = None
+        if subscription.near is not None:
+            latitude, longitude = subscription.near
+            options.near = (latitude, longitude)
+        if subscription.radius_km is not None:
+            options.radius_km = subscription.radius_km
+        options.known_competitions = None
+        options.known_competitions_io = None
+        options.email_to = subscription.email_to
+        if subscription.email_from is not None:
+            options.email_from = subscription.email_from
+        if subscription.email_subject is not None:
+            options.email_subject = subscription.email_subject
+        return options
+
+
+# Accepts either blocking or asyncio implementations of the competition API and
+# email service. `notify_async` adapts blocking implementations to run on the
+# default executor, and `notify` runs the asyncio pipeline to completion if
+# either service is asyncio-native.
 class CompetitionNotifier:
     def __init__(
         self,
-        competition_api: CompetitionAPI,
-        email_service: EmailService,
+        competition_api: "CompetitionAPI | AsyncCompetitionAPI",
+        email_service: "EmailService | AsyncEmailService",
     ) -> None:
         self._competition_api = competition_api
         self._email_service = email_service
 
     def notify(self, options: CompetitionNotifierOptions) -> None:
+        if self._is_async(self._competition_api.fetch_competitions) or self._is_async(
+            self._email_service.send_email
+        ):
+            import asyncio
+
+            asyncio.run(self.notify_async(options))
+            return
+
         invocation = CompetitionNotifierInvocation(
-            self._competition_api, self._email_service, options
+            cast(CompetitionAPI, self._competition_api),
+            cast(EmailService, self._email_service),
+            options,
         )
         invocation()
+
+    def notify_subscriptions(
+        self, subscriptions: "list[Subscription]", options: CompetitionNotifierOptions
+    ) -> None:
+        invocation = SubscriptionsInvocation(
+            cast(CompetitionAPI, self._competition_api),
+            cast(EmailService, self._email_service),
+            subscriptions,
+            options,
+        )
+        invocation()
+
+    async def notify_async(self, options: CompetitionNotifierOptions) -> None:
+        from .async_competition_notifier import AsyncCompetitionNotifierInvocation
+
+        invocation = AsyncCompetitionNotifierInvocation(
+            self._async_competition_api(), self._async_email_service(), options
+        )
+        await invocation()
+
+    def _async_competition_api(self) -> "AsyncCompetitionAPI":
+        from .async_competition_api import AsyncCompetitionAPIAdapter
+
+        if self._is_async(self._competition_api.fetch_competitions):
+            return cast("AsyncCompetitionAPI", self._competition_api)
+        return AsyncCompetitionAPIAdapter(cast(CompetitionAPI, self._competition_api))
+
+    def _async_email_service(self) -> "AsyncEmailService":
+        from .async_email_service import AsyncEmailServiceAdapter
+
+        if self._is_async(self._email_service.send_email):
+            return cast("AsyncEmailService", self._email_service)
+        return AsyncEmailServiceAdapter(cast(EmailService, self._email_service))
+
+    def _is_async(self, method: Any) -> bool:
+        return inspect.iscoroutinefunction(method)
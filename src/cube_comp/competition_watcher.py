@@ -0,0 +1,117 @@
+import logging
+import random
+import signal
+import threading
+from types import FrameType
+from typing import TYPE_CHECKING, Any, Callable
+
+from .competition_notifier import CompetitionNotifier, CompetitionNotifierOptions
+
+if TYPE_CHECKING:
+    from .subscriptions import Subscription
+
+
+# Runs a notifier on a schedule in a long-lived process, so the HTTP session,
+# templates and known competitions stay warm between polls. Each delay is the
+# interval scaled by a random factor within +/- `jitter`, to avoid many
+# watchers polling in lockstep.
+#
+# SIGTERM and SIGINT stop the watcher after the current poll. SIGHUP calls
+# `on_reload`, for example to reopen state files, and polls immediately.
+class CompetitionWatcher:
+    def __init__(
+        self,
+        notifier: CompetitionNotifier,
+        options: CompetitionNotifierOptions,
+        interval: float,
+        jitter: float = 0.1,
+        on_reload: Callable[[], None] | None = None,
+        subscriptions: "list[Subscription] | None" = None,
+        on_poll: Callable[[], None] | None = None,
+    ) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.notifier = notifier
+        self.options = options
+        self.interval = interval
+        self.jitter = jitter
+        self.on_reload = on_reload
+        # Notify these subscribers on each poll, instead of using `options` alone
+        self.subscriptions = subscriptions
+        # Called after every poll, whether or not it succeeded
+        self.on_poll = on_poll
+        self.poll_count = 0
+
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._reloading = False
+
+    def run(self) -> None:
+        previous_handlers = self._install_signal_handlers()
+        try:
+            self.logger.info("Watching every %r seconds", self.interval)
+            while not self._stopping:
+                if self._reloading:
+                    self._reload()
+                self.poll()
+                if self._stopping:
+                    break
+                delay = self.next_delay()
+                self.logger.info("Next poll in %.1f seconds", delay)
+                self._wakeup.wait(delay)
+                self._wakeup.clear()
+            self.logger.info("Stopped watching")
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+
+    def poll(self) -> None:
+        self.poll_count += 1
+        try:
+            if self.subscriptions is not None:
+                self.notifier.notify_subscriptions(self.subscriptions, self.options)
+            else:
+                self.notifier.notify(self.options)
+        except Exception as e:
+            # Keep watching; the next poll may well succeed.
+            self.logger.exception("Poll failed: %s", e)
+        if self.on_poll is not None:
+            self.on_poll()
+
+    def next_delay(self) -> float:
+        factor = 1.0 + random.uniform(-self.jitter, self.jitter)
+        return max(0.0, self.interval * factor)
+
+    def stop(self) -> None:
+        self._stopping = True
+        self._wakeup.set()
+
+    def reload(self) -> None:
+        self._reloading = True
+        self._wakeup.set()
+
+    def _reload(self) -> None:
+        self._reloading = False
+        self.logger.info("Reloading")
+        if self.on_reload is not None:
+            self.on_reload()
+
+    def _install_signal_handlers(self) -> dict[int, Any]:
+        # Returns the previous handlers, to be restored afterwards
+        if threading.current_thread() is not threading.main_thread():
+            return {}
+
+        def handle_stop(signum: int, frame: FrameType | None) -> None:
+            self.logger.info("Received signal %r, stopping", signum)
+            self.stop()
+
+        def handle_reload(signum: int, frame: FrameType | None) -> None:
+            self.reload()
+
+        handlers = {signal.SIGTERM: handle_stop, signal.SIGINT: handle_stop}
+        # SIGHUP does not exist on Windows
+        if hasattr(signal, "SIGHUP"):
+            handlers[signal.SIGHUP] = handle_reload
+        return {
+            signum: signal.signal(signum, handler)
+            for signum, handler in handlers.items()
+        }
@@ -1,8 +1,24 @@
-import smtplib
-from email.message import EmailMessage
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
 
 from typing_extensions import Protocol
 
+# smtplib and the email package are slow to import, so they are imported where
+# email is actually sent.
+if TYPE_CHECKING:
+    import smtplib
+    from email.message import EmailMessage
+
+
+@dataclass
+class OutgoingEmail:
+    to_address: str
+    from_address: str
+    subject: str
+    content: str
+
 
 class EmailService(Protocol):
     def configure_smtp(
@@ -19,13 +35,36 @@ class EmailService(Protocol):
     ) -> None:
         pass
 
+    def send_emails(self, emails: list[OutgoingEmail]) -> list[OutgoingEmail]:
+        "Sends every email, and returns the ones that could not be sent"
+        import smtplib
+
+        failed = []
+        for email in emails:
+            try:
+                self.send_email(
+                    email.to_address, email.from_address, email.subject, email.content
+                )
+            except (OSError, smtplib.SMTPException) as e:
+                logging.getLogger(__name__).error(
+                    "Cannot send email to %r: %s", email.to_address, e
+                )
+                failed.append(email)
+        return failed
+
 
 class SMTPEmailService(EmailService):
-    def __init__(self) -> None:
+    def __init__(
+        self, max_messages_per_connection: int = 100, connections: int = 1
+    ) -> None:
         self.smtp_host = "localhost"
         self.smtp_port = 25
         self.smtp_user: str | None = None
         self.smtp_password: str | None = None
+        # Servers often limit how many messages one connection may send
+        self.max_messages_per_connection = max_messages_per_connection
+        # Number of connections send_emails spreads messages across
+        self.connections = connections
 
     def configure_smtp(
         self,
@@ -39,14 +78,46 @@ class SMTPEmailService(EmailService):
         self.smtp_user = smtp_user
         self.smtp_password = smtp_password
 
+    def session(self) -> "SMTPSession":
+        "Returns a session that sends many messages over one connection"
+        return SMTPSession(self)
+
     def send_email(
         self, to_address: str, from_address: str, subject: str, content: str
     ) -> None:
-        msg = EmailMessage()
-        msg.set_content(content)
-        msg["Subject"] = subject
-        msg["To"] = to_address
-        msg["From"] = from_address
+        msg = self._build_message(to_address, from_address, subject, content)
+        with self.session() as session:
+            session.send_message(msg)
+
+    def send_emails(self, emails: list[OutgoingEmail]) -> list[OutgoingEmail]:
+        if len(emails) == 0:
+            return []
+        connections = max(1, min(self.connections, len(emails)))
+        batches = [emails[i::connections] for i in range(connections)]
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            results = executor.map(self._send_batch, batches)
+            return [email for failed in results for email in failed]
+
+    def _send_batch(self, emails: list[OutgoingEmail]) -> list[OutgoingEmail]:
+        import smtplib
+
+        failed = []
+        with self.session() as session:
+            for email in emails:
+                msg = self._build_message(
+                    email.to_address, email.from_address, email.subject, email.content
+                )
+                try:
+                    session.send_message(msg)
+                except (OSError, smtplib.SMTPException) as e:
+                    session.logger.error(
+                        "Cannot send email to %r: %s", email.to_address, e
+                    )
+                    failed.append(email)
+        return failed
+
+    def _connect(self) -> "smtplib.SMTP":
+        import smtplib
 
         s = smtplib.SMTP(self.smtp_host, port=self.smtp_port)
         if self.smtp_port == 587:
@@ -54,5 +125,80 @@ class SMTPEmailService(EmailService):
             if self.smtp_user is not None:
                 assert self.smtp_password is not None
                 s.login(self.smtp_user, self.smtp_password)
-        s.send_message(msg)
-        s.quit()
+        return s
+
+    def _build_message(
+        self, to_address: str, from_address: str, subject: str, content: str
+    ) -> "EmailMessage":
+        from email.message import EmailMessage
+
+        msg = EmailMessage()
+        msg.set_content(content)
+        msg["Subject"] = subject
+        msg["To"] = to_address
+        msg["From"] = from_address
+        return msg
+
+
+# Keeps one authenticated SMTP connection open across many messages. The
+# connection is replaced after the service's message limit, and when the
+# server drops it or answers 421 (service not available), in which case the
+# message is retried once on a fresh connection.
+class SMTPSession:
+    def __init__(self, service: SMTPEmailService) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.service = service
+        self._smtp: "smtplib.SMTP | None" = None
+        self._sent_on_connection = 0
+
+    def __enter__(self) -> "SMTPSession":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def send_message(self, msg: "EmailMessage") -> None:
+        import smtplib
+
+        limit = self.service.max_messages_per_connection
+        if self._smtp is not None and self._sent_on_connection >= limit:
+            self.logger.info("Reconnecting after %r messages", limit)
+            self.close()
+
+        try:
+            self._connection().send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            self.logger.info("Server disconnected, reconnecting")
+            self._drop()
+            self._connection().send_message(msg)
+        except smtplib.SMTPResponseException as e:
+            if e.smtp_code != 421:
+                raise
+            self.logger.info("Server closing connection (421), reconnecting")
+            self._drop()
+            self._connection().send_message(msg)
+        self._sent_on_connection += 1
+
+    def close(self) -> None:
+        import smtplib
+
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (OSError, smtplib.SMTPException):
+            pass
+        finally:
+            self._smtp = None
+
+    def _connection(self) -> "smtplib.SMTP":
+        if self._smtp is None:
+            self._smtp = self.service._connect()
+            self._sent_on_connection = 0
+        return self._smtp
+
+    def _drop(self) -> None:
+        # The server has already gone, so don't wait for a QUIT reply
+        if self._smtp is not None:
+            self._smtp.close()
+            self._smtp = None
@@ -0,0 +1,274 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from .email_service import EmailService, OutgoingEmail
+from .file_lock import atomic_write
+
+
+@dataclass
+class SpooledEmail:
+    path: Path
+    email: OutgoingEmail
+    attempts: int = 0
+    last_error: str | None = None
+
+
+# A directory queue of outgoing email, laid out like a maildir. Messages are
+# written to `tmp/` and renamed into `new/`, so readers never see partial
+# files. A sender claims a message by renaming it into `cur/`, and only one
+# rename can win. Messages that keep failing are moved to `dead/`.
+#
+# File names start with the time before which the message must not be sent,
+# so the queue is ordered and delayed retries are skipped without reading them.
+class EmailSpool:
+    def __init__(self, directory: Path) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.directory = directory
+        self.tmp_dir = directory / "tmp"
+        self.new_dir = directory / "new"
+        self.cur_dir = directory / "cur"
+        self.dead_dir = directory / "dead"
+        for path in [self.tmp_dir, self.new_dir, self.cur_dir, self.dead_dir]:
+            path.mkdir(parents=True, exist_ok=True)
+
+    def enqueue(self, email: OutgoingEmail) -> Path:
+        return self._write(self.new_dir, email, attempts=0, not_before=time.time())
+
+    def pending_count(self) -> int:
+        return sum(1 for _ in self.new_dir.glob("*.json"))
+
+    def dead_count(self) -> int:
+        return sum(1 for _ in self.dead_dir.glob("*.json"))
+
+    def claim(self, limit: int) -> list[SpooledEmail]:
+        "Claims up to `limit` messages that are due to be sent"
+        now_key = self._time_key(time.time())
+        claimed: list[SpooledEmail] = []
+        for path in sorted(self.new_dir.glob("*.json")):
+            if len(claimed) >= limit or path.name[: len(now_key)] > now_key:
+                break
+            cur_path = self.cur_dir / path.name
+            try:
+                os.rename(path, cur_path)
+            except FileNotFoundError:
+                # Another sender claimed it first
+                continue
+            # Record the claim time, for recover()
+            os.utime(cur_path)
+            claimed.append(self._read(cur_path))
+        return claimed
+
+    def complete(self, item: SpooledEmail) -> None:
+        item.path.unlink(missing_ok=True)
+
+    def retry(self, item: SpooledEmail, delay: float, error: str) -> None:
+        self._write(
+            self.new_dir,
+            item.email,
+            attempts=item.attempts + 1,
+            not_before=time.time() + delay,
+            last_error=error,
+        )
+        item.path.unlink(missing_ok=True)
+
+    def dead_letter(self, item: SpooledEmail, error: str) -> None:
+        self.logger.error(
+            "Giving up on email to %r after %r attempts: %s",
+            item.email.to_address,
+            item.attempts + 1,
+            error,
+        )
+        self._write(
+            self.dead_dir,
+            item.email,
+            attempts=item.attempts + 1,
+            not_before=time.time(),
+            last_error=error,
+        )
+        item.path.unlink(missing_ok=True)
+
+    def recover(self, stale_after: float = 3600.0) -> int:
+        """
+        Returns messages claimed more than `stale_after` seconds ago, by senders
+        that presumably died, back to the queue.
+        """
+        recovered = 0
+        cutoff = time.time() - stale_after
+        for path in self.cur_dir.glob("*.json"):
+            try:
+                if path.stat().st_mtime > cutoff:
+                    continue
+                os.rename(path, self.new_dir / path.name)
+                recovered += 1
+            except FileNotFoundError:
+                continue
+        if recovered > 0:
+            self.logger.info("Recovered %r claimed messages", recovered)
+        return recovered
+
+    def _write(
+        self,
+        directory: Path,
+        email: OutgoingEmail,
+        attempts: int,
+        not_before: float,
+        last_error: str | None = None,
+    ) -> Path:
+        name = f"{self._time_key(not_before)}-{uuid.uuid4().hex}.json"
+        document = {
+            "email": asdict(email),
+            "attempts": attempts,
+            "last_error": last_error,
+        }
+        path = directory / name
+        # Only the sender reads queued emails
+        atomic_write(
+            path, json.dumps(document), mode=0o600, fsync=True, temp_dir=self.tmp_dir
+        )
+        return path
+
+    def _read(self, path: Path) -> SpooledEmail:
+        with open(path) as file:
+            document = json.load(file)
+        return SpooledEmail(
+            path=path,
+            email=OutgoingEmail(**document["email"]),
+            attempts=document["attempts"],
+            last_error=document.get("last_error"),
+        )
+
+    def _time_key(self, timestamp: float) -> str:
+        # Fixed width, so names sort in time order
+        return f"{int(timestamp * 1000):015d}"
+
+
+# An EmailService that only writes messages to a spool. A SpoolSender delivers
+# them later, so a run never waits on the mail server.
+class SpoolingEmailService(EmailService):
+    def __init__(self, spool: EmailSpool) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.spool = spool
+
+    def configure_smtp(
+        self,
+        smtp_host: str,
+        smtp_port: int,
+        smtp_user: str | None = None,
+        smtp_password: str | None = None,
+    ) -> None:
+        # The SpoolSender's email service is configured instead
+        pass
+
+    def send_email(
+        self, to_address: str, from_address: str, subject: str, content: str
+    ) -> None:
+        email = OutgoingEmail(to_address, from_address, subject, content)
+        path = self.spool.enqueue(email)
+        self.logger.info("Spooled email to %r as %r", to_address, path.name)
+
+    def send_emails(self, emails: list[OutgoingEmail]) -> list[OutgoingEmail]:
+        for email in emails:
+            self.spool.enqueue(email)
+        self.logger.info("Spooled %r emails", len(emails))
+        return []
+
+
+# Drains a spool with a pool of worker threads. Each worker claims a batch and
+# hands it to the email service, so a batch shares one SMTP connection. Failed
+# messages are retried with jittered exponential backoff, and dead-lettered
+# after `max_attempts`.
+class SpoolSender:
+    def __init__(
+        self,
+        spool: EmailSpool,
+        email_service: EmailService,
+        workers: int = 4,
+        batch_size: int = 20,
+        max_attempts: int = 5,
+        backoff: float = 30.0,
+    ) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.spool = spool
+        self.email_service = email_service
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._count_lock = threading.Lock()
+        self.sent_count = 0
+        self.failed_count = 0
+
+    def drain(self) -> None:
+        "Sends every message that is due, and returns when none are left"
+        threads = [
+            threading.Thread(target=self._work, name=f"spool-sender-{i}")
+            for i in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.logger.info(
+            "Sent %r spooled emails, %r failed", self.sent_count, self.failed_count
+        )
+
+    def start(self, interval: float = 10.0) -> None:
+        "Drains the spool every `interval` seconds in the background"
+        self.spool.recover()
+
+        def run() -> None:
+            while not self._stopping.is_set():
+                try:
+                    self.drain()
+                except Exception as e:
+                    self.logger.exception("Cannot drain spool: %s", e)
+                self._stopping.wait(interval)
+
+        self._thread = threading.Thread(target=run, name="spool-sender")
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _work(self) -> None:
+        while not self._stopping.is_set():
+            batch = self.spool.claim(self.batch_size)
+            if len(batch) == 0:
+                return
+            self._send_batch(batch)
+
+    def _send_batch(self, batch: list[SpooledEmail]) -> None:
+        try:
+            failed = self.email_service.send_emails([item.email for item in batch])
+            error = "Send failed"
+        except Exception as e:
+            failed = [item.email for item in batch]
+            error = str(e)
+
+        failed_ids = {id(email) for email in failed}
+        for item in batch:
+            if id(item.email) not in failed_ids:
+                self.spool.complete(item)
+            elif item.attempts + 1 >= self.max_attempts:
+                self.spool.dead_letter(item, error)
+            else:
+                delay = self.backoff * 2**item.attempts
+                delay += random.uniform(0, delay / 2)
+                self.spool.retry(item, delay, error)
+
+        with self._count_lock:
+            self.sent_count += len(batch) - len(failed_ids)
+            self.failed_count += len(failed_ids)
@@ -0,0 +1,111 @@
+import json
+import logging
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+from .command_error import CommandError
+from .file_lock import FileLock, atomic_write
+
+
+@dataclass
+class _CursorEntry:
+    # Newest `announced_at` seen, as returned by the API
+    announced_at: str | None = None
+    # When every competition was last fetched, in ISO 8601
+    full_sync_at: str | None = None
+
+
+# Remembers the newest announcement seen for each query and country, so that
+# the next run only asks for competitions announced since then. A full fetch
+# is done when there is no cursor yet, and again every `resync_interval`, to
+# pick up anything an incremental fetch could miss.
+#
+# Cursors only move forward in save(), after the fetched competitions have
+# been handled, so a failed run fetches the same competitions again. Processes
+# sharing the file save under a FileLock, and keep each other's cursors.
+class FetchCursor:
+    # Competitions announced within this long before the cursor are fetched
+    # again, in case several were announced at the same time. The known
+    # competitions store drops the repeats.
+    OVERLAP = timedelta(minutes=1)
+    DEFAULT_RESYNC_INTERVAL = 24 * 60 * 60.0
+
+    def __init__(
+        self,
+        path: Path,
+        resync_interval: float = DEFAULT_RESYNC_INTERVAL,
+        lock_timeout: float = FileLock.DEFAULT_TIMEOUT,
+    ) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.resync_interval = resync_interval
+        self.lock = FileLock(path, lock_timeout)
+        self._entries = self._read()
+        self._pending: dict[str, _CursorEntry] = {}
+
+    def announced_after(self, query: str | None, country: str | None) -> str | None:
+        """
+        Returns the time to fetch competitions announced after, or None if all
+        competitions should be fetched.
+        """
+        entry = self._entries.get(self._key(query, country))
+        if entry is None or entry.announced_at is None or entry.full_sync_at is None:
+            return None
+        now = datetime.now(timezone.utc)
+        last_full_sync = datetime.fromisoformat(entry.full_sync_at)
+        if (now - last_full_sync).total_seconds() >= self.resync_interval:
+            self.logger.info("Full resync for query %r, country %r", query, country)
+            return None
+        announced_at = datetime.fromisoformat(entry.announced_at)
+        return (announced_at - self.OVERLAP).isoformat()
+
+    def observe(
+        self,
+        query: str | None,
+        country: str | None,
+        competitions: list[dict[str, Any]],
+        full_sync: bool,
+    ) -> None:
+        "Notes the competitions of a fetch, to be saved once they are handled"
+        key = self._key(query, country)
+        current = self._pending.get(key) or self._entries.get(key) or _CursorEntry()
+        entry = _CursorEntry(current.announced_at, current.full_sync_at)
+        for comp in competitions:
+            announced_at = comp.get("announced_at")
+            if announced_at is not None and self._is_newer(
+                announced_at, entry.announced_at
+            ):
+                entry.announced_at = announced_at
+        if full_sync:
+            entry.full_sync_at = datetime.now(timezone.utc).isoformat()
+        self._pending[key] = entry
+
+    def save(self) -> None:
+        if len(self._pending) == 0:
+            return
+        with self.lock.exclusive():
+            # Other processes may have saved cursors for other queries
+            self._entries = self._read()
+            self._entries.update(self._pending)
+            self._pending.clear()
+            document = {key: asdict(entry) for key, entry in self._entries.items()}
+            atomic_write(self.path, json.dumps(document, indent=2))
+
+    def _read(self) -> dict[str, _CursorEntry]:
+        try:
+            document = json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read fetch cursor {self.path}: {e}")
+        return {key: _CursorEntry(**entry) for key, entry in document.items()}
+
+    def _key(self, query: str | None, country: str | None) -> str:
+        return json.dumps([query, country])
+
+    def _is_newer(self, announced_at: str, current: str | None) -> bool:
+        if current is None:
+            return True
+        return datetime.fromisoformat(announced_at) > datetime.fromisoformat(current)
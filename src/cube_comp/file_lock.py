@@ -0,0 +1,121 @@
+import contextlib
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterator
+
+from .command_error import CommandError
+
+if sys.platform == "win32":
+    import msvcrt
+
+    def _try_lock(fd: int, exclusive: bool) -> bool:
+        # Windows has no shared locks, so every lock is exclusive
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+
+    def _unlock(fd: int) -> None:
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+else:
+    import fcntl
+
+    def _try_lock(fd: int, exclusive: bool) -> bool:
+        operation = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        try:
+            fcntl.flock(fd, operation | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    def _unlock(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+# An advisory lock that notifier processes take before changing files they
+# share. The lock is held on a separate "FILE.lock" file rather than on the file
+# it guards, because guarded files are replaced atomically, and a lock on a
+# replaced file guards nothing.
+#
+# Many processes may hold the shared lock at once, but the exclusive lock only
+# one at a time. Waiting for a lock gives up after `timeout` seconds, so a stuck
+# process cannot block every other one forever. Windows has no shared locks, so
+# there every lock is exclusive.
+class FileLock:
+    DEFAULT_TIMEOUT = 30.0
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, path: Path, timeout: float = DEFAULT_TIMEOUT) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.lock_path = path.with_name(path.name + ".lock")
+        self.timeout = timeout
+
+    def shared(self) -> contextlib.AbstractContextManager[None]:
+        return self._locked(exclusive=False)
+
+    def exclusive(self) -> contextlib.AbstractContextManager[None]:
+        return self._locked(exclusive=True)
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive: bool) -> Iterator[None]:
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            self._acquire(fd, exclusive)
+            try:
+                yield
+            finally:
+                _unlock(fd)
+        finally:
+            os.close(fd)
+
+    def _acquire(self, fd: int, exclusive: bool) -> None:
+        deadline = time.monotonic() + self.timeout
+        waiting = False
+        while not _try_lock(fd, exclusive):
+            if time.monotonic() >= deadline:
+                raise CommandError(
+                    f"Timed out after {self.timeout}s waiting for lock {self.lock_path}"
+                )
+            if not waiting:
+                self.logger.info("Waiting for lock %r", str(self.lock_path))
+                waiting = True
+            time.sleep(self.POLL_INTERVAL)
+
+
+def atomic_write(
+    path: Path,
+    data: str | bytes,
+    mode: int = 0o644,
+    fsync: bool = False,
+    temp_dir: Path | None = None,
+) -> None:
+    """
+    Replaces `path` with a file holding `data`, so that readers see either the
+    old or the new file, never a partial one. With `fsync`, the data is on disk
+    before the file is replaced. The temporary file is made in `temp_dir`, which
+    must be on the same file system, or else next to `path`.
+    """
+    if temp_dir is None:
+        temp_dir = path.parent
+    fd, temp_path = tempfile.mkstemp(
+        dir=temp_dir, prefix=f".{path.name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb" if isinstance(data, bytes) else "w") as file:
+            file.write(data)
+            if fsync:
+                file.flush()
+                os.fsync(file.fileno())
+        # mkstemp() only lets the owner read the file
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
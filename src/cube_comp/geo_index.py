@@ -0,0 +1,128 @@
+import math
+from typing import Iterable
+
+from .competition import Competition
+
+EARTH_RADIUS_KM = 6371.0088
+# Length of one degree of latitude
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    "Returns the great-circle distance between two points, in kilometres"
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def validate_coordinates(latitude: float, longitude: float) -> None:
+    "Raises ValueError unless the coordinates are numbers within range"
+    for value in (latitude, longitude):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"Not a number: {value!r}")
+    if not -90 <= latitude <= 90:
+        raise ValueError(f"Latitude out of range: {latitude!r}")
+    if not -180 <= longitude <= 180:
+        raise ValueError(f"Longitude out of range: {longitude!r}")
+
+
+def parse_coordinates(text: str) -> tuple[float, float]:
+    "Parses LATITUDE,LONGITUDE in decimal degrees"
+    try:
+        latitude_text, longitude_text = text.split(",")
+        latitude, longitude = float(latitude_text), float(longitude_text)
+    except ValueError:
+        raise ValueError(f"Expected LATITUDE,LONGITUDE: {text!r}")
+    validate_coordinates(latitude, longitude)
+    return latitude, longitude
+
+
+# Buckets competitions into cells of `cell_degrees` latitude by longitude, so a
+# radius query only measures the distance to competitions in the cells that
+# the circle's bounding box touches. Build one index per set of competitions
+# and query it for every subscriber. Competitions without coordinates are never
+# within a radius.
+class GeoGridIndex:
+    DEFAULT_CELL_DEGREES = 1.0
+
+    def __init__(
+        self,
+        competitions: Iterable[Competition],
+        cell_degrees: float = DEFAULT_CELL_DEGREES,
+    ) -> None:
+        self.cell_degrees = cell_degrees
+        self._columns_per_turn = math.ceil(360 / cell_degrees)
+        self._first_column = math.floor(-180 / cell_degrees)
+        # Cells hold (position, competition), to return matches in input order
+        self._cells: dict[tuple[int, int], list[tuple[int, Competition]]] = {}
+        for position, comp in enumerate(competitions):
+            if comp.latitude is None or comp.longitude is None:
+                continue
+            cell = self._cell(comp.latitude, comp.longitude)
+            self._cells.setdefault(cell, []).append((position, comp))
+
+    def within(
+        self, latitude: float, longitude: float, radius_km: float
+    ) -> list[Competition]:
+        "Returns competitions within `radius_km` of a point, in input order"
+        matches = []
+        for cell in self._cells_near(latitude, longitude, radius_km):
+            for position, comp in self._cells.get(cell, []):
+                assert comp.latitude is not None and comp.longitude is not None
+                distance = haversine_km(
+                    latitude, longitude, comp.latitude, comp.longitude
+                )
+                if distance <= radius_km:
+                    matches.append((position, comp))
+        matches.sort(key=lambda match: match[0])
+        return [comp for _, comp in matches]
+
+    def _cell(self, latitude: float, longitude: float) -> tuple[int, int]:
+        row, column = self._unwrapped_cell(latitude, longitude)
+        return row, self._wrap_column(column)
+
+    def _unwrapped_cell(self, latitude: float, longitude: float) -> tuple[int, int]:
+        return (
+            math.floor(latitude / self.cell_degrees),
+            math.floor(longitude / self.cell_degrees),
+        )
+
+    def _wrap_column(self, column: int) -> int:
+        "Returns the same column within -180 to 180, across the antimeridian"
+        offset = (column - self._first_column) % self._columns_per_turn
+        return offset + self._first_column
+
+    def _cells_near(
+        self, latitude: float, longitude: float, radius_km: float
+    ) -> list[tuple[int, int]]:
+        lat_degrees = radius_km / KM_PER_DEGREE
+        min_lat = max(-90.0, latitude - lat_degrees)
+        max_lat = min(90.0, latitude + lat_degrees)
+        # Degrees of longitude shrink towards the poles; near them, or for huge
+        # radiuses, search every longitude.
+        widest = max(abs(min_lat), abs(max_lat))
+        cos_lat = math.cos(math.radians(widest))
+        if cos_lat * 180 <= lat_degrees:
+            min_lon, max_lon = -180.0, 180.0
+        else:
+            lon_degrees = lat_degrees / cos_lat
+            min_lon, max_lon = longitude - lon_degrees, longitude + lon_degrees
+
+        min_row, min_column = self._unwrapped_cell(min_lat, min_lon)
+        max_row, max_column = self._unwrapped_cell(max_lat, max_lon)
+        # Visit each column only once, even if the range wraps around
+        columns = {
+            self._wrap_column(column) for column in range(min_column, max_column + 1)
+        }
+        return [
+            (row, column)
+            for row in range(min_row, max_row + 1)
+            for column in columns
+            if (row, column) in self._cells
+        ]
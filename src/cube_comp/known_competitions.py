@@ -1,53 +1,330 @@
+import hashlib
 import json
 import logging
-from typing import TextIO
+import os
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterable, Iterator, TextIO
+
+from typing_extensions import Protocol
 
 from .competition import Competition
+from .file_lock import FileLock, atomic_write
+
+# The fields that are worth notifying about again when they change
+FINGERPRINT_FIELDS = (
+    "name",
+    "start_date",
+    "city",
+    "venue",
+    "website",
+    "latitude",
+    "longitude",
+)
+
+
+# The subscriber of stores shared by several subscribers, such as
+# SQLiteKnownCompetitions, when there is only one
+DEFAULT_SUBSCRIBER = "default"
+
+
+# Known competitions are forgotten this many days after they start. The API only
+# lists competitions from today on, and competitions last a few days at most, so
+# by then they are never listed again.
+DEFAULT_EXPIRY_DAYS = 7
+
+
+def expiry_cutoff(expiry_days: int | None, today: date | None = None) -> str | None:
+    """
+    Returns the ISO start date before which known competitions expire, or None
+    if they never do
+    """
+    if expiry_days is None:
+        return None
+    if today is None:
+        today = date.today()
+    return (today - timedelta(days=expiry_days)).isoformat()
+
+
+def competition_fingerprint(comp: Competition) -> str:
+    "Returns a short hash of the FINGERPRINT_FIELDS of a competition"
+    text = "\x1f".join(str(getattr(comp, field)) for field in FINGERPRINT_FIELDS)
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
 
+@dataclass
+class CompetitionChanges:
+    "Competitions that are not yet known, and known ones that have changed"
+    new: list[Competition] = field(default_factory=list)
+    changed: list[Competition] = field(default_factory=list)
 
-class KnownCompetitions:
-    def __init__(self, file_io: TextIO | None) -> None:
+    def __len__(self) -> int:
+        return len(self.new) + len(self.changed)
+
+    def extend(self, other: "CompetitionChanges") -> None:
+        self.new.extend(other.new)
+        self.changed.extend(other.changed)
+
+
+class KnownCompetitionsStore(Protocol):
+    def filter_competitions(self, competitions: list[Competition]) -> list[Competition]:
+        "Returns competitions that are not yet known, and records them as known"
+        ...
+
+    def classify_competitions(
+        self, competitions: list[Competition]
+    ) -> CompetitionChanges:
+        """
+        Like filter_competitions(), but also returns the known competitions that
+        changed since they were recorded. By default, changes are not detected.
+        """
+        return CompetitionChanges(new=self.filter_competitions(competitions))
+
+    def classify_competition_pages(
+        self, pages: Iterable[list[Competition]]
+    ) -> Iterator[CompetitionChanges]:
+        """
+        Like classify_competitions(), for a listing that arrives a page at a
+        time. By default, the whole listing is classified after the last page.
+        """
+        competitions = [comp for page in pages for comp in page]
+        yield self.classify_competitions(competitions)
+
+
+# Known competition entries are [fingerprint, start date]. Either is None in
+# entries from older versions.
+_Entry = list[str | None]
+
+
+# Keeps the IDs of the last listing in a JSON file, each with the fingerprint
+# and start date of the competition, so that changes to known competitions are
+# noticed. By default, the file is replaced with the competitions passed to
+# filter_competitions, so competitions that are no longer listed are forgotten.
+# With `keep_unlisted`, for listings that are not complete, new competitions are
+# added to the file instead, and competitions are forgotten `expiry_days` after
+# they start. Pages of a listing are classified as they arrive, and the file is
+# written after the last one.
+#
+# Files from older versions list IDs only, or IDs and fingerprints. Their
+# competitions are not reported as changed, or forgotten, until their
+# fingerprint and start date have been recorded.
+class KnownCompetitions(KnownCompetitionsStore):
+    def __init__(
+        self,
+        file_io: TextIO | None,
+        keep_unlisted: bool = False,
+        expiry_days: int | None = DEFAULT_EXPIRY_DAYS,
+    ) -> None:
         self.logger = logging.getLogger(__name__)
-        assert file_io is not None
-        self.file_io: TextIO = file_io
+        self.file_io = file_io
+        self.keep_unlisted = keep_unlisted
+        self.expiry_days = expiry_days
 
     def filter_competitions(self, competitions: list[Competition]) -> list[Competition]:
+        return self.classify_competitions(competitions).new
+
+    def classify_competitions(
+        self, competitions: list[Competition]
+    ) -> CompetitionChanges:
+        changes = CompetitionChanges()
+        for page_changes in self.classify_competition_pages([competitions]):
+            changes.extend(page_changes)
+        return changes
+
+    def classify_competition_pages(
+        self, pages: Iterable[list[Competition]]
+    ) -> Iterator[CompetitionChanges]:
         known_comps = self._read_known_comps_file()
         self.logger.debug("Known comps: %r" % known_comps)
-        filtered_comps = self._filter_competitions(competitions, known_comps)
-        self.logger.debug("Filtered comps: %r" % filtered_comps)
+        listed_comps: dict[str, _Entry] = {}
+        for page in pages:
+            changes = self._classify_competitions(page, known_comps, listed_comps)
+            self.logger.debug("Changes: %r" % changes)
+            yield changes
+        self._write_listed_comps(known_comps, listed_comps)
+
+    def _write_listed_comps(
+        self, known_comps: dict[str, _Entry], listed_comps: dict[str, _Entry]
+    ) -> None:
+        self._write_known_comps_file(self._new_known_comps(known_comps, listed_comps))
 
-        new_known_comps = [c.id for c in competitions]
+    def _new_known_comps(
+        self, known_comps: dict[str, _Entry], listed_comps: dict[str, _Entry]
+    ) -> dict[str, _Entry]:
+        new_known_comps: dict[str, _Entry] = {}
+        if self.keep_unlisted:
+            new_known_comps.update(self._unexpired(known_comps))
+        new_known_comps.update(listed_comps)
         self.logger.debug("New known comps: %r" % new_known_comps)
-        self._write_known_comps_file(new_known_comps)
-        return filtered_comps
-
-    def _filter_competitions(
-        self, competitions: list[Competition], known_competitions: list[str]
-    ) -> list[Competition]:
-        # This whole method could be a list comprehension but I want to log
-        # skipped competitions.
-        filtered_comps = []
+        return new_known_comps
+
+    def _unexpired(self, known_comps: dict[str, _Entry]) -> dict[str, _Entry]:
+        cutoff = expiry_cutoff(self.expiry_days)
+        if cutoff is None:
+            return known_comps
+        unexpired = {
+            id: entry
+            for id, entry in known_comps.items()
+            if entry[1] is None or entry[1] >= cutoff
+        }
+        expired_count = len(known_comps) - len(unexpired)
+        if expired_count > 0:
+            self.logger.info("Forgetting %r expired known comps" % expired_count)
+        return unexpired
+
+    def _classify_competitions(
+        self,
+        competitions: list[Competition],
+        known_comps: dict[str, _Entry],
+        listed_comps: dict[str, _Entry],
+    ) -> CompetitionChanges:
+        "Classifies competitions, and adds their entries to `listed_comps`"
+        changes = CompetitionChanges()
         for comp in competitions:
-            if comp.id not in known_competitions:
-                filtered_comps.append(comp)
+            fingerprint = competition_fingerprint(comp)
+            listed_comps[comp.id] = [fingerprint, comp.start_date.isoformat()]
+            known_entry = known_comps.get(comp.id)
+            if known_entry is None:
+                changes.new.append(comp)
+                continue
+            known_fingerprint = known_entry[0]
+            if known_fingerprint is not None and known_fingerprint != fingerprint:
+                self.logger.info("Known competition with ID %r changed", comp.id)
+                changes.changed.append(comp)
             else:
                 self.logger.info(
                     "Skipping already known competition with ID %r", comp.id
                 )
-        return filtered_comps
+        return changes
 
-    def _read_known_comps_file(self) -> list[str]:
-        self.file_io.seek(0)
-        known_comps_json = self.file_io.read()
+    def _read_known_comps_file(self) -> dict[str, _Entry]:
+        known_comps_json = self._read_text()
         if known_comps_json == "":
-            return []
+            return {}
         known_comps = json.loads(known_comps_json)
+        if isinstance(known_comps, list):
+            known_comps = dict.fromkeys(known_comps)
         self.logger.info("Read %r known comps" % len(known_comps))
-        return known_comps
+        return {
+            id: entry if isinstance(entry, list) else [entry, None]
+            for id, entry in known_comps.items()
+        }
 
-    def _write_known_comps_file(self, known_comps: list[str]) -> None:
+    def _write_known_comps_file(self, known_comps: dict[str, _Entry]) -> None:
         self.logger.info("Writing %r known comps" % len(known_comps))
+        # One competition per line
+        lines = [
+            f"  {json.dumps(id)}: {json.dumps(e)}" for id, e in known_comps.items()
+        ]
+        if len(lines) == 0:
+            self._write_text("{}")
+        else:
+            self._write_text("{\n" + ",\n".join(lines) + "\n}")
+
+    def _read_text(self) -> str:
+        assert self.file_io is not None
+        self.file_io.seek(0)
+        return self.file_io.read()
+
+    def _write_text(self, text: str) -> None:
+        assert self.file_io is not None
         self.file_io.seek(0)
         self.file_io.truncate(0)
-        json.dump(known_comps, self.file_io, indent=2)
+        self.file_io.write(text)
+
+
+# Identifies one version of a file: a replaced file has a new inode
+_FileVersion = tuple[int, int, int] | None
+
+
+# A KnownCompetitions kept in a file that many notifier processes can share.
+# The file is only ever replaced atomically with a complete new version, so
+# reading it and classifying pages take no lock. Pages with nothing to report
+# are handed on right away, and the rest are held back until the last page. Only
+# then is the exclusive FileLock taken, to read the file again if another process
+# replaced it, to classify the held back competitions again, so that the ones
+# that process already reported are not reported twice, and to write the file.
+# Fetching pages and writing output never wait for the lock, so a slow listing
+# does not hold up other processes.
+#
+# Processes with different queries list different competitions, so unlike
+# KnownCompetitions, competitions that are no longer listed are always kept,
+# whether or not `keep_unlisted`, until `expiry_days` after they start. Without
+# `expiry_days`, the file only ever grows.
+class KnownCompetitionsFile(KnownCompetitions):
+    def __init__(
+        self,
+        path: Path,
+        expiry_days: int | None = DEFAULT_EXPIRY_DAYS,
+        lock_timeout: float = FileLock.DEFAULT_TIMEOUT,
+    ) -> None:
+        super().__init__(None, keep_unlisted=True, expiry_days=expiry_days)
+        self.path = path
+        self.lock = FileLock(path, lock_timeout)
+        self._read_version: _FileVersion = None
+
+    def classify_competition_pages(
+        self, pages: Iterable[list[Competition]]
+    ) -> Iterator[CompetitionChanges]:
+        known_comps = self._read_known_comps_file()
+        self.logger.debug("Known comps: %r" % known_comps)
+        listed_comps: dict[str, _Entry] = {}
+        held_changes = CompetitionChanges()
+        # The competitions in held_changes, in the order they were listed
+        held_comps: list[Competition] = []
+        for page in pages:
+            changes = self._classify_competitions(page, known_comps, listed_comps)
+            self.logger.debug("Changes: %r" % changes)
+            if len(changes) == 0:
+                yield changes
+                continue
+            held_changes.extend(changes)
+            reported_ids = {comp.id for comp in changes.new + changes.changed}
+            held_comps.extend(comp for comp in page if comp.id in reported_ids)
+
+        new_known_comps = self._new_known_comps(known_comps, listed_comps)
+        if len(held_comps) == 0 and new_known_comps == known_comps:
+            self.logger.info("Known comps unchanged")
+            return
+        with self.lock.exclusive():
+            if self._file_version() != self._read_version:
+                self.logger.info("Known comps changed by another process")
+                known_comps = self._read_known_comps_file()
+                held_changes = self._classify_competitions(held_comps, known_comps, {})
+                new_known_comps = self._new_known_comps(known_comps, listed_comps)
+            self._write_known_comps_file(new_known_comps)
+        self.logger.debug("Changes: %r" % held_changes)
+        if len(held_changes) > 0:
+            yield held_changes
+
+    def _new_known_comps(
+        self, known_comps: dict[str, _Entry], listed_comps: dict[str, _Entry]
+    ) -> dict[str, _Entry]:
+        # Other processes' competitions are kept, even if not `keep_unlisted`
+        new_known_comps = dict(self._unexpired(known_comps))
+        new_known_comps.update(listed_comps)
+        self.logger.debug("New known comps: %r" % new_known_comps)
+        return new_known_comps
+
+    def _read_text(self) -> str:
+        try:
+            with open(self.path) as file:
+                self._read_version = self._version(os.fstat(file.fileno()))
+                return file.read()
+        except FileNotFoundError:
+            self._read_version = None
+            return ""
+
+    def _write_text(self, text: str) -> None:
+        atomic_write(self.path, text)
+        self._read_version = self._file_version()
+
+    def _file_version(self) -> _FileVersion:
+        try:
+            return self._version(os.stat(self.path))
+        except FileNotFoundError:
+            return None
+
+    def _version(self, stat: os.stat_result) -> _FileVersion:
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
@@ -0,0 +1,53 @@
+import contextlib
+from pathlib import Path
+
+from .file_lock import FileLock
+from .known_competitions import (
+    DEFAULT_SUBSCRIBER,
+    KnownCompetitionsFile,
+    KnownCompetitionsStore,
+)
+
+
+def open_known_competitions(
+    spec: str,
+    stack: contextlib.ExitStack,
+    subscriber: str = DEFAULT_SUBSCRIBER,
+    bloom_filter: bool = False,
+    lock_timeout: float = FileLock.DEFAULT_TIMEOUT,
+) -> KnownCompetitionsStore:
+    """
+    Opens the known competitions store described by `spec` and registers it to
+    be closed with `stack`. A plain path is a JSON file; a "log:" or "sqlite:"
+    prefix selects another store. Only SQLite stores use `subscriber` and
+    `bloom_filter`. Every store waits up to `lock_timeout` seconds for other
+    processes sharing its files.
+    """
+    # Only the store in use is imported; sqlite3 is slow to import
+    if spec.startswith("log:"):
+        from .known_competitions_log import KnownCompetitionsLog
+
+        log = KnownCompetitionsLog(
+            Path(spec.removeprefix("log:")), lock_timeout=lock_timeout
+        )
+        return stack.enter_context(log)
+    elif spec.startswith("sqlite:"):
+        from .sqlite_known_competitions import SQLiteKnownCompetitions
+
+        sqlite = SQLiteKnownCompetitions(
+            Path(spec.removeprefix("sqlite:")),
+            subscriber,
+            bloom_filter=bloom_filter,
+            lock_timeout=lock_timeout,
+        )
+        return stack.enter_context(sqlite)
+    else:
+        return KnownCompetitionsFile(Path(spec), lock_timeout=lock_timeout)
+
+
+def known_competitions_path(spec: str) -> Path:
+    "Returns the file of the known competitions store described by `spec`"
+    for prefix in ["log:", "sqlite:"]:
+        if spec.startswith(prefix):
+            return Path(spec.removeprefix(prefix))
+    return Path(spec)
@@ -0,0 +1,248 @@
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from .competition import Competition
+from .file_lock import FileLock, atomic_write
+from .known_competitions import (
+    DEFAULT_EXPIRY_DAYS,
+    CompetitionChanges,
+    KnownCompetitionsStore,
+    competition_fingerprint,
+    expiry_cutoff,
+)
+
+# The start date and fingerprint of a known competition. Either is None in
+# lines from older versions.
+_Entry = tuple[str | None, str | None]
+
+
+# Keeps known competition IDs in a snapshot file plus an append-only log, one
+# competition per line: the ID, then its start date and fingerprint. Loading
+# reads both into memory, and each run appends only the competitions it has not
+# seen before, or whose entry changed; the last line for an ID wins. Once the log
+# grows past `compact_threshold` entries, a background thread folds it into a
+# new snapshot that atomically replaces the old one. Unlike KnownCompetitions,
+# IDs are not forgotten when they are no longer listed, but only `expiry_days`
+# after their competition starts; expired IDs are left out of memory right away,
+# and out of the files at the next compaction. Lines from older versions have no
+# start date or fingerprint, so their competitions never expire, or are reported
+# as changed, until they are listed again.
+#
+# Several processes can share the files. Loading and appending take a shared
+# FileLock, since appends of whole lines do not interfere with each other, and
+# compaction takes the exclusive lock, first reading back the IDs that other
+# processes appended so that the new snapshot keeps them.
+class KnownCompetitionsLog(KnownCompetitionsStore):
+    DEFAULT_COMPACT_THRESHOLD = 1000
+
+    def __init__(
+        self,
+        path: Path,
+        compact_threshold: int = DEFAULT_COMPACT_THRESHOLD,
+        expiry_days: int | None = DEFAULT_EXPIRY_DAYS,
+        lock_timeout: float = FileLock.DEFAULT_TIMEOUT,
+    ) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.log_path = path.with_name(path.name + ".log")
+        self.compact_threshold = compact_threshold
+        self.expiry_days = expiry_days
+        self.file_lock = FileLock(path, lock_timeout)
+
+        self._lock = threading.Lock()
+        self._compaction: threading.Thread | None = None
+        # The entry of each known ID
+        self._known_ids: dict[str, _Entry] = {}
+        self._log_count = 0
+
+        with self.file_lock.shared():
+            log_entries = self._read_files()
+        if log_entries is None:
+            # Only repair a partial entry while no other process can be
+            # appending, or it could be theirs
+            with self.file_lock.exclusive():
+                log_entries = self._read_files(repair=True)
+            assert log_entries is not None
+        self._log_count = len(log_entries)
+        # Expired entries count towards compaction, which drops them from disk
+        self._log_count += self._forget_expired()
+        self.logger.info("Read %r known comps" % len(self._known_ids))
+        self._log_io = open(self.log_path, "a")
+        if self._log_count > self.compact_threshold:
+            self._start_compaction()
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._known_ids
+
+    def __len__(self) -> int:
+        return len(self._known_ids)
+
+    def filter_competitions(self, competitions: list[Competition]) -> list[Competition]:
+        return self.classify_competitions(competitions).new
+
+    def classify_competitions(
+        self, competitions: list[Competition]
+    ) -> CompetitionChanges:
+        entries = self._entries(competitions)
+        changes = CompetitionChanges()
+        for comp in competitions:
+            known_entry = self._known_ids.get(comp.id)
+            if known_entry is None:
+                changes.new.append(comp)
+            elif known_entry[1] is not None and known_entry[1] != entries[comp.id][1]:
+                self.logger.info("Known competition with ID %r changed", comp.id)
+                changes.changed.append(comp)
+            else:
+                self.logger.info(
+                    "Skipping already known competition with ID %r", comp.id
+                )
+
+        self._append_entries(entries)
+        return changes
+
+    def classify_competition_pages(
+        self, pages: Iterable[list[Competition]]
+    ) -> Iterator[CompetitionChanges]:
+        # Each page only appends entries, so pages can be recorded one at a time
+        for page in pages:
+            yield self.classify_competitions(page)
+
+    def add_competitions(self, competitions: Iterable[Competition]) -> None:
+        self._append_entries(self._entries(competitions))
+
+    def _entries(self, competitions: Iterable[Competition]) -> dict[str, _Entry]:
+        return {
+            comp.id: (comp.start_date.isoformat(), competition_fingerprint(comp))
+            for comp in competitions
+        }
+
+    def _append_entries(self, entries: dict[str, _Entry]) -> None:
+        "Appends the entries that are not known yet, or changed"
+        with self._lock:
+            new_entries = {
+                id: entry
+                for id, entry in entries.items()
+                if self._known_ids.get(id) != entry
+            }
+            if len(new_entries) == 0:
+                return
+            self.logger.info("Appending %r known comps" % len(new_entries))
+            with self.file_lock.shared():
+                self._log_io.write(
+                    "".join(self._entry_line(*item) for item in new_entries.items())
+                )
+                self._log_io.flush()
+                os.fsync(self._log_io.fileno())
+            self._known_ids.update(new_entries)
+            self._log_count += len(new_entries)
+            needs_compaction = self._log_count > self.compact_threshold
+
+        if needs_compaction:
+            self._start_compaction()
+
+    def compact(self) -> None:
+        "Folds the log into the snapshot file"
+        with self._lock, self.file_lock.exclusive():
+            # Pick up the IDs that other processes appended since loading
+            self._read_files(repair=True)
+            self._forget_expired()
+            self.logger.info("Compacting %r known comps" % len(self._known_ids))
+            self._write_snapshot(sorted(self._known_ids.items()))
+            # Entries left in the log by a crash here are also in the snapshot,
+            # so they are harmless duplicates.
+            self._log_io.truncate(0)
+            self._log_io.flush()
+            os.fsync(self._log_io.fileno())
+            self._log_count = 0
+
+    def close(self) -> None:
+        if self._compaction is not None:
+            self._compaction.join()
+            self._compaction = None
+        self._log_io.close()
+
+    def __enter__(self) -> "KnownCompetitionsLog":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _start_compaction(self) -> None:
+        if self._compaction is not None and self._compaction.is_alive():
+            return
+        self._compaction = threading.Thread(
+            target=self.compact, name="known-comps-compaction"
+        )
+        self._compaction.start()
+
+    def _forget_expired(self) -> int:
+        "Forgets expired IDs, and returns how many there were"
+        cutoff = expiry_cutoff(self.expiry_days)
+        if cutoff is None:
+            return 0
+        expired_ids = [
+            id
+            for id, (start_date, _) in self._known_ids.items()
+            if start_date is not None and start_date < cutoff
+        ]
+        for id in expired_ids:
+            del self._known_ids[id]
+        if len(expired_ids) > 0:
+            self.logger.info("Forgetting %r expired known comps" % len(expired_ids))
+        return len(expired_ids)
+
+    def _write_snapshot(self, entries: list[tuple[str, _Entry]]) -> None:
+        content = "".join(self._entry_line(*item) for item in entries)
+        atomic_write(self.path, content, fsync=True)
+
+    def _entry_line(self, id: str, entry: _Entry) -> str:
+        start_date, fingerprint = entry
+        if start_date is None:
+            return f"{id}\n"
+        if fingerprint is None:
+            return f"{id} {start_date}\n"
+        return f"{id} {start_date} {fingerprint}\n"
+
+    def _read_files(self, repair: bool = False) -> dict[str, _Entry] | None:
+        """
+        Reads the snapshot and the log into memory, and returns the log entries.
+        Returns None if the log ends with a partial entry, unless `repair`.
+        """
+        content = self._read_content(self.log_path)
+        lines = content.split(b"\n")
+        # Anything after the last newline in the log is a partial write from a
+        # crash. Snapshots are replaced atomically, so never have one.
+        torn = lines.pop()
+        if torn != b"":
+            if not repair:
+                return None
+            self.logger.warning(
+                "Discarding partial entry %r in %r", torn, str(self.log_path)
+            )
+            os.truncate(self.log_path, len(content) - len(torn))
+        log_entries = self._parse_entries(lines)
+        snapshot_lines = self._read_content(self.path).split(b"\n")
+        self._known_ids.update(self._parse_entries(snapshot_lines))
+        self._known_ids.update(log_entries)
+        return log_entries
+
+    def _read_content(self, path: Path) -> bytes:
+        try:
+            with open(path, "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return b""
+
+    def _parse_entries(self, lines: list[bytes]) -> dict[str, _Entry]:
+        entries: dict[str, _Entry] = {}
+        for line in lines:
+            if line == b"":
+                continue
+            id, *fields = line.decode().split(" ")
+            start_date = fields[0] if len(fields) > 0 else None
+            fingerprint = fields[1] if len(fields) > 1 else None
+            entries[id] = (start_date, fingerprint)
+        return entries
@@ -0,0 +1,95 @@
+import contextlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Iterator
+
+from typing_extensions import Protocol
+
+from .file_lock import atomic_write
+
+
+class Instrumentation(Protocol):
+    def record_duration(self, stage: str, seconds: float) -> None:
+        pass
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        pass
+
+    @contextlib.contextmanager
+    def time_stage(self, stage: str) -> Iterator[None]:
+        "Records how long the body of the `with` statement takes as `stage`"
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_duration(stage, time.perf_counter() - start)
+
+
+# Records nothing; the default when metrics are not wanted.
+class NullInstrumentation(Instrumentation):
+    pass
+
+
+# Totals stage durations and counters, from any thread, and writes them out as a
+# Prometheus textfile (for node_exporter's textfile collector) or as JSON.
+class MetricsRecorder(Instrumentation):
+    PREFIX = "cube_comp"
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.stage_seconds: dict[str, float] = {}
+        self.stage_runs: dict[str, int] = {}
+        self.counters: dict[str, int] = {}
+
+    def record_duration(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+            self.stage_runs[stage] = self.stage_runs.get(stage, 0) + 1
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def to_json(self) -> str:
+        with self._lock:
+            document = {
+                "updated_at": time.time(),
+                "stages": {
+                    stage: {"seconds": seconds, "runs": self.stage_runs[stage]}
+                    for stage, seconds in sorted(self.stage_seconds.items())
+                },
+                "counters": dict(sorted(self.counters.items())),
+            }
+        return json.dumps(document, indent=2) + "\n"
+
+    def to_prometheus(self) -> str:
+        prefix = self.PREFIX
+        lines = []
+        with self._lock:
+            lines.append(f"# TYPE {prefix}_stage_seconds_total counter")
+            for stage, seconds in sorted(self.stage_seconds.items()):
+                lines.append(
+                    f'{prefix}_stage_seconds_total{{stage="{stage}"}} {seconds:.6f}'
+                )
+            lines.append(f"# TYPE {prefix}_stage_runs_total counter")
+            for stage, runs in sorted(self.stage_runs.items()):
+                lines.append(f'{prefix}_stage_runs_total{{stage="{stage}"}} {runs}')
+            for counter, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {prefix}_{counter}_total counter")
+                lines.append(f"{prefix}_{counter}_total {value}")
+        lines.append(f"# TYPE {prefix}_last_update_timestamp_seconds gauge")
+        lines.append(f"{prefix}_last_update_timestamp_seconds {time.time():.3f}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Path) -> None:
+        """
+        Writes JSON if `path` ends in .json, otherwise Prometheus text. The file
+        is replaced atomically, so collectors never read a partial file.
+        """
+        if path.suffix == ".json":
+            content = self.to_json()
+        else:
+            content = self.to_prometheus()
+        atomic_write(path, content)
@@ -0,0 +1,143 @@
+import csv
+import json
+from datetime import datetime, timezone
+from typing import Any, Iterable, TextIO
+
+from typing_extensions import Protocol
+
+from .competition import Competition
+
+# Formats accepted by competition_writer(). The text format is the notifier's
+# own template, so it has no writer.
+OUTPUT_FORMATS = ("text", "ndjson", "csv", "ics")
+
+RECORD_FIELDS = (
+    "id",
+    "name",
+    "short_name",
+    "display_name",
+    "start_date",
+    "results_posted",
+    "city",
+    "venue",
+    "website",
+    "latitude",
+    "longitude",
+)
+
+
+def competition_record(comp: Competition) -> dict[str, Any]:
+    "Returns the fields of a competition as JSON compatible values"
+    record = {field: getattr(comp, field) for field in RECORD_FIELDS}
+    record["start_date"] = comp.start_date.isoformat()
+    return record
+
+
+# Writers take competitions from any iterable, including a generator, and write
+# each one as soon as it arrives, so the whole document is never held in
+# memory.
+class CompetitionWriter(Protocol):
+    def write(self, competitions: Iterable[Competition], output: TextIO) -> int:
+        "Writes the competitions to `output`, and returns how many it wrote"
+        ...
+
+
+# One JSON object per line.
+class NDJSONCompetitionWriter(CompetitionWriter):
+    def write(self, competitions: Iterable[Competition], output: TextIO) -> int:
+        count = 0
+        for comp in competitions:
+            output.write(json.dumps(competition_record(comp)) + "\n")
+            count += 1
+        return count
+
+
+# A header row, then one row per competition. Missing values are empty.
+class CSVCompetitionWriter(CompetitionWriter):
+    def write(self, competitions: Iterable[Competition], output: TextIO) -> int:
+        writer = csv.DictWriter(output, fieldnames=RECORD_FIELDS)
+        writer.writeheader()
+        count = 0
+        for comp in competitions:
+            writer.writerow(competition_record(comp))
+            count += 1
+        return count
+
+
+# An iCalendar (RFC 5545) calendar with an all-day event for each competition.
+# Event UIDs are stable, so calendar clients update events on re-import.
+class ICalendarCompetitionWriter(CompetitionWriter):
+    PRODUCT_ID = "-//cube-comp//WCA Competitions//EN"
+    UID_DOMAIN = "worldcubeassociation.org"
+    # Octets per line, without the line break
+    LINE_LENGTH = 75
+
+    def write(self, competitions: Iterable[Competition], output: TextIO) -> int:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        self._write_lines(
+            output,
+            [
+                "BEGIN:VCALENDAR",
+                "VERSION:2.0",
+                f"PRODID:{self.PRODUCT_ID}",
+                "CALSCALE:GREGORIAN",
+            ],
+        )
+        count = 0
+        for comp in competitions:
+            self._write_lines(output, self._event_lines(comp, stamp))
+            count += 1
+        self._write_lines(output, ["END:VCALENDAR"])
+        return count
+
+    def _event_lines(self, comp: Competition, stamp: str) -> list[str]:
+        lines = [
+            "BEGIN:VEVENT",
+            f"UID:{comp.id}@{self.UID_DOMAIN}",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART;VALUE=DATE:{comp.start_date.strftime('%Y%m%d')}",
+            f"SUMMARY:{self._escape(comp.name)}",
+            f"LOCATION:{self._escape(f'{comp.venue}, {comp.city}')}",
+            f"URL:{comp.website}",
+        ]
+        if comp.latitude is not None and comp.longitude is not None:
+            lines.append(f"GEO:{comp.latitude};{comp.longitude}")
+        lines.append("END:VEVENT")
+        return lines
+
+    def _write_lines(self, output: TextIO, lines: list[str]) -> None:
+        output.write("".join(self._fold(line) + "\r\n" for line in lines))
+
+    def _escape(self, text: str) -> str:
+        text = text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        return text.replace("\r\n", "\\n").replace("\n", "\\n")
+
+    def _fold(self, line: str) -> str:
+        "Splits long lines, without splitting UTF-8 characters"
+        parts = []
+        part = ""
+        part_length = 0
+        for char in line:
+            char_length = len(char.encode())
+            if part_length + char_length > self.LINE_LENGTH:
+                parts.append(part)
+                # Continuation lines start with a space
+                part = " "
+                part_length = 1
+            part += char
+            part_length += char_length
+        parts.append(part)
+        return "\r\n".join(parts)
+
+
+def competition_writer(output_format: str) -> CompetitionWriter:
+    "Returns the writer for one of OUTPUT_FORMATS, other than text"
+    match output_format:
+        case "ndjson":
+            return NDJSONCompetitionWriter()
+        case "csv":
+            return CSVCompetitionWriter()
+        case "ics":
+            return ICalendarCompetitionWriter()
+        case _:
+            raise ValueError(f"No writer for output format: {output_format!r}")
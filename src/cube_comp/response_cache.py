@@ -0,0 +1,88 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from .file_lock import atomic_write
+
+
+@dataclass
+class CachedResponse:
+    competitions: list[dict[str, Any]]
+    fetched_at: float
+    total: int | None = None
+    per_page: int | None = None
+    has_next: bool = False
+    etag: str | None = None
+    last_modified: str | None = None
+
+
+# Stores API responses on disk, one JSON file per request. Entries younger than
+# `ttl` seconds are served without touching the network; older entries are
+# revalidated with their ETag or Last-Modified validators. The file
+# modification time doubles as the last access time, and the least recently
+# used files are evicted once the directory grows beyond `max_size` bytes.
+class ResponseCache:
+    DEFAULT_TTL = 300.0
+    DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+    def __init__(
+        self,
+        directory: Path,
+        ttl: float = DEFAULT_TTL,
+        max_size: int = DEFAULT_MAX_SIZE,
+    ) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.directory = directory
+        self.ttl = ttl
+        self.max_size = max_size
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: dict[str, str]) -> CachedResponse | None:
+        path = self._path(key)
+        try:
+            with open(path) as file:
+                entry = CachedResponse(**json.load(file))
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (ValueError, TypeError) as e:
+            self.logger.warning("Ignoring corrupt cache entry %r: %s", str(path), e)
+            return None
+        return entry
+
+    def is_fresh(self, entry: CachedResponse) -> bool:
+        return time.time() - entry.fetched_at < self.ttl
+
+    def put(self, key: dict[str, str], entry: CachedResponse) -> None:
+        path = self._path(key)
+        atomic_write(path, json.dumps(asdict(entry)))
+        self._evict()
+
+    def _path(self, key: dict[str, str]) -> Path:
+        encoded_key = json.dumps(key, sort_keys=True).encode()
+        name = hashlib.sha256(encoded_key).hexdigest()
+        return self.directory / f"{name}.json"
+
+    def _evict(self) -> None:
+        entries = []
+        total_size = 0
+        for path in self.directory.glob("*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            self.logger.info("Evicting cache entry %r", str(path))
+            path.unlink(missing_ok=True)
+            total_size -= size
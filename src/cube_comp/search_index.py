@@ -0,0 +1,185 @@
+import bisect
+import json
+import logging
+import re
+import threading
+import time
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from .command_error import CommandError
+from .competition_api import CompetitionAPI
+from .file_lock import atomic_write
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    "Splits text into lowercase words, without accents, so São matches sao"
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _WORD_RE.findall(stripped)
+
+
+# An inverted index from the words of each competition's name, short name, city
+# and venue to the competitions that contain them. Every word of a query must
+# be the start of a word of the competition, so "chi open" finds "Chicago
+# Open 2024".
+class CompetitionSearchIndex:
+    VERSION = 1
+    FIELDS = ("name", "short_name", "city", "venue")
+
+    def __init__(
+        self, competitions: list[dict[str, Any]], postings: dict[str, list[int]]
+    ) -> None:
+        self.competitions = competitions
+        # Each word maps to ascending positions in `competitions`
+        self.postings = postings
+        self._words = sorted(postings)
+
+    @classmethod
+    def build(cls, competitions: list[dict[str, Any]]) -> "CompetitionSearchIndex":
+        postings: dict[str, list[int]] = {}
+        for position, comp in enumerate(competitions):
+            text = " ".join(str(comp.get(field) or "") for field in cls.FIELDS)
+            for word in set(tokenize(text)):
+                postings.setdefault(word, []).append(position)
+        return cls(competitions, postings)
+
+    @classmethod
+    def load(cls, path: Path) -> "CompetitionSearchIndex":
+        try:
+            document = json.loads(path.read_text())
+        except ValueError as e:
+            raise CommandError(f"Cannot read search index {path}: {e}")
+        if document.get("version") != cls.VERSION:
+            raise CommandError(f"Unsupported search index version: {path}")
+        return cls(document["competitions"], document["postings"])
+
+    def save(self, path: Path) -> None:
+        document = {
+            "version": self.VERSION,
+            "competitions": self.competitions,
+            "postings": self.postings,
+        }
+        atomic_write(path, json.dumps(document, separators=(",", ":")))
+
+    def search(self, query: str | None) -> list[dict[str, Any]]:
+        "Returns matching competitions, in the order they were indexed"
+        words = tokenize(query) if query else []
+        if len(words) == 0:
+            return list(self.competitions)
+
+        matches: set[int] | None = None
+        # Narrowest words first, so the intersection shrinks quickly
+        for positions in sorted((self._prefix_matches(w) for w in words), key=len):
+            matches = positions if matches is None else matches & positions
+            if len(matches) == 0:
+                return []
+        assert matches is not None
+        return [self.competitions[position] for position in sorted(matches)]
+
+    def _prefix_matches(self, prefix: str) -> set[int]:
+        positions: set[int] = set()
+        index = bisect.bisect_left(self._words, prefix)
+        while index < len(self._words) and self._words[index].startswith(prefix):
+            positions.update(self.postings[self._words[index]])
+            index += 1
+        return positions
+
+
+# Answers queries from local search indexes instead of the API's `q`
+# parameter. Each country is fetched from `competition_api` once, without a
+# query, and indexed, so any number of queries for it cost one fetch. With an
+# `index_dir`, indexes are saved there and reused by later runs. Indexes are
+# rebuilt once they are `max_age` seconds old, also in long-running watchers.
+class LocalSearchCompetitionAPI(CompetitionAPI):
+    DEFAULT_MAX_AGE = 3600.0
+
+    def __init__(
+        self,
+        competition_api: CompetitionAPI,
+        index_dir: Path | None = None,
+        max_age: float = DEFAULT_MAX_AGE,
+    ) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.competition_api = competition_api
+        self.index_dir = index_dir
+        self.max_age = max_age
+        # Each country's index, and when it was built
+        self._indexes: dict[str | None, tuple[float, CompetitionSearchIndex]] = {}
+        # Held while a country's index is loaded or built
+        self._country_locks: dict[str | None, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def fetch_competitions(
+        self,
+        query: str | None,
+        country: str | None,
+        sort_desc=False,
+        announced_after: str | None = None,
+    ) -> list[dict[str, Any]]:
+        competitions = self.index(country).search(query)
+        if announced_after is not None:
+            competitions = [
+                comp
+                for comp in competitions
+                if self._announced_after(comp, announced_after)
+            ]
+        if sort_desc:
+            competitions.reverse()
+        return competitions
+
+    def index(self, country: str | None) -> CompetitionSearchIndex:
+        "Returns the search index for `country`, fetching and building it if needed"
+        # One fetch per country, even when subscribers query it concurrently,
+        # while different countries are fetched in parallel
+        with self._country_lock(country):
+            entry = self._indexes.get(country)
+            if entry is None or not self._is_fresh(entry[0]):
+                entry = self._load_or_build(country)
+                self._indexes[country] = entry
+            return entry[1]
+
+    def _country_lock(self, country: str | None) -> threading.Lock:
+        with self._lock:
+            return self._country_locks.setdefault(country, threading.Lock())
+
+    def _load_or_build(
+        self, country: str | None
+    ) -> tuple[float, CompetitionSearchIndex]:
+        path = self._index_path(country)
+        if path is not None:
+            try:
+                built_at = path.stat().st_mtime
+            except FileNotFoundError:
+                built_at = 0.0
+            if self._is_fresh(built_at):
+                self.logger.info("Loading search index %r", str(path))
+                return built_at, CompetitionSearchIndex.load(path)
+
+        self.logger.info("Building search index for country %r", country)
+        built_at = time.time()
+        competitions = self.competition_api.fetch_competitions(None, country)
+        index = CompetitionSearchIndex.build(competitions)
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            index.save(path)
+        return built_at, index
+
+    def _index_path(self, country: str | None) -> Path | None:
+        if self.index_dir is None:
+            return None
+        name = country if country else "all"
+        return self.index_dir / f"{name}.json"
+
+    def _is_fresh(self, built_at: float) -> bool:
+        return time.time() - built_at < self.max_age
+
+    def _announced_after(self, competition: dict[str, Any], after: str) -> bool:
+        announced_at = competition.get("announced_at")
+        if announced_at is None:
+            return False
+        return datetime.fromisoformat(announced_at) > datetime.fromisoformat(after)
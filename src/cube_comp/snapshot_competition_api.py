@@ -0,0 +1,193 @@
+import bisect
+import hashlib
+import itertools
+import json
+import logging
+import mmap
+import os
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from .command_error import CommandError
+from .competition_api import CompetitionAPI
+from .file_lock import atomic_write
+
+# Index entries are [start_date, offset, length] of one line of the snapshot
+_IndexEntry = list[Any]
+
+
+# Answers queries from a local snapshot of the API, without network access.
+# The snapshot is an NDJSON file of competition dicts, exactly as the API
+# returns them, plus an index in FILE.index that lists the position of every
+# line by start date, both overall and per country. The data file is memory
+# mapped, so a query only decodes the lines of the matching competitions. The
+# index also holds a hash of the data file, so that a data file from another
+# snapshot, even one of the same size, is never read with the wrong offsets.
+#
+# Queries match like the API's `q` parameter: every word must appear in the
+# ID, name, short name, city or venue, ignoring case.
+class SnapshotCompetitionAPI(CompetitionAPI):
+    INDEX_VERSION = 2
+    # Competitions per page yielded by iter_competition_pages()
+    PAGE_SIZE = 100
+    # Times to open a snapshot that is being replaced, and seconds in between
+    OPEN_ATTEMPTS = 5
+    RETRY_INTERVAL = 0.05
+
+    def __init__(self, path: Path) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        # A writer replaces the data, then the index, so while a snapshot is
+        # being replaced, the data file and index can be from different ones
+        for attempt in range(self.OPEN_ATTEMPTS):
+            if attempt > 0:
+                time.sleep(self.RETRY_INTERVAL)
+            index = self._read_index(path)
+            self._open_data()
+            if index["data_hash"] == self._data_hash(self._data):
+                break
+            self.close()
+        else:
+            raise CommandError(f"Snapshot {path} does not match its index")
+        self._all: list[_IndexEntry] = index["all"]
+        self._countries: dict[str, list[_IndexEntry]] = index["countries"]
+
+    def _open_data(self) -> None:
+        self._file = open(self.path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        # Empty files cannot be mapped
+        self._data: mmap.mmap | bytes = b""
+        if size > 0:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self) -> None:
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+    def __enter__(self) -> "SnapshotCompetitionAPI":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def fetch_competitions(
+        self,
+        query: str | None,
+        country: str | None,
+        sort_desc=False,
+        announced_after: str | None = None,
+    ) -> list[dict[str, Any]]:
+        competitions = list(self._iter_matches(query, country, announced_after))
+        self.logger.info(
+            "Found %r competitions in snapshot for query %r, country %r",
+            len(competitions),
+            query,
+            country,
+        )
+        if sort_desc:
+            competitions.reverse()
+        return competitions
+
+    def iter_competition_pages(
+        self,
+        query: str | None,
+        country: str | None,
+        announced_after: str | None = None,
+    ) -> Iterator[list[dict[str, Any]]]:
+        page = []
+        for competition in self._iter_matches(query, country, announced_after):
+            page.append(competition)
+            if len(page) == self.PAGE_SIZE:
+                yield page
+                page = []
+        if len(page) > 0:
+            yield page
+
+    def _iter_matches(
+        self, query: str | None, country: str | None, announced_after: str | None
+    ) -> Iterator[dict[str, Any]]:
+        "Decodes the matching competitions one at a time, by start date"
+        entries = self._all if not country else self._countries.get(country, [])
+        # Like the API, only list competitions from today on
+        first = bisect.bisect_left(entries, [date.today().isoformat()])
+        words = query.lower().split() if query else []
+        after = datetime.fromisoformat(announced_after) if announced_after else None
+
+        for _, offset, length in itertools.islice(entries, first, None):
+            end = offset + length
+            competition = json.loads(self._data[offset:end])
+            if self._matches(competition, words, after):
+                yield competition
+
+    @classmethod
+    def write(cls, path: Path, competitions: Iterable[dict[str, Any]]) -> int:
+        """
+        Writes a snapshot of `competitions` and its index, replacing any
+        existing snapshot, and returns the number of competitions written.
+        """
+        unique = {comp["id"]: comp for comp in competitions}
+        ordered = sorted(unique.values(), key=lambda c: (c["start_date"], c["id"]))
+
+        all_entries: list[_IndexEntry] = []
+        countries: dict[str, list[_IndexEntry]] = {}
+        offset = 0
+        lines = []
+        for comp in ordered:
+            line = json.dumps(comp, separators=(",", ":")).encode() + b"\n"
+            entry = [comp["start_date"], offset, len(line)]
+            all_entries.append(entry)
+            country = comp.get("country_iso2")
+            if country:
+                countries.setdefault(country, []).append(entry)
+            lines.append(line)
+            offset += len(line)
+
+        data = b"".join(lines)
+        index = {
+            "version": cls.INDEX_VERSION,
+            "data_hash": cls._data_hash(data),
+            "all": all_entries,
+            "countries": countries,
+        }
+        # The data first, so a reader sees either the old index, which no
+        # longer matches the data, or the new one.
+        atomic_write(path, data)
+        atomic_write(cls._index_path(path), json.dumps(index))
+        return len(ordered)
+
+    def _matches(
+        self, competition: dict[str, Any], words: list[str], after: datetime | None
+    ) -> bool:
+        if after is not None:
+            announced_at = competition.get("announced_at")
+            if announced_at is None or datetime.fromisoformat(announced_at) <= after:
+                return False
+        if len(words) == 0:
+            return True
+        fields = ["id", "name", "short_name", "city", "venue"]
+        text = " ".join(str(competition.get(field) or "") for field in fields).lower()
+        return all(word in text for word in words)
+
+    @classmethod
+    def _read_index(cls, path: Path) -> dict[str, Any]:
+        index_path = cls._index_path(path)
+        try:
+            index = json.loads(index_path.read_text())
+        except FileNotFoundError:
+            raise CommandError(f"No snapshot index: {index_path}")
+        except ValueError as e:
+            raise CommandError(f"Cannot read snapshot index {index_path}: {e}")
+        if index.get("version") != cls.INDEX_VERSION:
+            raise CommandError(f"Unsupported snapshot index version: {index_path}")
+        return index
+
+    @staticmethod
+    def _data_hash(data: mmap.mmap | bytes) -> str:
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    @staticmethod
+    def _index_path(path: Path) -> Path:
+        return path.with_name(path.name + ".index")
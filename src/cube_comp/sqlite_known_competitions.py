@@ -0,0 +1,266 @@
+import logging
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from .bloom_filter import BloomFilter
+from .competition import Competition
+from .file_lock import FileLock
+from .known_competitions import (
+    DEFAULT_EXPIRY_DAYS,
+    DEFAULT_SUBSCRIBER,
+    CompetitionChanges,
+    KnownCompetitionsStore,
+    competition_fingerprint,
+    expiry_cutoff,
+)
+
+# The start date and fingerprint recorded for a competition
+_Entry = tuple[str, str]
+
+
+# Keeps known competitions in a SQLite database, so many notifiers can share
+# one state file. Each notifier uses its own `subscriber` name, and only sees
+# and records rows for that subscriber. Like KnownCompetitionsLog, competitions
+# are forgotten `expiry_days` after they start, so the database does not grow
+# over time. Each row also keeps the competition's fingerprint, so that changes
+# to known competitions are reported. Rows from older versions have no start
+# date or fingerprint, and are neither forgotten nor reported as changed until
+# their competition is listed again.
+#
+# With `bloom_filter`, a Bloom filter of the subscriber's IDs is kept in memory,
+# and only IDs that it may contain are looked up in the database. This pays off
+# for large histories shared by many subscribers, where most listed IDs are new
+# to any one subscriber.
+class SQLiteKnownCompetitions(KnownCompetitionsStore):
+    DEFAULT_SUBSCRIBER = DEFAULT_SUBSCRIBER
+    # Smallest Bloom filter capacity, in IDs
+    MIN_BLOOM_CAPACITY = 1024
+
+    def __init__(
+        self,
+        path: Path,
+        subscriber: str = DEFAULT_SUBSCRIBER,
+        expiry_days: int | None = DEFAULT_EXPIRY_DAYS,
+        bloom_filter: bool = False,
+        lock_timeout: float = FileLock.DEFAULT_TIMEOUT,
+    ) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.subscriber = subscriber
+        self.expiry_days = expiry_days
+        # Autocommit mode; transactions are managed explicitly below. SQLite
+        # does its own locking, so `lock_timeout` is how long to wait for it.
+        self._connection = sqlite3.connect(
+            path, timeout=lock_timeout, isolation_level=None, check_same_thread=False
+        )
+        self._create_schema()
+        self._bloom_filter: BloomFilter | None = None
+        if bloom_filter:
+            self._build_bloom_filter()
+
+    def _create_schema(self) -> None:
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS known_competitions (
+                subscriber TEXT NOT NULL,
+                competition_id TEXT NOT NULL,
+                first_seen TEXT NOT NULL,
+                start_date TEXT,
+                fingerprint TEXT,
+                PRIMARY KEY (subscriber, competition_id)
+            ) WITHOUT ROWID
+            """
+        )
+        columns = [
+            row[1]
+            for row in self._connection.execute("PRAGMA table_info(known_competitions)")
+        ]
+        # Added by later versions
+        for column in ["start_date", "fingerprint"]:
+            if column not in columns:
+                self._connection.execute(
+                    f"ALTER TABLE known_competitions ADD COLUMN {column} TEXT"
+                )
+        self._connection.execute(
+            """
+            CREATE INDEX IF NOT EXISTS known_competitions_start_date
+            ON known_competitions (subscriber, start_date)
+            """
+        )
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> "SQLiteKnownCompetitions":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def filter_competitions(self, competitions: list[Competition]) -> list[Competition]:
+        return self.classify_competitions(competitions).new
+
+    def classify_competitions(
+        self, competitions: list[Competition]
+    ) -> CompetitionChanges:
+        entries = {
+            comp.id: (comp.start_date.isoformat(), competition_fingerprint(comp))
+            for comp in competitions
+        }
+        first_seen = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        cutoff = expiry_cutoff(self.expiry_days)
+
+        # Take the write lock up front so concurrent notifiers for the same
+        # subscriber cannot both report a competition.
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            if cutoff is not None:
+                self._delete_expired(cutoff)
+            new_ids, changed_ids = self._record_entries(entries, first_seen)
+            self._connection.execute("COMMIT")
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self.logger.info(
+            "Recorded %r new known comps for %r", len(new_ids), self.subscriber
+        )
+        if self._bloom_filter is not None:
+            for id in new_ids:
+                self._bloom_filter.add(id)
+            if self._bloom_filter.is_full:
+                self._build_bloom_filter()
+
+        changes = CompetitionChanges()
+        for comp in competitions:
+            if comp.id in new_ids:
+                changes.new.append(comp)
+            elif comp.id in changed_ids:
+                self.logger.info("Known competition with ID %r changed", comp.id)
+                changes.changed.append(comp)
+            else:
+                self.logger.info(
+                    "Skipping already known competition with ID %r", comp.id
+                )
+        return changes
+
+    def classify_competition_pages(
+        self, pages: Iterable[list[Competition]]
+    ) -> Iterator[CompetitionChanges]:
+        # One transaction per page, committed before the page is handed on
+        for page in pages:
+            yield self.classify_competitions(page)
+
+    def first_seen(self, competition_id: str) -> datetime | None:
+        row = self._connection.execute(
+            "SELECT first_seen FROM known_competitions"
+            " WHERE subscriber = ? AND competition_id = ?",
+            (self.subscriber, competition_id),
+        ).fetchone()
+        if row is None:
+            return None
+        return datetime.fromisoformat(row[0])
+
+    def _record_entries(
+        self, entries: dict[str, _Entry], first_seen: str
+    ) -> tuple[set[str], set[str]]:
+        """
+        Records the competitions that are not known yet, and the new entries of
+        known ones. Returns the IDs of new competitions, and of known ones whose
+        fingerprint changed.
+        """
+        ids = list(entries)
+        if self._bloom_filter is None:
+            known_fingerprints = self._select_known_fingerprints(ids)
+            new_ids = [id for id in ids if id not in known_fingerprints]
+            self._connection.executemany(
+                "INSERT INTO known_competitions"
+                " (subscriber, competition_id, first_seen, start_date, fingerprint)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [(self.subscriber, id, first_seen, *entries[id]) for id in new_ids],
+            )
+        else:
+            known_fingerprints = self._select_known_fingerprints(
+                [id for id in ids if id in self._bloom_filter]
+            )
+            # Another notifier may have recorded IDs since the filter was built,
+            # so an ID is only new if inserting it adds a row
+            new_ids = []
+            for id in ids:
+                if id in known_fingerprints:
+                    continue
+                cursor = self._connection.execute(
+                    "INSERT OR IGNORE INTO known_competitions"
+                    " (subscriber, competition_id, first_seen, start_date, fingerprint)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (self.subscriber, id, first_seen, *entries[id]),
+                )
+                if cursor.rowcount == 1:
+                    new_ids.append(id)
+                else:
+                    known_fingerprints[id] = None
+
+        changed_ids = {
+            id
+            for id, fingerprint in known_fingerprints.items()
+            if fingerprint is not None and fingerprint != entries[id][1]
+        }
+        # Competitions can be moved to another date or otherwise changed, and
+        # rows from older versions have no start date or fingerprint
+        self._connection.executemany(
+            "UPDATE known_competitions SET start_date = ?, fingerprint = ?"
+            " WHERE subscriber = ? AND competition_id = ?"
+            " AND (start_date IS NOT ? OR fingerprint IS NOT ?)",
+            [
+                (*entries[id], self.subscriber, id, *entries[id])
+                for id in known_fingerprints
+            ],
+        )
+        return set(new_ids), changed_ids
+
+    def _delete_expired(self, cutoff: str) -> None:
+        cursor = self._connection.execute(
+            "DELETE FROM known_competitions WHERE subscriber = ? AND start_date < ?",
+            (self.subscriber, cutoff),
+        )
+        if cursor.rowcount > 0:
+            self.logger.info(
+                "Forgot %r expired known comps for %r", cursor.rowcount, self.subscriber
+            )
+
+    def _build_bloom_filter(self) -> None:
+        (count,) = self._connection.execute(
+            "SELECT COUNT(*) FROM known_competitions WHERE subscriber = ?",
+            (self.subscriber,),
+        ).fetchone()
+        # Room to grow before the filter needs to be rebuilt
+        capacity = max(2 * count, self.MIN_BLOOM_CAPACITY)
+        rows = self._connection.execute(
+            "SELECT competition_id FROM known_competitions WHERE subscriber = ?",
+            (self.subscriber,),
+        )
+        self._bloom_filter = BloomFilter(capacity, keys=(row[0] for row in rows))
+        self.logger.info(
+            "Built Bloom filter of %r known comps for %r", count, self.subscriber
+        )
+
+    def _select_known_fingerprints(self, ids: list[str]) -> dict[str, str | None]:
+        "Returns the fingerprint of each of `ids` that is known"
+        # Look the batch up through the primary key, in chunks that stay below
+        # SQLite's bound parameter limit.
+        known_fingerprints: dict[str, str | None] = {}
+        chunk_size = 500
+        for start in range(0, len(ids), chunk_size):
+            end = start + chunk_size
+            chunk = ids[start:end]
+            placeholders = ", ".join("?" for _ in chunk)
+            rows = self._connection.execute(
+                "SELECT competition_id, fingerprint FROM known_competitions"
+                f" WHERE subscriber = ? AND competition_id IN ({placeholders})",
+                [self.subscriber, *chunk],
+            )
+            known_fingerprints.update(rows)
+        return known_fingerprints
@@ -0,0 +1,91 @@
+import json
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Any
+
+from .command_error import CommandError
+from .geo_index import validate_coordinates
+
+
+@dataclass
+class Subscription:
+    name: str
+
+    query: str | None = None
+    country: str | None = None
+    # Only competitions within radius_km of [latitude, longitude]
+    near: list[float] | None = None
+    radius_km: float | None = None
+    # Known competitions store, in the same format as the -k option
+    known: str | None = None
+
+    # Competitions are printed if there is no address
+    email_to: str | None = None
+    email_from: str | None = None
+    email_subject: str | None = None
+
+    @property
+    def fetch_key(self) -> tuple[str | None, str | None]:
+        "Subscriptions with equal keys share the same fetched competitions"
+        return (self.query, self.country)
+
+
+def load_subscriptions(path: Path) -> list[Subscription]:
+    """
+    Reads subscriptions from a TOML or JSON file, depending on its extension.
+    Both formats hold a `subscriptions` list of tables, for example:
+
+        [[subscriptions]]
+        name = "alice"
+        query = "illinois"
+        country = "US"
+        known = "sqlite:known.db"
+        near = [41.88, -87.63]
+        radius_km = 150
+        email_to = "alice@example.com"
+    """
+    try:
+        if path.suffix == ".toml":
+            import tomllib
+
+            with open(path, "rb") as file:
+                document = tomllib.load(file)
+        else:
+            with open(path) as file:
+                document = json.load(file)
+    except (OSError, ValueError) as e:
+        raise CommandError(f"Cannot read subscriptions: {path}: {e}")
+
+    entries = document.get("subscriptions") if isinstance(document, dict) else None
+    if not isinstance(entries, list):
+        raise CommandError(f"No subscriptions list in {path}")
+    return [_subscription_from_dict(entry, path) for entry in entries]
+
+
+def _subscription_from_dict(entry: Any, path: Path) -> Subscription:
+    field_names = {field.name for field in fields(Subscription)}
+    if not isinstance(entry, dict) or "name" not in entry:
+        raise CommandError(f"Subscription without a name in {path}: {entry!r}")
+    unknown = set(entry) - field_names
+    if unknown:
+        raise CommandError(
+            f"Unknown subscription keys in {path}: {', '.join(sorted(unknown))}"
+        )
+    subscription = Subscription(**entry)
+    if subscription.near is not None:
+        try:
+            validate_coordinates(*subscription.near)
+        except (TypeError, ValueError):
+            raise CommandError(
+                f"Subscription {subscription.name!r} in {path} has invalid near: "
+                f"{subscription.near!r}"
+            )
+    if subscription.radius_km is not None:
+        if not isinstance(subscription.radius_km, (int, float)) or (
+            subscription.radius_km <= 0
+        ):
+            raise CommandError(
+                f"Subscription {subscription.name!r} in {path} has invalid "
+                f"radius_km: {subscription.radius_km!r}"
+            )
+    return subscription
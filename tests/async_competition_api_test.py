@@ -0,0 +1,121 @@
+import asyncio
+import json
+from pathlib import Path
+from typing import Any, cast
+
+import aiohttp
+
+from cube_comp import AsyncWCACompetitionAPI, CompetitionAPIOptions, ResponseCache
+
+from .competition_api_test import minimal_dict_with_id
+
+
+class FakeAsyncResponse:
+    def __init__(
+        self,
+        competitions: list[dict[str, Any]],
+        headers: dict[str, str] | None = None,
+        status: int = 200,
+    ) -> None:
+        self.status = status
+        self._competitions = competitions
+        self.headers = headers or {}
+        self.links: dict[str, Any] = {}
+
+    async def __aenter__(self) -> "FakeAsyncResponse":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        pass
+
+    def raise_for_status(self) -> None:
+        if self.status >= 400:
+            raise aiohttp.ClientError(self.status)
+
+    async def read(self) -> bytes:
+        return json.dumps(self._competitions).encode()
+
+
+class FakeAsyncSession:
+    def __init__(self, responses: dict[int, list[FakeAsyncResponse]]) -> None:
+        self.responses = responses
+        self.requested_pages: list[int] = []
+
+    def get(
+        self, url: str, params: dict[str, str], headers: dict[str, str]
+    ) -> FakeAsyncResponse:
+        page_number = int(params.get("page", "1"))
+        self.requested_pages.append(page_number)
+        return self.responses[page_number].pop(0)
+
+
+class TestAsyncWCACompetitionAPI:
+    def fetch(self, session: FakeAsyncSession) -> list[dict[str, Any]]:
+        options = CompetitionAPIOptions(backoff_factor=0, backoff_jitter=0)
+        api = AsyncWCACompetitionAPI(
+            options, session=cast(aiohttp.ClientSession, session)
+        )
+        return asyncio.run(api.fetch_competitions(None, "US"))
+
+    def test_fetches_all_pages_from_total(self) -> None:
+        headers = {"Total": "3", "Per-Page": "1"}
+        session = FakeAsyncSession(
+            {
+                1: [FakeAsyncResponse([minimal_dict_with_id("A")], headers)],
+                2: [FakeAsyncResponse([minimal_dict_with_id("B")], headers)],
+                3: [FakeAsyncResponse([minimal_dict_with_id("C")], headers)],
+            }
+        )
+
+        comps = self.fetch(session)
+
+        assert [c["id"] for c in comps] == ["A", "B", "C"]
+        assert sorted(session.requested_pages) == [1, 2, 3]
+
+    def test_retries_server_errors(self) -> None:
+        session = FakeAsyncSession(
+            {
+                1: [
+                    FakeAsyncResponse([], status=503),
+                    FakeAsyncResponse([], {"Retry-After": "0"}, status=429),
+                    FakeAsyncResponse([minimal_dict_with_id("A")]),
+                ]
+            }
+        )
+
+        comps = self.fetch(session)
+
+        assert [c["id"] for c in comps] == ["A"]
+        assert session.requested_pages == [1, 1, 1]
+
+    def test_retry_after_is_finite_and_capped(self) -> None:
+        api = AsyncWCACompetitionAPI(CompetitionAPIOptions(timeout=30.0))
+
+        assert api._retry_after("2.5") == 2.5
+        assert api._retry_after("-1") == 0.0
+        assert api._retry_after("3600") == 30.0
+        assert api._retry_after("inf") is None
+        assert api._retry_after("nan") is None
+        assert api._retry_after("Wed, 21 Oct 2099 07:28:00 GMT") == 30.0
+        assert api._retry_after("soon") is None
+
+    def test_caches_pages(self, tmp_path: Path) -> None:
+        options = CompetitionAPIOptions(cache=ResponseCache(tmp_path))
+        session = FakeAsyncSession(
+            {1: [FakeAsyncResponse([minimal_dict_with_id("A")])]}
+        )
+
+        async def fetch_twice() -> list[list[dict[str, Any]]]:
+            api = AsyncWCACompetitionAPI(
+                options, session=cast(aiohttp.ClientSession, session)
+            )
+            return [
+                await api.fetch_competitions(None, "US"),
+                await api.fetch_competitions(None, "US"),
+            ]
+
+        first, second = asyncio.run(fetch_twice())
+
+        assert first == second
+        assert [c["id"] for c in first] == ["A"]
+        assert session.requested_pages == [1]
@@ -0,0 +1,33 @@
+import pytest
+
+from cube_comp import BloomFilter
+
+
+class TestBloomFilter:
+    def test_contains_added_keys(self) -> None:
+        keys = [f"Comp{i}" for i in range(1000)]
+
+        bloom_filter = BloomFilter(1000, keys=keys)
+
+        assert all(key in bloom_filter for key in keys)
+        assert bloom_filter.count == 1000
+        assert not bloom_filter.is_full
+
+    def test_false_positive_rate(self) -> None:
+        bloom_filter = BloomFilter(1000, keys=(f"Comp{i}" for i in range(1000)))
+
+        false_positives = sum(f"Other{i}" in bloom_filter for i in range(10000))
+
+        # About 1%, with plenty of room for chance
+        assert false_positives < 300
+
+    def test_is_full(self) -> None:
+        bloom_filter = BloomFilter(2, keys=["A", "B"])
+
+        bloom_filter.add("C")
+
+        assert bloom_filter.is_full
+
+    def test_invalid_error_rate(self) -> None:
+        with pytest.raises(ValueError):
+            BloomFilter(10, error_rate=1.5)
@@ -0,0 +1,197 @@
+import json
+import threading
+from typing import Any, cast
+
+import requests
+
+from cube_comp import CompetitionAPIOptions, MetricsRecorder, WCACompetitionAPI
+
+
+def minimal_dict_with_id(id: str, start_date: str = "2024-01-01") -> dict[str, Any]:
+    dict = {
+        "id": id,
+        "name": f"Name {id}",
+        "short_name": f"Short Name {id}",
+        "start_date": start_date,
+        "results_posted_at": None,
+        "city": "Chicago, IL",
+        "venue": "Wrigley Field",
+        "website": f"https://example.com/{id}/",
+    }
+    return dict
+
+
+class FakeResponse:
+    def __init__(
+        self,
+        competitions: list[dict[str, Any]],
+        headers: dict[str, str] | None = None,
+        has_next: bool = False,
+        status_code: int = 200,
+    ) -> None:
+        self.status_code = status_code
+        self._competitions = competitions
+        self.headers = headers or {}
+        self.links = {"next": {"url": "next"}} if has_next else {}
+
+    def raise_for_status(self) -> None:
+        pass
+
+    @property
+    def content(self) -> bytes:
+        return json.dumps(self._competitions).encode()
+
+    def json(self) -> list[dict[str, Any]]:
+        return self._competitions
+
+
+class FakeSession:
+    def __init__(self, pages: list[FakeResponse]) -> None:
+        self.pages = pages
+        self.requested_pages: list[int] = []
+        self.request_headers: list[dict[str, str]] = []
+        self.request_params: list[dict[str, str]] = []
+        self._lock = threading.Lock()
+
+    def get(
+        self, url: str, params: dict[str, str], headers: dict[str, str], timeout: float
+    ) -> FakeResponse:
+        page_number = int(params.get("page", "1"))
+        with self._lock:
+            self.requested_pages.append(page_number)
+            self.request_headers.append(headers)
+            self.request_params.append(params)
+        return self.pages[page_number - 1]
+
+
+class TestWCACompetitionAPI:
+    def api_with_session(self, session: FakeSession) -> WCACompetitionAPI:
+        return WCACompetitionAPI(session=cast(requests.Session, session))
+
+    def test_single_page(self) -> None:
+        fake = FakeSession(
+            [
+                FakeResponse(
+                    [minimal_dict_with_id("A"), minimal_dict_with_id("B")],
+                    {"Total": "2", "Per-Page": "25"},
+                )
+            ]
+        )
+
+        comps = self.api_with_session(fake).fetch_competitions("illinois", "US")
+
+        assert [c["id"] for c in comps] == ["A", "B"]
+        assert fake.requested_pages == [1]
+
+    def test_fetches_all_pages_from_total(self) -> None:
+        headers = {"Total": "5", "Per-Page": "2"}
+        fake = FakeSession(
+            [
+                FakeResponse(
+                    [
+                        minimal_dict_with_id("A", "2024-01-01"),
+                        minimal_dict_with_id("B", "2024-01-03"),
+                    ],
+                    headers,
+                ),
+                FakeResponse(
+                    [
+                        minimal_dict_with_id("C", "2024-01-02"),
+                        minimal_dict_with_id("B", "2024-01-03"),
+                    ],
+                    headers,
+                ),
+                FakeResponse([minimal_dict_with_id("D", "2024-01-04")], headers),
+            ]
+        )
+
+        comps = self.api_with_session(fake).fetch_competitions(None, "US")
+
+        assert [c["id"] for c in comps] == ["A", "C", "B", "D"]
+        assert sorted(fake.requested_pages) == [1, 2, 3]
+
+    def test_iter_competition_pages_yields_pages_in_order(self) -> None:
+        headers = {"Total": "3", "Per-Page": "1"}
+        fake = FakeSession(
+            [
+                FakeResponse([minimal_dict_with_id("A")], headers),
+                FakeResponse([minimal_dict_with_id("B")], headers),
+                FakeResponse([minimal_dict_with_id("C")], headers),
+            ]
+        )
+
+        pages = self.api_with_session(fake).iter_competition_pages(None, "US")
+
+        assert [c["id"] for c in next(pages)] == ["A"]
+        assert fake.requested_pages == [1]
+        assert [[c["id"] for c in page] for page in pages] == [["B"], ["C"]]
+
+    def test_follows_next_links_without_total(self) -> None:
+        fake = FakeSession(
+            [
+                FakeResponse([minimal_dict_with_id("A")], has_next=True),
+                FakeResponse([minimal_dict_with_id("B")], has_next=True),
+                FakeResponse([minimal_dict_with_id("C")]),
+            ]
+        )
+
+        comps = self.api_with_session(fake).fetch_competitions(None, None)
+
+        assert [c["id"] for c in comps] == ["A", "B", "C"]
+        assert fake.requested_pages == [1, 2, 3]
+
+    def test_announced_after(self) -> None:
+        fake = FakeSession([FakeResponse([minimal_dict_with_id("A")])])
+        api = self.api_with_session(fake)
+
+        api.fetch_competitions(None, "US", announced_after="2024-01-02T00:00:00Z")
+
+        assert fake.request_params[0]["announced_after"] == "2024-01-02T00:00:00Z"
+
+    def test_records_http_metrics(self) -> None:
+        pages = [
+            FakeResponse([minimal_dict_with_id("A")], has_next=True),
+            FakeResponse([minimal_dict_with_id("B")]),
+        ]
+        metrics = MetricsRecorder()
+        api = WCACompetitionAPI(
+            CompetitionAPIOptions(instrumentation=metrics),
+            session=cast(requests.Session, FakeSession(pages)),
+        )
+
+        api.fetch_competitions(None, None)
+
+        assert metrics.counters["http_requests"] == 2
+        assert metrics.counters["http_response_bytes"] == sum(
+            len(page.content) for page in pages
+        )
+
+    def test_sort_desc(self) -> None:
+        fake = FakeSession(
+            [
+                FakeResponse(
+                    [
+                        minimal_dict_with_id("A", "2024-01-01"),
+                        minimal_dict_with_id("B", "2024-01-02"),
+                    ]
+                )
+            ]
+        )
+
+        comps = self.api_with_session(fake).fetch_competitions(
+            None, None, sort_desc=True
+        )
+
+        assert [c["id"] for c in comps] == ["B", "A"]
+
+    def test_session_pool_and_retries(self) -> None:
+        options = CompetitionAPIOptions(max_workers=2, pool_size=8, retries=5)
+
+        with WCACompetitionAPI(options) as api:
+            adapter = api._session.get_adapter("https://www.worldcubeassociation.org")
+
+        assert isinstance(adapter, requests.adapters.HTTPAdapter)
+        assert adapter._pool_maxsize == 8  # type: ignore[attr-defined]
+        assert adapter.max_retries.total == 5
+        assert adapter.max_retries.respect_retry_after_header
+        assert 503 in (adapter.max_retries.status_forcelist or [])
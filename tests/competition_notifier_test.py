@@ -1,16 +1,41 @@
+import asyncio
+import inspect
+import json
+import threading
+from datetime import date
 from io import StringIO
-from typing import Any
+from pathlib import Path
+from typing import Any, Iterator
+
+import pytest
 
 from cube_comp import (
+    AsyncCompetitionAPI,
+    AsyncEmailService,
+    Competition,
     CompetitionAPI,
+    CompetitionChanges,
     CompetitionNotifier,
     CompetitionNotifierOptions,
     EmailService,
+    FetchCursor,
+    KnownCompetitions,
+    KnownCompetitionsLog,
+    KnownCompetitionsStore,
+    MetricsRecorder,
+    SQLiteKnownCompetitions,
+    Subscription,
+)
+from cube_comp.competition_notifier import (
+    BaseCompetitionNotifierInvocation,
+    _cleandoc_lines,
+    _competitions_template,
 )
 
 
 class FakeCompetitionAPI(CompetitionAPI):
-    def fetch_competitions(
+    # Written before announced_after, like other existing implementations
+    def fetch_competitions(  # type: ignore[override]
         self, query: str | None, country: str | None, sort_desc=False
     ) -> list[dict[str, Any]]:
         comp_a = self.minimal_dict_with_id("A")
@@ -32,6 +57,26 @@ class FakeCompetitionAPI(CompetitionAPI):
         return dict
 
 
+class CountryCompetitionAPI(FakeCompetitionAPI):
+    def __init__(self) -> None:
+        super().__init__()
+        self.fetches: list[tuple[str | None, str | None]] = []
+
+    def fetch_competitions(
+        self,
+        query: str | None,
+        country: str | None,
+        sort_desc=False,
+        announced_after: str | None = None,
+    ) -> list[dict[str, Any]]:
+        self.fetches.append((query, country))
+        # Every country shares competition "A"
+        comp_a = self.minimal_dict_with_id("A")
+        comp_country = self.minimal_dict_with_id(f"{country}")
+        comp_country["start_date"] = "2023-12-31"
+        return [comp_a, comp_country]
+
+
 class EmailServiceSpy(EmailService):
     def __init__(self) -> None:
         super().__init__()
@@ -39,6 +84,7 @@ class EmailServiceSpy(EmailService):
         self.send_email_count = 0
         self.sent_email_subject: str | None = None
         self.sent_email_content: str | None = None
+        self.sent_email_to_addresses: list[str] = []
 
     def configure_smtp(
         self,
@@ -53,10 +99,44 @@ class EmailServiceSpy(EmailService):
         self, to_address: str, from_address: str, subject: str, content: str
     ) -> None:
         self.send_email_count += 1
+        self.sent_email_to_addresses.append(to_address)
         self.sent_email_subject = subject
         self.sent_email_content = content
 
 
+class FakeAsyncCompetitionAPI(AsyncCompetitionAPI):
+    def __init__(self) -> None:
+        self.fake_api = FakeCompetitionAPI()
+
+    async def fetch_competitions(
+        self,
+        query: str | None,
+        country: str | None,
+        sort_desc=False,
+        announced_after: str | None = None,
+    ) -> list[dict[str, Any]]:
+        return self.fake_api.fetch_competitions(query, country, sort_desc)
+
+
+class AsyncEmailServiceSpy(AsyncEmailService):
+    def __init__(self) -> None:
+        self.spy = EmailServiceSpy()
+
+    def configure_smtp(
+        self,
+        smtp_host: str,
+        smtp_port: int,
+        smtp_user: str | None = None,
+        smtp_password: str | None = None,
+    ) -> None:
+        self.spy.configure_smtp(smtp_host, smtp_port, smtp_user, smtp_password)
+
+    async def send_email(
+        self, to_address: str, from_address: str, subject: str, content: str
+    ) -> None:
+        self.spy.send_email(to_address, from_address, subject, content)
+
+
 class CompetitionNotifierTestContext:
     def __init__(self) -> None:
         self.competition_api = FakeCompetitionAPI()
@@ -99,6 +179,28 @@ class TestCompetitionNotifier:
         assert ctx.email_service.configure_smtp_count == 0
         assert ctx.email_service.send_email_count == 0
 
+    def test_notify_records_metrics(self) -> None:
+        ctx = CompetitionNotifierTestContext()
+        metrics = MetricsRecorder()
+
+        options = CompetitionNotifierOptions(
+            stdout_io=ctx.stdout_io,
+            known_competitions_io=StringIO('["A"]'),
+            email_to="user1@example.com",
+            instrumentation=metrics,
+        )
+
+        ctx.notifier.notify(options)
+
+        assert sorted(metrics.stage_runs) == ["fetch", "filter", "render", "smtp"]
+        assert metrics.counters == {
+            "competitions_fetched": 3,
+            "competitions_filtered": 3,
+            "competitions_new": 2,
+            "competitions_changed": 0,
+            "emails_sent": 1,
+        }
+
     def test_notify_to_email_with_no_known_competitions(self) -> None:
         ctx = CompetitionNotifierTestContext()
 
@@ -159,3 +261,457 @@ class TestCompetitionNotifier:
         subject = ctx.email_service.sent_email_subject
         assert subject is not None
         assert subject == "My Subject"
+
+    def test_notify_multiple_queries_and_countries(self) -> None:
+        ctx = CompetitionNotifierTestContext()
+        competition_api = CountryCompetitionAPI()
+        notifier = CompetitionNotifier(competition_api, ctx.email_service)
+
+        options = CompetitionNotifierOptions(
+            stdout_io=ctx.stdout_io,
+            queries=["cube", "open"],
+            countries=["US", "CA", "MX"],
+        )
+
+        notifier.notify(options)
+
+        assert sorted(competition_api.fetches) == sorted(
+            (query, country)
+            for query in ["cube", "open"]
+            for country in ["US", "CA", "MX"]
+        )
+        output = ctx.stdout_io.getvalue()
+        assert output.count("ID: ") == 4
+        assert output.index("ID: CA") < output.index("ID: A")
+
+    def test_notify_subscriptions(self, tmp_path: Path) -> None:
+        ctx = CompetitionNotifierTestContext()
+        competition_api = CountryCompetitionAPI()
+        notifier = CompetitionNotifier(competition_api, ctx.email_service)
+        known_path = tmp_path / "bob.json"
+        known_path.write_text('["A"]')
+        subscriptions = [
+            Subscription("alice", country="US", email_to="alice@example.com"),
+            Subscription(
+                "bob", country="US", known=str(known_path), email_to="bob@example.com"
+            ),
+            Subscription("carol", country="CA", email_to="carol@example.com"),
+        ]
+        options = CompetitionNotifierOptions(stdout_io=ctx.stdout_io)
+
+        notifier.notify_subscriptions(subscriptions, options)
+
+        assert sorted(competition_api.fetches) == [(None, "CA"), (None, "US")]
+        assert ctx.email_service.sent_email_to_addresses == [
+            "alice@example.com",
+            "bob@example.com",
+            "carol@example.com",
+        ]
+        content = ctx.email_service.sent_email_content
+        assert content is not None
+        assert "ID: CA" in content
+        assert known_path.read_text().count('"US"') == 1
+
+
+class ThreadRecordingKnownCompetitions(KnownCompetitions):
+    def __init__(self) -> None:
+        super().__init__(StringIO())
+        self.threads: list[threading.Thread] = []
+
+    def classify_competitions(
+        self, competitions: list[Competition]
+    ) -> CompetitionChanges:
+        self.threads.append(threading.current_thread())
+        return super().classify_competitions(competitions)
+
+
+class ThreadRecordingStringIO(StringIO):
+    def __init__(self) -> None:
+        super().__init__()
+        self.threads: list[threading.Thread] = []
+
+    def write(self, s: str) -> int:
+        self.threads.append(threading.current_thread())
+        return super().write(s)
+
+
+class TestCompetitionNotifierAsync:
+    def test_notify_async_to_email(self) -> None:
+        email_service = AsyncEmailServiceSpy()
+        notifier = CompetitionNotifier(FakeAsyncCompetitionAPI(), email_service)
+        options = CompetitionNotifierOptions(
+            stdout_io=StringIO(),
+            queries=["cube", "open"],
+            email_to="user1@example.com",
+        )
+
+        asyncio.run(notifier.notify_async(options))
+
+        assert email_service.spy.configure_smtp_count == 1
+        assert email_service.spy.send_email_count == 1
+        content = email_service.spy.sent_email_content
+        assert content is not None
+        assert content.count("ID: ") == 3
+
+    def test_notify_async_keeps_blocking_stages_off_the_loop(self) -> None:
+        stdout_io = ThreadRecordingStringIO()
+        known_comps = ThreadRecordingKnownCompetitions()
+        notifier = CompetitionNotifier(
+            FakeAsyncCompetitionAPI(), AsyncEmailServiceSpy()
+        )
+        options = CompetitionNotifierOptions(
+            stdout_io=stdout_io, known_competitions=known_comps
+        )
+
+        asyncio.run(notifier.notify_async(options))
+
+        assert stdout_io.getvalue().count("ID: ") == 3
+        loop_thread = threading.current_thread()
+        assert len(known_comps.threads) == 1
+        assert loop_thread not in known_comps.threads
+        assert len(stdout_io.threads) > 0
+        assert loop_thread not in stdout_io.threads
+
+    def test_notify_async_adapts_sync_services(self) -> None:
+        ctx = CompetitionNotifierTestContext()
+        options = CompetitionNotifierOptions(
+            stdout_io=ctx.stdout_io, email_to="user1@example.com"
+        )
+
+        asyncio.run(ctx.notifier.notify_async(options))
+
+        assert ctx.email_service.send_email_count == 1
+
+    def test_notify_runs_async_services(self) -> None:
+        stdout_io = StringIO()
+        notifier = CompetitionNotifier(
+            FakeAsyncCompetitionAPI(), AsyncEmailServiceSpy()
+        )
+        options = CompetitionNotifierOptions(stdout_io=stdout_io)
+
+        notifier.notify(options)
+
+        assert stdout_io.getvalue().count("ID: ") == 3
+
+
+class TestTemplateRendering:
+    def competitions(self, count: int) -> list[Competition]:
+        api = FakeCompetitionAPI()
+        return [
+            Competition.from_dict(api.minimal_dict_with_id(f"Comp{i}"))
+            for i in range(count)
+        ]
+
+    def test_streamed_output_matches_cleandoc(self) -> None:
+        invocation = BaseCompetitionNotifierInvocation(
+            CompetitionNotifierOptions(stdout_io=StringIO())
+        )
+        template = _competitions_template()
+
+        for count in [0, 1, 3]:
+            competitions = self.competitions(count)
+            expected = inspect.cleandoc(template.render(competitions=competitions))
+
+            assert invocation.render_competitions(competitions) == expected
+
+    def test_cleandoc_lines_across_chunks(self) -> None:
+        text = "\n  \n  First\n\tTabbed\n\n\nLast  \n\n  \n"
+        chunks = [text[i:][:3] for i in range(0, len(text), 3)]
+
+        assert "".join(_cleandoc_lines(chunks)) == inspect.cleandoc(text)
+
+    def test_bytecode_cache_dir(self, tmp_path: Path) -> None:
+        options = CompetitionNotifierOptions(
+            stdout_io=StringIO(), template_cache_dir=tmp_path / "templates"
+        )
+        invocation = BaseCompetitionNotifierInvocation(options)
+
+        rendered = invocation.render_competitions(self.competitions(1))
+
+        assert rendered.count("ID: ") == 1
+        assert len(list((tmp_path / "templates").iterdir())) == 1
+
+
+class AnnouncementCompetitionAPI(FakeCompetitionAPI):
+    def __init__(self) -> None:
+        super().__init__()
+        self.announced_after: list[str | None] = []
+        self.ids = ["A", "B"]
+
+    def fetch_competitions(
+        self,
+        query: str | None,
+        country: str | None,
+        sort_desc=False,
+        announced_after: str | None = None,
+    ) -> list[dict[str, Any]]:
+        self.announced_after.append(announced_after)
+        comps: list[dict[str, Any]] = []
+        for id in self.ids:
+            comp = self.minimal_dict_with_id(id)
+            comp["announced_at"] = f"2024-01-0{len(comps) + 1}T12:00:00Z"
+            # Known competitions expire once they are over
+            comp["start_date"] = date.today().isoformat()
+            comps.append(comp)
+        return comps
+
+
+class TestIncrementalFetch:
+    def test_incremental_fetch_keeps_known_ids(self, tmp_path: Path) -> None:
+        api = AnnouncementCompetitionAPI()
+        notifier = CompetitionNotifier(api, EmailServiceSpy())
+        known_io = StringIO()
+
+        def notify() -> str:
+            stdout_io = StringIO()
+            options = CompetitionNotifierOptions(
+                stdout_io=stdout_io,
+                country="US",
+                known_competitions_io=known_io,
+                fetch_cursor=FetchCursor(tmp_path / "known.json.cursor"),
+            )
+            notifier.notify(options)
+            return stdout_io.getvalue()
+
+        assert notify().count("ID: ") == 2
+        api.ids = ["C"]
+        assert notify().count("ID: ") == 1
+
+        assert api.announced_after == [None, "2024-01-02T11:59:00+00:00"]
+        assert list(json.loads(known_io.getvalue())) == ["A", "B", "C"]
+
+
+class TestAPIWithoutAnnouncedAfter:
+    # FakeCompetitionAPI.fetch_competitions does not take announced_after
+    def test_notify_one_query(self) -> None:
+        ctx = CompetitionNotifierTestContext()
+        options = CompetitionNotifierOptions(
+            stdout_io=ctx.stdout_io, query="illinois", country="US"
+        )
+
+        ctx.notifier.notify(options)
+
+        assert ctx.stdout_io.getvalue().count("ID: ") == 3
+
+    def test_notify_multiple_queries(self) -> None:
+        ctx = CompetitionNotifierTestContext()
+        options = CompetitionNotifierOptions(
+            stdout_io=ctx.stdout_io, queries=["cube", "open"], countries=["US"]
+        )
+
+        ctx.notifier.notify(options)
+
+        assert ctx.stdout_io.getvalue().count("ID: ") == 3
+
+    def test_notify_async(self) -> None:
+        ctx = CompetitionNotifierTestContext()
+        options = CompetitionNotifierOptions(stdout_io=ctx.stdout_io)
+
+        asyncio.run(ctx.notifier.notify_async(options))
+
+        assert ctx.stdout_io.getvalue().count("ID: ") == 3
+
+
+class GeoCompetitionAPI(FakeCompetitionAPI):
+    LOCATIONS = {
+        "Chicago": (41.8781, -87.6298),
+        "Milwaukee": (43.0389, -87.9065),
+        "Seattle": (47.6062, -122.3321),
+    }
+
+    def fetch_competitions(
+        self,
+        query: str | None,
+        country: str | None,
+        sort_desc=False,
+        announced_after: str | None = None,
+    ) -> list[dict[str, Any]]:
+        competitions = []
+        for id, (latitude, longitude) in self.LOCATIONS.items():
+            comp = self.minimal_dict_with_id(id)
+            comp["latitude_degrees"] = latitude
+            comp["longitude_degrees"] = longitude
+            competitions.append(comp)
+        return competitions
+
+
+class TestGeoFilter:
+    def test_notify_near(self) -> None:
+        ctx = CompetitionNotifierTestContext()
+        notifier = CompetitionNotifier(GeoCompetitionAPI(), ctx.email_service)
+        options = CompetitionNotifierOptions(
+            stdout_io=ctx.stdout_io, near=(41.88, -87.63), radius_km=150
+        )
+
+        notifier.notify(options)
+
+        output = ctx.stdout_io.getvalue()
+        assert "ID: Chicago" in output
+        assert "ID: Milwaukee" in output
+        assert "ID: Seattle" not in output
+
+    def test_notify_subscriptions_near(self) -> None:
+        ctx = CompetitionNotifierTestContext()
+        notifier = CompetitionNotifier(GeoCompetitionAPI(), ctx.email_service)
+        subscriptions = [
+            Subscription("alice", near=[41.88, -87.63], radius_km=50),
+            Subscription("bob", near=[47.6, -122.3]),
+            Subscription("carol"),
+        ]
+        options = CompetitionNotifierOptions(stdout_io=ctx.stdout_io, radius_km=150)
+
+        notifier.notify_subscriptions(subscriptions, options)
+
+        outputs = ctx.stdout_io.getvalue().split("ID: ")
+        ids = [output.split()[0] for output in outputs[1:]]
+        assert ids == ["Chicago", "Seattle", "Chicago", "Milwaukee", "Seattle"]
+
+
+class TestOutputFormat:
+    def test_notify_as_ndjson(self) -> None:
+        ctx = CompetitionNotifierTestContext()
+        options = CompetitionNotifierOptions(
+            stdout_io=ctx.stdout_io,
+            known_competitions_io=StringIO('["B"]'),
+            output_format="ndjson",
+        )
+
+        ctx.notifier.notify(options)
+
+        lines = ctx.stdout_io.getvalue().splitlines()
+        assert [json.loads(line)["id"] for line in lines] == ["A", "C"]
+
+
+class PagedCompetitionAPI(FakeCompetitionAPI):
+    def __init__(self, stdout_io: StringIO) -> None:
+        self.stdout_io = stdout_io
+        # What had been printed when each page was fetched
+        self.output_per_page: list[str] = []
+
+    def iter_competition_pages(
+        self,
+        query: str | None,
+        country: str | None,
+        announced_after: str | None = None,
+    ) -> Iterator[list[dict[str, Any]]]:
+        for ids in [["A", "B"], ["B", "C"], ["D"]]:
+            self.output_per_page.append(self.stdout_io.getvalue())
+            yield [self.minimal_dict_with_id(id) for id in ids]
+
+
+class TestStreamingPipeline:
+    def test_prints_each_page_before_fetching_the_next(self) -> None:
+        ctx = CompetitionNotifierTestContext()
+        api = PagedCompetitionAPI(ctx.stdout_io)
+        notifier = CompetitionNotifier(api, ctx.email_service)
+        known_io = StringIO('["A"]')
+        metrics = MetricsRecorder()
+        options = CompetitionNotifierOptions(
+            stdout_io=ctx.stdout_io,
+            known_competitions_io=known_io,
+            output_format="ndjson",
+            instrumentation=metrics,
+        )
+
+        notifier.notify(options)
+
+        printed_ids = [
+            [json.loads(line)["id"] for line in output.splitlines()]
+            for output in api.output_per_page
+        ]
+        assert printed_ids == [[], ["B"], ["B", "C"]]
+        lines = ctx.stdout_io.getvalue().splitlines()
+        assert [json.loads(line)["id"] for line in lines] == ["B", "C", "D"]
+        assert list(json.loads(known_io.getvalue())) == ["A", "B", "C", "D"]
+        assert metrics.stage_runs == {"fetch": 1, "filter": 1, "render": 1}
+        assert metrics.counters == {
+            "competitions_fetched": 4,
+            "competitions_filtered": 4,
+            "competitions_new": 3,
+            "competitions_changed": 0,
+        }
+
+    def test_text_output_waits_for_every_page(self) -> None:
+        ctx = CompetitionNotifierTestContext()
+        notifier = CompetitionNotifier(
+            PagedCompetitionAPI(ctx.stdout_io), ctx.email_service
+        )
+        options = CompetitionNotifierOptions(stdout_io=ctx.stdout_io)
+
+        notifier.notify(options)
+
+        assert ctx.stdout_io.getvalue().startswith("4 Competitions:")
+
+
+class FailingPagedCompetitionAPI(FakeCompetitionAPI):
+    def __init__(self, fail: bool) -> None:
+        self.fail = fail
+
+    def iter_competition_pages(
+        self,
+        query: str | None,
+        country: str | None,
+        announced_after: str | None = None,
+    ) -> Iterator[list[dict[str, Any]]]:
+        yield [self.minimal_dict_with_id("A")]
+        if self.fail:
+            raise ConnectionError("Retries exhausted")
+        yield [self.minimal_dict_with_id("B")]
+
+
+class TestFailedFetch:
+    def notify(self, store: KnownCompetitionsStore, fail: bool) -> str:
+        ctx = CompetitionNotifierTestContext()
+        notifier = CompetitionNotifier(
+            FailingPagedCompetitionAPI(fail), ctx.email_service
+        )
+        options = CompetitionNotifierOptions(
+            stdout_io=ctx.stdout_io, known_competitions=store
+        )
+        notifier.notify(options)
+        return ctx.stdout_io.getvalue()
+
+    @pytest.mark.parametrize("store_name", ["log", "sqlite"])
+    def test_failed_page_is_fetched_again(
+        self, tmp_path: Path, store_name: str
+    ) -> None:
+        # The competitions are dated long ago, so keep them
+        store: KnownCompetitionsStore
+        if store_name == "log":
+            store = KnownCompetitionsLog(tmp_path / "known.txt", expiry_days=None)
+        else:
+            store = SQLiteKnownCompetitions(tmp_path / "known.db", expiry_days=None)
+
+        with pytest.raises(ConnectionError):
+            self.notify(store, fail=True)
+        output = self.notify(store, fail=False)
+
+        assert output.startswith("2 Competitions:")
+        assert "ID: A" in output
+        assert "ID: B" in output
+
+
+class TestChangedCompetitions:
+    def test_notify_lists_changed_competitions(self) -> None:
+        ctx = CompetitionNotifierTestContext()
+        known_io = StringIO()
+        options = CompetitionNotifierOptions(
+            stdout_io=StringIO(), known_competitions_io=known_io
+        )
+        ctx.notifier.notify(options)
+        known_comps = json.loads(known_io.getvalue())
+        known_comps["B"] = "0000000000000000"
+        known_io = StringIO(json.dumps(known_comps))
+        options = CompetitionNotifierOptions(
+            stdout_io=ctx.stdout_io,
+            known_competitions_io=known_io,
+            email_to="user1@example.com",
+        )
+
+        ctx.notifier.notify(options)
+
+        content = ctx.email_service.sent_email_content
+        assert content is not None
+        assert content.startswith("1 Changed Competition:")
+        assert content.count("ID: ") == 1
+        assert "ID: B" in content
@@ -36,10 +36,14 @@ class TestCompetition:
 
         # Optional
         assert comp.display_name is None
+        assert comp.latitude is None
+        assert comp.longitude is None
 
     def test_fully_populated_valid_dict(self) -> None:
         dict = self.minimal_dict
         dict["short_display_name"] = "A Short Display Name"
+        dict["latitude_degrees"] = 41.948437
+        dict["longitude_degrees"] = -87.655334
 
         comp = Competition.from_dict(dict)
 
@@ -55,3 +59,26 @@ class TestCompetition:
 
         # Optional
         assert comp.display_name == "A Short Display Name"
+        assert comp.latitude == 41.948437
+        assert comp.longitude == -87.655334
+
+    def test_from_dicts(self) -> None:
+        dict_a = self.minimal_dict
+        dict_b = self.minimal_dict
+        dict_b["id"] = "AnotherID"
+        dict_b["city"] = "".join(["Chicago", ", IL"])
+        dict_b["short_display_name"] = "A Short Display Name"
+        dict_b["latitude_degrees"] = 41.948437
+        dict_b["longitude_degrees"] = -87.655334
+
+        comps = Competition.from_dicts([dict_a, dict_b])
+
+        assert comps == [Competition.from_dict(dict_a), Competition.from_dict(dict_b)]
+        # Shared values are stored once
+        assert comps[0].city is comps[1].city
+        assert comps[0].start_date is comps[1].start_date
+
+    def test_has_no_instance_dict(self) -> None:
+        comp = Competition.from_dict(self.minimal_dict)
+
+        assert not hasattr(comp, "__dict__")
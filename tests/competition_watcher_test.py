@@ -0,0 +1,76 @@
+import os
+import signal
+from io import StringIO
+
+import pytest
+
+from cube_comp import (
+    CompetitionNotifier,
+    CompetitionNotifierOptions,
+    CompetitionWatcher,
+)
+
+from .competition_notifier_test import EmailServiceSpy, FakeCompetitionAPI
+
+
+class StoppingNotifier(CompetitionNotifier):
+    def __init__(self, polls: int) -> None:
+        super().__init__(FakeCompetitionAPI(), EmailServiceSpy())
+        self.polls = polls
+        self.notify_count = 0
+        self.watcher: CompetitionWatcher | None = None
+
+    def notify(self, options: CompetitionNotifierOptions) -> None:
+        self.notify_count += 1
+        assert self.watcher is not None
+        if self.notify_count == 1:
+            self.watcher.reload()
+        if self.notify_count == 2:
+            raise RuntimeError("Transient failure")
+        if self.notify_count == self.polls:
+            self.watcher.stop()
+
+
+class TestCompetitionWatcher:
+    def test_polls_until_stopped(self) -> None:
+        notifier = StoppingNotifier(polls=3)
+        reload_count = 0
+
+        def on_reload() -> None:
+            nonlocal reload_count
+            reload_count += 1
+
+        options = CompetitionNotifierOptions(stdout_io=StringIO())
+        watcher = CompetitionWatcher(notifier, options, interval=0, on_reload=on_reload)
+        notifier.watcher = watcher
+
+        watcher.run()
+
+        assert notifier.notify_count == 3
+        assert watcher.poll_count == 3
+        assert reload_count == 1
+
+    def test_next_delay_is_jittered(self) -> None:
+        options = CompetitionNotifierOptions(stdout_io=StringIO())
+        watcher = CompetitionWatcher(
+            StoppingNotifier(polls=1), options, interval=100, jitter=0.2
+        )
+
+        delays = [watcher.next_delay() for _ in range(100)]
+
+        assert all(80 <= delay <= 120 for delay in delays)
+
+    @pytest.mark.skipif(not hasattr(signal, "SIGHUP"), reason="POSIX signals")
+    def test_sigterm_stops(self) -> None:
+        notifier = CompetitionNotifier(FakeCompetitionAPI(), EmailServiceSpy())
+        options = CompetitionNotifierOptions(stdout_io=StringIO())
+        watcher = CompetitionWatcher(notifier, options, interval=0)
+        previous_handler = signal.getsignal(signal.SIGTERM)
+
+        def poll() -> None:
+            os.kill(os.getpid(), signal.SIGTERM)
+
+        watcher.poll = poll  # type: ignore[method-assign]
+        watcher.run()
+
+        assert signal.getsignal(signal.SIGTERM) == previous_handler
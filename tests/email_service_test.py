@@ -0,0 +1,118 @@
+import smtplib
+import threading
+from email.message import EmailMessage
+
+import pytest
+
+from cube_comp import OutgoingEmail, SMTPEmailService
+
+
+class FakeSMTP:
+    instances: list["FakeSMTP"] = []
+    # Outcomes of the next send_message calls across all connections, where
+    # None means success
+    failures: list[Exception | None] = []
+    lock = threading.Lock()
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+        self.started_tls = False
+        self.logged_in = False
+        self.sent: list[EmailMessage] = []
+        self.quit_called = False
+        with self.lock:
+            FakeSMTP.instances.append(self)
+
+    def starttls(self) -> None:
+        self.started_tls = True
+
+    def login(self, user: str, password: str) -> None:
+        self.logged_in = True
+
+    def send_message(self, msg: EmailMessage) -> None:
+        with self.lock:
+            failure = FakeSMTP.failures.pop(0) if FakeSMTP.failures else None
+            if failure is not None:
+                raise failure
+            self.sent.append(msg)
+
+    def quit(self) -> None:
+        self.quit_called = True
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def fake_smtp(monkeypatch: pytest.MonkeyPatch) -> type[FakeSMTP]:
+    FakeSMTP.instances = []
+    FakeSMTP.failures = []
+    monkeypatch.setattr("smtplib.SMTP", FakeSMTP)
+    return FakeSMTP
+
+
+def emails(count: int) -> list[OutgoingEmail]:
+    return [
+        OutgoingEmail(f"user{i}@example.com", "from@example.com", "Subject", "Body")
+        for i in range(count)
+    ]
+
+
+class TestSMTPEmailService:
+    def test_send_email(self, fake_smtp: type[FakeSMTP]) -> None:
+        service = SMTPEmailService()
+        service.configure_smtp("smtp.example.com", 587, "user", "password")
+
+        service.send_email("to@example.com", "from@example.com", "Subject", "Body")
+
+        [smtp] = fake_smtp.instances
+        assert smtp.started_tls and smtp.logged_in and smtp.quit_called
+        assert smtp.sent[0]["To"] == "to@example.com"
+
+    def test_send_emails_reuses_connection(self, fake_smtp: type[FakeSMTP]) -> None:
+        service = SMTPEmailService()
+
+        failed = service.send_emails(emails(5))
+
+        assert failed == []
+        [smtp] = fake_smtp.instances
+        assert len(smtp.sent) == 5
+
+    def test_reconnects_after_message_limit(self, fake_smtp: type[FakeSMTP]) -> None:
+        service = SMTPEmailService(max_messages_per_connection=2)
+
+        service.send_emails(emails(5))
+
+        assert [len(smtp.sent) for smtp in fake_smtp.instances] == [2, 2, 1]
+        assert all(smtp.quit_called for smtp in fake_smtp.instances)
+
+    def test_reconnects_after_421(self, fake_smtp: type[FakeSMTP]) -> None:
+        fake_smtp.failures = [
+            smtplib.SMTPServerDisconnected("Gone"),
+            None,
+            smtplib.SMTPResponseException(421, b"Too many messages"),
+        ]
+        service = SMTPEmailService()
+
+        failed = service.send_emails(emails(2))
+
+        assert failed == []
+        assert sum(len(smtp.sent) for smtp in fake_smtp.instances) == 2
+        assert len(fake_smtp.instances) == 3
+
+    def test_reports_failed_emails(self, fake_smtp: type[FakeSMTP]) -> None:
+        fake_smtp.failures = [smtplib.SMTPResponseException(550, b"No such user")]
+        service = SMTPEmailService()
+        outgoing = emails(3)
+
+        failed = service.send_emails(outgoing)
+
+        assert failed == [outgoing[0]]
+
+    def test_spreads_across_connections(self, fake_smtp: type[FakeSMTP]) -> None:
+        service = SMTPEmailService(connections=3)
+
+        service.send_emails(emails(7))
+
+        assert sorted(len(smtp.sent) for smtp in fake_smtp.instances) == [2, 2, 3]
@@ -0,0 +1,106 @@
+import os
+import smtplib
+from pathlib import Path
+
+from cube_comp import (
+    EmailService,
+    EmailSpool,
+    OutgoingEmail,
+    SpoolingEmailService,
+    SpoolSender,
+)
+
+
+def email_to(address: str) -> OutgoingEmail:
+    return OutgoingEmail(address, "from@example.com", "Subject", "Body")
+
+
+class FlakyEmailService(EmailService):
+    def __init__(self, failing_addresses: set[str]) -> None:
+        self.failing_addresses = failing_addresses
+        self.sent: list[str] = []
+
+    def configure_smtp(
+        self,
+        smtp_host: str,
+        smtp_port: int,
+        smtp_user: str | None = None,
+        smtp_password: str | None = None,
+    ) -> None:
+        pass
+
+    def send_email(
+        self, to_address: str, from_address: str, subject: str, content: str
+    ) -> None:
+        if to_address in self.failing_addresses:
+            raise smtplib.SMTPResponseException(451, b"Try again later")
+        self.sent.append(to_address)
+
+
+class TestEmailSpool:
+    def test_spooling_service_enqueues(self, tmp_path: Path) -> None:
+        spool = EmailSpool(tmp_path)
+        service = SpoolingEmailService(spool)
+
+        service.send_email("a@example.com", "from@example.com", "Subject", "Body")
+        failed = service.send_emails([email_to("b@example.com")])
+
+        assert failed == []
+        assert spool.pending_count() == 2
+        assert list((tmp_path / "tmp").iterdir()) == []
+
+    def test_drain_sends_everything(self, tmp_path: Path) -> None:
+        spool = EmailSpool(tmp_path)
+        for i in range(25):
+            spool.enqueue(email_to(f"user{i}@example.com"))
+        email_service = FlakyEmailService(set())
+
+        sender = SpoolSender(spool, email_service, workers=3, batch_size=4)
+        sender.drain()
+
+        assert sorted(email_service.sent) == sorted(
+            f"user{i}@example.com" for i in range(25)
+        )
+        assert sender.sent_count == 25
+        assert spool.pending_count() == 0
+        assert list((tmp_path / "cur").iterdir()) == []
+
+    def test_failed_email_is_retried_later(self, tmp_path: Path) -> None:
+        spool = EmailSpool(tmp_path)
+        spool.enqueue(email_to("ok@example.com"))
+        spool.enqueue(email_to("down@example.com"))
+        email_service = FlakyEmailService({"down@example.com"})
+
+        sender = SpoolSender(spool, email_service, workers=1, backoff=60)
+        sender.drain()
+
+        assert email_service.sent == ["ok@example.com"]
+        assert sender.failed_count == 1
+        # The retry is not due yet
+        assert spool.pending_count() == 1
+        assert spool.claim(10) == []
+
+    def test_dead_letters_after_max_attempts(self, tmp_path: Path) -> None:
+        spool = EmailSpool(tmp_path)
+        spool.enqueue(email_to("down@example.com"))
+        email_service = FlakyEmailService({"down@example.com"})
+
+        sender = SpoolSender(spool, email_service, max_attempts=3, backoff=0)
+        for _ in range(3):
+            sender.drain()
+
+        assert spool.pending_count() == 0
+        assert spool.dead_count() == 1
+
+    def test_recover_stale_claims(self, tmp_path: Path) -> None:
+        spool = EmailSpool(tmp_path)
+        spool.enqueue(email_to("a@example.com"))
+        spool.enqueue(email_to("b@example.com"))
+        stale, fresh = spool.claim(2)
+        os.utime(stale.path, (0, 0))
+
+        recovered = spool.recover(stale_after=60)
+
+        assert recovered == 1
+        assert [item.email for item in spool.claim(10)] == [stale.email]
+        assert fresh.path.exists()
@@ -0,0 +1,78 @@
+from pathlib import Path
+from typing import Any
+
+from cube_comp import FetchCursor
+
+
+def announced(id: str, announced_at: str | None) -> dict[str, Any]:
+    return {"id": id, "announced_at": announced_at}
+
+
+class TestFetchCursor:
+    def test_fetches_everything_without_a_cursor(self, tmp_path: Path) -> None:
+        cursor = FetchCursor(tmp_path / "known.json.cursor")
+
+        assert cursor.announced_after("illinois", "US") is None
+
+    def test_saved_cursor_overlaps_newest_announcement(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.json.cursor"
+        cursor = FetchCursor(path)
+        cursor.observe(
+            "illinois",
+            "US",
+            [
+                announced("A", "2024-01-02T10:00:00.000Z"),
+                announced("B", "2024-01-03T10:00:00.000Z"),
+                announced("C", None),
+            ],
+            full_sync=True,
+        )
+
+        # Nothing moves until the competitions have been handled
+        assert cursor.announced_after("illinois", "US") is None
+        cursor.save()
+
+        reopened = FetchCursor(path)
+        assert reopened.announced_after("illinois", "US") == (
+            "2024-01-03T09:59:00+00:00"
+        )
+        assert reopened.announced_after(None, "US") is None
+
+    def test_incremental_fetch_keeps_cursor_without_news(self, tmp_path: Path) -> None:
+        cursor = FetchCursor(tmp_path / "known.json.cursor")
+        cursor.observe(
+            None, "US", [announced("A", "2024-01-02T10:00:00Z")], full_sync=True
+        )
+        cursor.save()
+
+        cursor.observe(None, "US", [], full_sync=False)
+        cursor.save()
+
+        assert cursor.announced_after(None, "US") == "2024-01-02T09:59:00+00:00"
+
+    def test_full_resync_after_interval(self, tmp_path: Path) -> None:
+        cursor = FetchCursor(tmp_path / "known.json.cursor", resync_interval=0)
+        cursor.observe(
+            None, "US", [announced("A", "2024-01-02T10:00:00Z")], full_sync=True
+        )
+        cursor.save()
+
+        assert cursor.announced_after(None, "US") is None
+
+    def test_save_keeps_cursors_saved_meanwhile(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.json.cursor"
+        first = FetchCursor(path)
+        second = FetchCursor(path)
+        first.observe(
+            None, "US", [announced("A", "2024-01-02T10:00:00Z")], full_sync=True
+        )
+        second.observe(
+            None, "CA", [announced("B", "2024-01-03T10:00:00Z")], full_sync=True
+        )
+
+        first.save()
+        second.save()
+
+        reopened = FetchCursor(path)
+        assert reopened.announced_after(None, "US") == "2024-01-02T09:59:00+00:00"
+        assert reopened.announced_after(None, "CA") == "2024-01-03T09:59:00+00:00"
@@ -0,0 +1,63 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+from cube_comp import FileLock
+from cube_comp.command_error import CommandError
+from cube_comp.file_lock import atomic_write
+
+
+class TestFileLock:
+    @pytest.mark.skipif(sys.platform == "win32", reason="No shared locks")
+    def test_shared_locks_do_not_wait(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.json"
+
+        with FileLock(path, timeout=0).shared():
+            with FileLock(path, timeout=0).shared():
+                pass
+
+        assert (tmp_path / "known.json.lock").exists()
+
+    def test_exclusive_lock_times_out(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.json"
+
+        with FileLock(path).shared():
+            with pytest.raises(CommandError, match="Timed out"):
+                with FileLock(path, timeout=0.1).exclusive():
+                    pass
+
+    def test_exclusive_lock_is_released(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.json"
+
+        with FileLock(path).exclusive():
+            pass
+
+        with FileLock(path, timeout=0).exclusive():
+            pass
+
+
+class TestAtomicWrite:
+    def test_replaces_file(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.json"
+        path.write_text("old")
+
+        atomic_write(path, "new")
+        atomic_write(tmp_path / "snapshot.ndjson", b"{}\n", fsync=True)
+
+        assert path.read_text() == "new"
+        assert (tmp_path / "snapshot.ndjson").read_bytes() == b"{}\n"
+        assert sorted(p.name for p in tmp_path.iterdir()) == [
+            "known.json",
+            "snapshot.ndjson",
+        ]
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="No POSIX permissions")
+    def test_file_mode(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.json"
+
+        atomic_write(path, "{}")
+        atomic_write(tmp_path / "private.json", "{}", mode=0o600)
+
+        assert path.stat().st_mode & 0o777 == 0o644
+        assert (tmp_path / "private.json").stat().st_mode & 0o777 == 0o600
@@ -0,0 +1,97 @@
+import random
+from datetime import date
+
+import pytest
+
+from cube_comp import Competition, GeoGridIndex
+from cube_comp.geo_index import haversine_km, parse_coordinates
+
+
+def competition_at(id: str, latitude: float | None, longitude: float | None):
+    return Competition(
+        id=id,
+        name=id,
+        short_name=id,
+        start_date=date(2024, 1, 1),
+        results_posted=False,
+        city="City",
+        venue="Venue",
+        website="https://example.com/",
+        latitude=latitude,
+        longitude=longitude,
+    )
+
+
+class TestHaversine:
+    def test_chicago_to_milwaukee(self) -> None:
+        distance = haversine_km(41.8781, -87.6298, 43.0389, -87.9065)
+
+        assert distance == pytest.approx(130.6, abs=0.5)
+
+    def test_same_point(self) -> None:
+        assert haversine_km(10.0, 20.0, 10.0, 20.0) == 0.0
+
+
+class TestParseCoordinates:
+    def test_parse(self) -> None:
+        assert parse_coordinates("41.88,-87.63") == (41.88, -87.63)
+
+    @pytest.mark.parametrize("text", ["41.88", "north,west", "91,0", "0,181"])
+    def test_invalid(self, text: str) -> None:
+        with pytest.raises(ValueError):
+            parse_coordinates(text)
+
+
+class TestGeoGridIndex:
+    def test_within_keeps_input_order(self) -> None:
+        competitions = [
+            competition_at("Milwaukee", 43.0389, -87.9065),
+            competition_at("Chicago", 41.8781, -87.6298),
+            competition_at("Unknown", None, None),
+            competition_at("Seattle", 47.6062, -122.3321),
+            competition_at("Evanston", 42.0451, -87.6877),
+        ]
+        index = GeoGridIndex(competitions)
+
+        near = index.within(41.88, -87.63, 150)
+
+        assert [comp.id for comp in near] == ["Milwaukee", "Chicago", "Evanston"]
+        assert index.within(41.88, -87.63, 50) == [competitions[1], competitions[4]]
+
+    def test_across_the_antimeridian(self) -> None:
+        competitions = [
+            competition_at("East", 0.0, 179.9),
+            competition_at("West", 0.0, -179.9),
+        ]
+        index = GeoGridIndex(competitions)
+
+        assert len(index.within(0.0, 179.95, 50)) == 2
+        assert len(index.within(0.0, -179.95, 50)) == 2
+
+    def test_near_the_pole(self) -> None:
+        competitions = [
+            competition_at("A", 89.5, 0.0),
+            competition_at("B", 89.5, 180.0),
+        ]
+        index = GeoGridIndex(competitions)
+
+        assert len(index.within(89.9, 90.0, 100)) == 2
+
+    def test_matches_exhaustive_search(self) -> None:
+        rng = random.Random(0)
+        competitions = [
+            competition_at(str(i), rng.uniform(-90, 90), rng.uniform(-180, 180))
+            for i in range(2000)
+        ]
+        index = GeoGridIndex(competitions, cell_degrees=2.0)
+
+        for _ in range(50):
+            latitude, longitude = rng.uniform(-90, 90), rng.uniform(-180, 180)
+            radius_km = rng.uniform(10, 3000)
+            expected = [
+                comp
+                for comp in competitions
+                if haversine_km(latitude, longitude, comp.latitude, comp.longitude)
+                <= radius_km
+            ]
+            assert index.within(latitude, longitude, radius_km) == expected
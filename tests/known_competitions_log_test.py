@@ -0,0 +1,136 @@
+from datetime import date, timedelta
+from pathlib import Path
+
+from cube_comp import Competition, CompetitionChanges, KnownCompetitionsLog
+from cube_comp.known_competitions import competition_fingerprint
+
+from .known_competitions_test import comp_with_id
+
+
+TODAY = date.today().isoformat()
+
+
+class TestKnownCompetitionsLog:
+    def comp_with_id(self, id: str) -> Competition:
+        return comp_with_id(id)
+
+    def comps_with_ids(self, *ids: str) -> list[Competition]:
+        return [self.comp_with_id(id) for id in ids]
+
+    def lines(self, *ids: str) -> str:
+        "Returns the lines that record competitions with `ids`"
+        return "".join(
+            f"{id} {TODAY} {competition_fingerprint(self.comp_with_id(id))}\n"
+            for id in ids
+        )
+
+    def test_empty_known_comps(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.txt"
+        comps = self.comps_with_ids("A", "B", "C")
+
+        with KnownCompetitionsLog(path) as known_competitions:
+            filtered_comps = known_competitions.filter_competitions(comps)
+
+        assert filtered_comps == comps
+        assert (tmp_path / "known.txt.log").read_text() == self.lines("A", "B", "C")
+
+    def test_appends_only_new_comps(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.txt"
+        with KnownCompetitionsLog(path) as known_competitions:
+            known_competitions.filter_competitions(self.comps_with_ids("B"))
+
+        with KnownCompetitionsLog(path) as known_competitions:
+            filtered_comps = known_competitions.filter_competitions(
+                self.comps_with_ids("A", "B", "C")
+            )
+
+        assert [c.id for c in filtered_comps] == ["A", "C"]
+        assert (tmp_path / "known.txt.log").read_text() == self.lines("B", "A", "C")
+
+    def test_keeps_history(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.txt"
+        with KnownCompetitionsLog(path) as known_competitions:
+            known_competitions.filter_competitions(self.comps_with_ids("A"))
+            known_competitions.filter_competitions(self.comps_with_ids("B"))
+            filtered_comps = known_competitions.filter_competitions(
+                self.comps_with_ids("A", "B")
+            )
+
+        assert filtered_comps == []
+
+    def test_compacts_log_into_snapshot(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.txt"
+        with KnownCompetitionsLog(path, compact_threshold=2) as known_competitions:
+            known_competitions.filter_competitions(self.comps_with_ids("C", "A"))
+            known_competitions.filter_competitions(self.comps_with_ids("B"))
+
+        assert path.read_text() == self.lines("A", "B", "C")
+        assert (tmp_path / "known.txt.log").read_text() == ""
+        with KnownCompetitionsLog(path) as known_competitions:
+            assert len(known_competitions) == 3
+
+    def test_discards_partial_log_entry(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.txt"
+        (tmp_path / "known.txt.log").write_text("A\nB\nPart")
+
+        with KnownCompetitionsLog(path) as known_competitions:
+            filtered_comps = known_competitions.filter_competitions(
+                self.comps_with_ids("A", "C")
+            )
+
+        assert [c.id for c in filtered_comps] == ["C"]
+        # A is listed, so its start date and fingerprint are recorded
+        assert (tmp_path / "known.txt.log").read_text() == "A\nB\n" + self.lines(
+            "A", "C"
+        )
+
+    def test_forgets_expired_comps(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.txt"
+        long_ago = (date.today() - timedelta(days=30)).isoformat()
+        path.write_text(f"Old {long_ago}\nUndated\n")
+
+        with KnownCompetitionsLog(path, compact_threshold=0) as known_competitions:
+            assert "Old" not in known_competitions
+            assert "Undated" in known_competitions
+
+        assert path.read_text() == "Undated\n"
+
+    def test_compaction_keeps_comps_appended_by_others(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.txt"
+        with KnownCompetitionsLog(path) as first, KnownCompetitionsLog(path) as second:
+            first.filter_competitions(self.comps_with_ids("A"))
+            second.filter_competitions(self.comps_with_ids("B"))
+            first.compact()
+
+        assert path.read_text() == self.lines("A", "B")
+        assert (tmp_path / "known.txt.log").read_text() == ""
+
+    def test_changed_comps(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.txt"
+        comp_a, comp_b = self.comps_with_ids("A", "B")
+        with KnownCompetitionsLog(path) as known_competitions:
+            known_competitions.filter_competitions([comp_a, comp_b])
+        moved_b = self.comp_with_id("B")
+        moved_b.venue = "Another Venue"
+
+        with KnownCompetitionsLog(path) as known_competitions:
+            changes = known_competitions.classify_competitions([comp_a, moved_b])
+        with KnownCompetitionsLog(path) as known_competitions:
+            again = known_competitions.classify_competitions([comp_a, moved_b])
+
+        assert changes == CompetitionChanges(new=[], changed=[moved_b])
+        assert len(again) == 0
+        log_lines = (tmp_path / "known.txt.log").read_text().splitlines()
+        assert log_lines[-1] == f"B {TODAY} {competition_fingerprint(moved_b)}"
+
+    def test_old_lines_are_not_changed(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.txt"
+        path.write_text(f"A\nB {TODAY}\n")
+
+        with KnownCompetitionsLog(path) as known_competitions:
+            changes = known_competitions.classify_competitions(
+                self.comps_with_ids("A", "B")
+            )
+
+        assert len(changes) == 0
+        assert (tmp_path / "known.txt.log").read_text() == self.lines("A", "B")
@@ -1,24 +1,40 @@
 import json
 import os
-from datetime import date
+import sys
+from datetime import date, timedelta
 from io import StringIO
+from pathlib import Path
+from typing import Iterator
 
-from cube_comp import Competition, KnownCompetitions
+import pytest
+
+from cube_comp import (
+    Competition,
+    CompetitionChanges,
+    FileLock,
+    KnownCompetitions,
+    KnownCompetitionsFile,
+)
+from cube_comp.known_competitions import competition_fingerprint
+
+
+def comp_with_id(id: str) -> Competition:
+    comp = Competition(
+        id=id,
+        name=f"Name {id}",
+        short_name=f"Short Name {id}",
+        start_date=date.today(),
+        results_posted=False,
+        city="Chicago, IL",
+        venue=f"Venue {id}",
+        website=f"https://example.com/{id}",
+    )
+    return comp
 
 
 class TestKnownCompetitions:
     def comp_with_id(self, id: str) -> Competition:
-        comp = Competition(
-            id=id,
-            name=f"Name {id}",
-            short_name=f"Short Name {id}",
-            start_date=date.today(),
-            results_posted=False,
-            city="Chicago, IL",
-            venue=f"Venue {id}",
-            website="https:/example.com/{id}",
-        )
-        return comp
+        return comp_with_id(id)
 
     def test_empty_known_comps(self):
         comp_a = self.comp_with_id("A")
@@ -32,7 +48,7 @@ class TestKnownCompetitions:
         )
 
         assert filtered_comps == [comp_a, comp_b, comp_c]
-        assert io.getvalue() == json.dumps(["A", "B", "C"], indent=2)
+        assert list(json.loads(io.getvalue())) == ["A", "B", "C"]
 
     def test_one_known_comps(self):
         comp_a = self.comp_with_id("A")
@@ -46,7 +62,7 @@ class TestKnownCompetitions:
         )
 
         assert filtered_comps == [comp_a, comp_c]
-        assert io.getvalue() == json.dumps(["A", "B", "C"], indent=2)
+        assert list(json.loads(io.getvalue())) == ["A", "B", "C"]
 
     def test_all_known_comps(self):
         comp_a = self.comp_with_id("A")
@@ -60,7 +76,7 @@ class TestKnownCompetitions:
         )
 
         assert filtered_comps == []
-        assert io.getvalue() == json.dumps(["A", "B", "C"], indent=2)
+        assert list(json.loads(io.getvalue())) == ["A", "B", "C"]
 
     def test_one_known_comps_seek_to_end(self):
         comp_a = self.comp_with_id("A")
@@ -75,4 +91,162 @@ class TestKnownCompetitions:
         )
 
         assert filtered_comps == [comp_a, comp_c]
-        assert io.getvalue() == json.dumps(["A", "B", "C"], indent=2)
+        assert list(json.loads(io.getvalue())) == ["A", "B", "C"]
+
+    def test_classify_pages_writes_after_last_page(self):
+        comp_a = self.comp_with_id("A")
+        comp_b = self.comp_with_id("B")
+        comp_c = self.comp_with_id("C")
+        io = StringIO('["B", "D"]')
+        known_competitions = KnownCompetitions(io)
+
+        pages = known_competitions.classify_competition_pages(
+            [[comp_a, comp_b], [comp_c]]
+        )
+
+        assert next(pages) == CompetitionChanges(new=[comp_a])
+        assert io.getvalue() == '["B", "D"]'
+        assert list(pages) == [CompetitionChanges(new=[comp_c])]
+        assert list(json.loads(io.getvalue())) == ["A", "B", "C"]
+
+    def test_changed_comps(self):
+        comp_a = self.comp_with_id("A")
+        comp_b = self.comp_with_id("B")
+        io = StringIO()
+        KnownCompetitions(io).filter_competitions([comp_a, comp_b])
+        moved_b = self.comp_with_id("B")
+        moved_b.venue = "Another Venue"
+
+        changes = KnownCompetitions(io).classify_competitions([comp_a, moved_b])
+
+        assert changes == CompetitionChanges(new=[], changed=[moved_b])
+        assert json.loads(io.getvalue()) == {
+            "A": [competition_fingerprint(comp_a), date.today().isoformat()],
+            "B": [competition_fingerprint(moved_b), date.today().isoformat()],
+        }
+        changes = KnownCompetitions(io).classify_competitions([comp_a, moved_b])
+        assert len(changes) == 0
+
+    def test_ids_only_file_records_fingerprints(self):
+        comp_a = self.comp_with_id("A")
+        io = StringIO('["A"]')
+
+        changes = KnownCompetitions(io).classify_competitions([comp_a])
+
+        assert len(changes) == 0
+        assert json.loads(io.getvalue()) == {
+            "A": [competition_fingerprint(comp_a), date.today().isoformat()]
+        }
+
+    def test_keep_unlisted_forgets_expired_comps(self):
+        comp_a = self.comp_with_id("A")
+        long_ago = (date.today() - timedelta(days=30)).isoformat()
+        io = StringIO(
+            json.dumps({"Old": ["0000000000000000", long_ago], "Undated": None})
+        )
+        known_competitions = KnownCompetitions(io, keep_unlisted=True)
+
+        known_competitions.filter_competitions([comp_a])
+
+        assert list(json.loads(io.getvalue())) == ["Undated", "A"]
+
+
+class TestKnownCompetitionsFile:
+    def comp_with_id(self, id: str) -> Competition:
+        return comp_with_id(id)
+
+    def test_round_trip(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.json"
+        comp_a = self.comp_with_id("A")
+
+        filtered_comps = KnownCompetitionsFile(path).filter_competitions([comp_a])
+
+        assert filtered_comps == [comp_a]
+        assert list(json.loads(path.read_text())) == ["A"]
+        assert KnownCompetitionsFile(path).filter_competitions([comp_a]) == []
+
+    def test_unchanged_file_is_not_written(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.json"
+        comp_a = self.comp_with_id("A")
+        KnownCompetitionsFile(path).filter_competitions([comp_a])
+        (tmp_path / "known.json.lock").unlink()
+        inode = path.stat().st_ino
+
+        KnownCompetitionsFile(path).filter_competitions([comp_a])
+
+        assert path.stat().st_ino == inode
+        assert not (tmp_path / "known.json.lock").exists()
+
+    def test_keeps_comps_written_meanwhile(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.json"
+        comp_a = self.comp_with_id("A")
+        comp_b = self.comp_with_id("B")
+
+        def pages() -> Iterator[list[Competition]]:
+            # Another run records B after this one read the file
+            second = KnownCompetitionsFile(path)
+            second.filter_competitions([comp_b])
+            yield [comp_a]
+
+        first = KnownCompetitionsFile(path)
+        changes = list(first.classify_competition_pages(pages()))
+
+        assert changes == [CompetitionChanges(new=[comp_a])]
+        assert sorted(json.loads(path.read_text())) == ["A", "B"]
+
+    def test_keeps_comps_of_other_queries(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.json"
+        comp_us = self.comp_with_id("US1")
+        comp_ca = self.comp_with_id("CA1")
+
+        KnownCompetitionsFile(path).filter_competitions([comp_us])
+        KnownCompetitionsFile(path).filter_competitions([comp_ca])
+
+        assert KnownCompetitionsFile(path).filter_competitions([comp_us]) == []
+        assert sorted(json.loads(path.read_text())) == ["CA1", "US1"]
+
+    def test_comps_are_reported_once_by_overlapping_runs(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.json"
+        comp_a = self.comp_with_id("A")
+        second_changes = CompetitionChanges()
+
+        def pages() -> Iterator[list[Competition]]:
+            # The second run starts and finishes after the first read the file
+            second = KnownCompetitionsFile(path)
+            for changes in second.classify_competition_pages([[comp_a]]):
+                second_changes.extend(changes)
+            yield [comp_a]
+
+        first_changes = CompetitionChanges()
+        for changes in KnownCompetitionsFile(path).classify_competition_pages(pages()):
+            first_changes.extend(changes)
+
+        assert second_changes == CompetitionChanges(new=[comp_a])
+        assert first_changes == CompetitionChanges()
+        assert list(json.loads(path.read_text())) == ["A"]
+
+    def test_lock_is_not_held_while_fetching(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.json"
+        comp_a = self.comp_with_id("A")
+        comp_b = self.comp_with_id("B")
+
+        def pages() -> Iterator[list[Competition]]:
+            yield [comp_a]
+            # Another process can write while the next page is fetched
+            with FileLock(path, timeout=0).exclusive():
+                pass
+            yield [comp_b]
+
+        changes = list(KnownCompetitionsFile(path).classify_competition_pages(pages()))
+
+        assert changes == [CompetitionChanges(new=[comp_a, comp_b])]
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="No POSIX permissions")
+    def test_file_stays_readable(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.json"
+        path.write_text("{}")
+        path.chmod(0o644)
+
+        KnownCompetitionsFile(path).filter_competitions([self.comp_with_id("A")])
+
+        assert path.stat().st_mode & 0o777 == 0o644
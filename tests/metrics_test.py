@@ -0,0 +1,50 @@
+import json
+from pathlib import Path
+
+from cube_comp import MetricsRecorder
+
+
+class TestMetricsRecorder:
+    def recorder(self) -> MetricsRecorder:
+        metrics = MetricsRecorder()
+        metrics.record_duration("fetch", 1.5)
+        metrics.record_duration("fetch", 0.5)
+        with metrics.time_stage("render"):
+            pass
+        metrics.increment("http_requests")
+        metrics.increment("http_requests", 2)
+        return metrics
+
+    def test_totals_stages_and_counters(self) -> None:
+        metrics = self.recorder()
+
+        assert metrics.stage_seconds["fetch"] == 2.0
+        assert metrics.stage_runs == {"fetch": 2, "render": 1}
+        assert metrics.counters == {"http_requests": 3}
+
+    def test_prometheus_text(self) -> None:
+        text = self.recorder().to_prometheus()
+
+        assert 'cube_comp_stage_seconds_total{stage="fetch"} 2.000000\n' in text
+        assert 'cube_comp_stage_runs_total{stage="render"} 1\n' in text
+        assert "# TYPE cube_comp_http_requests_total counter\n" in text
+        assert "cube_comp_http_requests_total 3\n" in text
+
+    def test_write_json(self, tmp_path: Path) -> None:
+        path = tmp_path / "metrics.json"
+
+        self.recorder().write(path)
+
+        document = json.loads(path.read_text())
+        assert document["stages"]["fetch"] == {"seconds": 2.0, "runs": 2}
+        assert document["counters"] == {"http_requests": 3}
+        assert [p.name for p in tmp_path.iterdir()] == ["metrics.json"]
+
+    def test_write_prometheus_replaces_file(self, tmp_path: Path) -> None:
+        path = tmp_path / "cube_comp.prom"
+        path.write_text("old")
+
+        self.recorder().write(path)
+
+        assert path.read_text().startswith("# TYPE cube_comp_stage_seconds_total")
+        assert [p.name for p in tmp_path.iterdir()] == ["cube_comp.prom"]
@@ -0,0 +1,120 @@
+import csv
+import json
+from datetime import date
+from io import StringIO
+from typing import Iterator
+
+import pytest
+
+from cube_comp import (
+    Competition,
+    CSVCompetitionWriter,
+    ICalendarCompetitionWriter,
+    NDJSONCompetitionWriter,
+    competition_writer,
+)
+
+
+def make_competitions() -> list[Competition]:
+    return [
+        Competition(
+            id="ChicagoOpen2024",
+            name="Chicago Open 2024",
+            short_name="Chicago 2024",
+            start_date=date(2024, 3, 2),
+            results_posted=False,
+            city="Chicago, Illinois",
+            venue="Convention Center; Hall B",
+            website="https://example.com/ChicagoOpen2024/",
+            latitude=41.8781,
+            longitude=-87.6298,
+        ),
+        Competition(
+            id="SaoPauloOpen2024",
+            name="São Paulo Open 2024",
+            short_name="São Paulo 2024",
+            start_date=date(2024, 4, 6),
+            results_posted=True,
+            city="São Paulo",
+            venue="Ginásio",
+            website="https://example.com/SaoPauloOpen2024/",
+        ),
+    ]
+
+
+def generate_competitions() -> Iterator[Competition]:
+    yield from make_competitions()
+
+
+class TestNDJSONCompetitionWriter:
+    def test_write(self) -> None:
+        output = StringIO()
+
+        count = NDJSONCompetitionWriter().write(generate_competitions(), output)
+
+        assert count == 2
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+        assert records[0]["id"] == "ChicagoOpen2024"
+        assert records[0]["start_date"] == "2024-03-02"
+        assert records[0]["latitude"] == 41.8781
+        assert records[1]["city"] == "São Paulo"
+        assert records[1]["results_posted"] is True
+        assert records[1]["longitude"] is None
+
+
+class TestCSVCompetitionWriter:
+    def test_write(self) -> None:
+        output = StringIO()
+
+        count = CSVCompetitionWriter().write(generate_competitions(), output)
+
+        assert count == 2
+        rows = list(csv.DictReader(StringIO(output.getvalue())))
+        assert [row["id"] for row in rows] == ["ChicagoOpen2024", "SaoPauloOpen2024"]
+        assert rows[0]["venue"] == "Convention Center; Hall B"
+        assert rows[1]["latitude"] == ""
+
+    def test_write_nothing(self) -> None:
+        output = StringIO()
+
+        count = CSVCompetitionWriter().write([], output)
+
+        assert count == 0
+        assert output.getvalue().startswith("id,name,")
+
+
+class TestICalendarCompetitionWriter:
+    def test_write(self) -> None:
+        output = StringIO()
+
+        count = ICalendarCompetitionWriter().write(generate_competitions(), output)
+
+        assert count == 2
+        text = output.getvalue()
+        lines = text.split("\r\n")
+        assert lines[0] == "BEGIN:VCALENDAR"
+        assert lines[-2:] == ["END:VCALENDAR", ""]
+        assert lines.count("BEGIN:VEVENT") == 2
+        assert "UID:ChicagoOpen2024@worldcubeassociation.org" in lines
+        assert "DTSTART;VALUE=DATE:20240302" in lines
+        assert r"LOCATION:Convention Center\; Hall B\, Chicago\, Illinois" in lines
+        assert "GEO:41.8781;-87.6298" in lines
+        assert text.count("GEO:") == 1
+
+    def test_folds_long_lines(self) -> None:
+        competition = make_competitions()[1]
+        competition.name = "São Paulo " * 20
+        output = StringIO()
+
+        ICalendarCompetitionWriter().write([competition], output)
+
+        lines = output.getvalue().split("\r\n")
+        assert all(len(line.encode()) <= 75 for line in lines)
+        unfolded = output.getvalue().replace("\r\n ", "")
+        assert f"SUMMARY:{competition.name}\r\n" in unfolded
+
+
+class TestCompetitionWriter:
+    def test_unknown_format(self) -> None:
+        with pytest.raises(ValueError, match="text"):
+            competition_writer("text")
@@ -0,0 +1,86 @@
+import os
+import time
+from pathlib import Path
+from typing import cast
+
+import requests
+
+from cube_comp import CompetitionAPIOptions, ResponseCache, WCACompetitionAPI
+from cube_comp.response_cache import CachedResponse
+
+from .competition_api_test import FakeResponse, FakeSession, minimal_dict_with_id
+
+
+class TestResponseCache:
+    def test_get_missing_entry(self, tmp_path: Path) -> None:
+        cache = ResponseCache(tmp_path)
+
+        assert cache.get({"q": "illinois"}) is None
+
+    def test_put_and_get(self, tmp_path: Path) -> None:
+        cache = ResponseCache(tmp_path)
+        entry = CachedResponse(
+            competitions=[minimal_dict_with_id("A")],
+            fetched_at=time.time(),
+            total=1,
+            per_page=25,
+            etag='"abc"',
+        )
+
+        cache.put({"q": "illinois", "page": "2"}, entry)
+
+        assert cache.get({"q": "illinois", "page": "2"}) == entry
+        assert cache.get({"q": "illinois"}) is None
+        assert cache.is_fresh(entry)
+
+    def test_stale_entry(self, tmp_path: Path) -> None:
+        cache = ResponseCache(tmp_path, ttl=60)
+        entry = CachedResponse(competitions=[], fetched_at=time.time() - 61)
+
+        assert not cache.is_fresh(entry)
+
+    def test_evicts_least_recently_used(self, tmp_path: Path) -> None:
+        cache = ResponseCache(tmp_path)
+        for page in ["1", "2", "3"]:
+            entry = CachedResponse([minimal_dict_with_id(page)], time.time())
+            cache.put({"page": page}, entry)
+        entry_size = cache._path({"page": "1"}).stat().st_size
+        # Make page 2 the least recently used, then touch page 1
+        os.utime(cache._path({"page": "2"}), (0, 0))
+        cache.get({"page": "1"})
+
+        cache.max_size = entry_size * 3
+        cache.put({"page": "4"}, CachedResponse([minimal_dict_with_id("4")], 0))
+
+        assert cache.get({"page": "2"}) is None
+        assert cache.get({"page": "1"}) is not None
+        assert cache.get({"page": "3"}) is not None
+        assert cache.get({"page": "4"}) is not None
+
+
+class TestWCACompetitionAPICache:
+    def api(self, session: FakeSession, cache: ResponseCache) -> WCACompetitionAPI:
+        options = CompetitionAPIOptions(cache=cache)
+        return WCACompetitionAPI(options, session=cast(requests.Session, session))
+
+    def test_fresh_entry_skips_network(self, tmp_path: Path) -> None:
+        cache = ResponseCache(tmp_path, ttl=3600)
+        fake = FakeSession([FakeResponse([minimal_dict_with_id("A")])])
+
+        self.api(fake, cache).fetch_competitions(None, "US")
+        comps = self.api(fake, cache).fetch_competitions(None, "US")
+
+        assert [c["id"] for c in comps] == ["A"]
+        assert fake.requested_pages == [1]
+
+    def test_stale_entry_is_revalidated(self, tmp_path: Path) -> None:
+        cache = ResponseCache(tmp_path, ttl=0)
+        first = FakeResponse([minimal_dict_with_id("A")], {"ETag": '"v1"'})
+        fake = FakeSession([first])
+        self.api(fake, cache).fetch_competitions(None, "US")
+
+        fake.pages = [FakeResponse([], status_code=304)]
+        comps = self.api(fake, cache).fetch_competitions(None, "US")
+
+        assert [c["id"] for c in comps] == ["A"]
+        assert fake.request_headers == [{}, {"If-None-Match": '"v1"'}]
@@ -0,0 +1,137 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from cube_comp import CompetitionAPI, CompetitionSearchIndex, LocalSearchCompetitionAPI
+
+
+def competition(id: str, name: str, city: str, venue: str) -> dict[str, Any]:
+    return {
+        "id": id,
+        "name": name,
+        "short_name": name,
+        "city": city,
+        "venue": venue,
+        "announced_at": f"2024-01-0{len(id)}T00:00:00Z",
+    }
+
+
+COMPETITIONS = [
+    competition("A", "Chicago Open 2024", "Chicago, Illinois", "Navy Pier"),
+    competition("BB", "São Paulo Summer", "São Paulo", "Ginásio"),
+    competition("CCC", "Windy City Speedcubing", "Chicago, Illinois", "Library"),
+]
+
+
+class CountingCompetitionAPI(CompetitionAPI):
+    def __init__(self) -> None:
+        self.fetches: list[tuple[str | None, str | None]] = []
+
+    def fetch_competitions(
+        self,
+        query: str | None,
+        country: str | None,
+        sort_desc=False,
+        announced_after: str | None = None,
+    ) -> list[dict[str, Any]]:
+        self.fetches.append((query, country))
+        return list(COMPETITIONS)
+
+
+class BarrierCompetitionAPI(CountingCompetitionAPI):
+    "Only returns once `parties` fetches are running at the same time"
+
+    def __init__(self, parties: int) -> None:
+        super().__init__()
+        self.barrier = threading.Barrier(parties, timeout=5)
+
+    def fetch_competitions(
+        self,
+        query: str | None,
+        country: str | None,
+        sort_desc=False,
+        announced_after: str | None = None,
+    ) -> list[dict[str, Any]]:
+        self.barrier.wait()
+        return super().fetch_competitions(query, country, sort_desc)
+
+
+class TestCompetitionSearchIndex:
+    def search_ids(self, query: str | None) -> list[str]:
+        index = CompetitionSearchIndex.build(COMPETITIONS)
+        return [comp["id"] for comp in index.search(query)]
+
+    def test_prefix_matching(self) -> None:
+        assert self.search_ids("chi") == ["A", "CCC"]
+        assert self.search_ids("CHICAGO open") == ["A"]
+        assert self.search_ids("pier library") == []
+
+    def test_ignores_case_and_accents(self) -> None:
+        assert self.search_ids("sao paulo") == ["BB"]
+        assert self.search_ids("GINASIO") == ["BB"]
+
+    def test_empty_query_returns_everything(self) -> None:
+        assert self.search_ids(None) == ["A", "BB", "CCC"]
+        assert self.search_ids("  ") == ["A", "BB", "CCC"]
+
+    def test_save_and_load(self, tmp_path: Path) -> None:
+        path = tmp_path / "index.json"
+        CompetitionSearchIndex.build(COMPETITIONS).save(path)
+
+        index = CompetitionSearchIndex.load(path)
+
+        assert [comp["id"] for comp in index.search("windy")] == ["CCC"]
+
+
+class TestLocalSearchCompetitionAPI:
+    def test_fetches_each_country_once(self) -> None:
+        base = CountingCompetitionAPI()
+        api = LocalSearchCompetitionAPI(base)
+
+        chicago = api.fetch_competitions("chicago", "US", sort_desc=True)
+        sao_paulo = api.fetch_competitions("paulo", "US")
+        recent = api.fetch_competitions(
+            None, "US", announced_after="2024-01-02T00:00:00Z"
+        )
+        api.fetch_competitions("chicago", "BR")
+
+        assert [comp["id"] for comp in chicago] == ["CCC", "A"]
+        assert [comp["id"] for comp in sao_paulo] == ["BB"]
+        assert [comp["id"] for comp in recent] == ["CCC"]
+        assert base.fetches == [(None, "US"), (None, "BR")]
+
+    def test_reuses_saved_index_until_too_old(self, tmp_path: Path) -> None:
+        base = CountingCompetitionAPI()
+        LocalSearchCompetitionAPI(base, tmp_path).fetch_competitions("chi", "US")
+        LocalSearchCompetitionAPI(base, tmp_path).fetch_competitions("chi", "US")
+        assert base.fetches == [(None, "US")]
+
+        os.utime(tmp_path / "US.json", (0, 0))
+        LocalSearchCompetitionAPI(base, tmp_path).fetch_competitions("chi", "US")
+        assert base.fetches == [(None, "US"), (None, "US")]
+
+    def test_rebuilds_old_index_in_memory(self) -> None:
+        base = CountingCompetitionAPI()
+        api = LocalSearchCompetitionAPI(base, max_age=0)
+
+        api.fetch_competitions("chi", "US")
+        api.fetch_competitions("chi", "US")
+
+        assert base.fetches == [(None, "US"), (None, "US")]
+
+    def test_fetches_countries_in_parallel(self) -> None:
+        base = BarrierCompetitionAPI(parties=3)
+        api = LocalSearchCompetitionAPI(base)
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            results = list(
+                executor.map(
+                    lambda country: api.fetch_competitions("chi", country),
+                    ["US", "CA", "MX"],
+                )
+            )
+
+        assert [len(result) for result in results] == [2, 2, 2]
+        assert sorted(base.fetches) == [(None, "CA"), (None, "MX"), (None, "US")]
@@ -0,0 +1,137 @@
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from cube_comp import SnapshotCompetitionAPI
+from cube_comp.command_error import CommandError
+
+
+def competition(
+    id: str, days_from_today: int, country: str, **fields: Any
+) -> dict[str, Any]:
+    start_date = date.today() + timedelta(days=days_from_today)
+    comp = {
+        "id": id,
+        "name": f"{id} Open",
+        "short_name": id,
+        "start_date": start_date.isoformat(),
+        "results_posted_at": None,
+        "city": "Chicago, Illinois",
+        "venue": "Wrigley Field",
+        "website": f"https://example.com/{id}/",
+        "country_iso2": country,
+        "announced_at": "2024-01-01T12:00:00.000Z",
+    }
+    comp.update(fields)
+    return comp
+
+
+class TestSnapshotCompetitionAPI:
+    @pytest.fixture
+    def snapshot(self, tmp_path: Path) -> Path:
+        path = tmp_path / "competitions.ndjson"
+        SnapshotCompetitionAPI.write(
+            path,
+            [
+                competition("Later", 20, "US"),
+                competition("Past", -5, "US"),
+                competition("Soon", 2, "US", city="Seattle, Washington"),
+                competition("Toronto", 3, "CA", announced_at="2024-02-01T00:00:00Z"),
+                competition("Soon", 2, "US", city="Seattle, Washington"),
+            ],
+        )
+        return path
+
+    def test_lists_upcoming_competitions_by_date(self, snapshot: Path) -> None:
+        with SnapshotCompetitionAPI(snapshot) as api:
+            comps = api.fetch_competitions(None, None)
+
+        assert [c["id"] for c in comps] == ["Soon", "Toronto", "Later"]
+
+    def test_country_index(self, snapshot: Path) -> None:
+        with SnapshotCompetitionAPI(snapshot) as api:
+            assert [c["id"] for c in api.fetch_competitions(None, "US")] == [
+                "Soon",
+                "Later",
+            ]
+            assert [c["id"] for c in api.fetch_competitions(None, "CA")] == ["Toronto"]
+            assert api.fetch_competitions(None, "GB") == []
+
+    def test_query_and_sort_desc(self, snapshot: Path) -> None:
+        with SnapshotCompetitionAPI(snapshot) as api:
+            comps = api.fetch_competitions("open wrigley", "US", sort_desc=True)
+            seattle = api.fetch_competitions("SEATTLE", None)
+
+        assert [c["id"] for c in comps] == ["Later", "Soon"]
+        assert [c["id"] for c in seattle] == ["Soon"]
+
+    def test_announced_after(self, snapshot: Path) -> None:
+        with SnapshotCompetitionAPI(snapshot) as api:
+            comps = api.fetch_competitions(
+                None, None, announced_after="2024-01-15T00:00:00+00:00"
+            )
+
+        assert [c["id"] for c in comps] == ["Toronto"]
+
+    def test_iter_competition_pages(self, snapshot: Path) -> None:
+        with SnapshotCompetitionAPI(snapshot) as api:
+            api.PAGE_SIZE = 2
+            pages = list(api.iter_competition_pages(None, None))
+
+        assert [[c["id"] for c in page] for page in pages] == [
+            ["Soon", "Toronto"],
+            ["Later"],
+        ]
+
+    def test_empty_snapshot(self, tmp_path: Path) -> None:
+        path = tmp_path / "empty.ndjson"
+        SnapshotCompetitionAPI.write(path, [])
+
+        with SnapshotCompetitionAPI(path) as api:
+            assert api.fetch_competitions(None, "US") == []
+
+    def test_index_must_match_data(self, snapshot: Path) -> None:
+        with open(snapshot, "ab") as file:
+            file.write(b"{}\n")
+
+        with pytest.raises(CommandError):
+            SnapshotCompetitionAPI(snapshot)
+
+    def test_index_must_match_data_of_same_size(self, snapshot: Path) -> None:
+        index_path = snapshot.with_name(snapshot.name + ".index")
+        SnapshotCompetitionAPI.write(snapshot, [competition("Tulsa", 3, "US")])
+        old_index = index_path.read_text()
+        SnapshotCompetitionAPI.write(snapshot, [competition("Tampa", 3, "US")])
+        index_path.write_text(old_index)
+
+        with pytest.raises(CommandError, match="does not match"):
+            SnapshotCompetitionAPI(snapshot)
+
+    def test_waits_for_index_being_replaced(self, snapshot: Path) -> None:
+        index_path = snapshot.with_name(snapshot.name + ".index")
+        old_index = index_path.read_text()
+        SnapshotCompetitionAPI.write(snapshot, [competition("Tulsa", 3, "US")])
+        new_index = index_path.read_text()
+        index_path.write_text(old_index)
+
+        class ReplacingSnapshotAPI(SnapshotCompetitionAPI):
+            RETRY_INTERVAL = 0.0
+
+            @classmethod
+            def _read_index(cls, path: Path) -> dict[str, Any]:
+                # The writer replaces the index right after this first read
+                index = super()._read_index(path)
+                index_path.write_text(new_index)
+                return index
+
+        with ReplacingSnapshotAPI(snapshot) as api:
+            assert [c["id"] for c in api.fetch_competitions(None, None)] == ["Tulsa"]
+
+    def test_missing_index(self, tmp_path: Path) -> None:
+        path = tmp_path / "competitions.ndjson"
+        path.write_text("")
+
+        with pytest.raises(CommandError):
+            SnapshotCompetitionAPI(path)
@@ -0,0 +1,136 @@
+import sqlite3
+from datetime import date, timedelta
+from pathlib import Path
+
+from cube_comp import Competition, CompetitionChanges, SQLiteKnownCompetitions
+from cube_comp.known_competitions import competition_fingerprint
+
+from .known_competitions_test import comp_with_id
+
+
+class TestSQLiteKnownCompetitions:
+    def comps_with_ids(self, *ids: str) -> list[Competition]:
+        return [comp_with_id(id) for id in ids]
+
+    def test_empty_known_comps(self, tmp_path: Path) -> None:
+        comps = self.comps_with_ids("A", "B", "C")
+
+        with SQLiteKnownCompetitions(tmp_path / "known.db") as known_competitions:
+            filtered_comps = known_competitions.filter_competitions(comps)
+            first_seen = known_competitions.first_seen("A")
+
+        assert filtered_comps == comps
+        assert first_seen is not None
+
+    def test_one_known_comp(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.db"
+        with SQLiteKnownCompetitions(path) as known_competitions:
+            known_competitions.filter_competitions(self.comps_with_ids("B"))
+
+        with SQLiteKnownCompetitions(path) as known_competitions:
+            filtered_comps = known_competitions.filter_competitions(
+                self.comps_with_ids("A", "B", "C")
+            )
+
+        assert [c.id for c in filtered_comps] == ["A", "C"]
+
+    def test_subscribers_are_independent(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.db"
+        with SQLiteKnownCompetitions(path, "alice") as alice:
+            alice.filter_competitions(self.comps_with_ids("A", "B"))
+
+        with SQLiteKnownCompetitions(path, "bob") as bob:
+            bob_comps = bob.filter_competitions(self.comps_with_ids("A", "C"))
+            assert bob.first_seen("B") is None
+        with SQLiteKnownCompetitions(path, "alice") as alice:
+            alice_comps = alice.filter_competitions(self.comps_with_ids("A", "C"))
+
+        assert [c.id for c in bob_comps] == ["A", "C"]
+        assert [c.id for c in alice_comps] == ["C"]
+
+    def test_changed_comps(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.db"
+        comp_a, comp_b = self.comps_with_ids("A", "B")
+        with SQLiteKnownCompetitions(path) as known_competitions:
+            known_competitions.filter_competitions([comp_a, comp_b])
+        (moved_b,) = self.comps_with_ids("B")
+        moved_b.venue = "Another Venue"
+
+        with SQLiteKnownCompetitions(path) as known_competitions:
+            changes = known_competitions.classify_competitions([comp_a, moved_b])
+            again = known_competitions.classify_competitions([comp_a, moved_b])
+
+        assert changes == CompetitionChanges(new=[], changed=[moved_b])
+        assert len(again) == 0
+
+    def test_forgets_expired_comps(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.db"
+        old_comp = self.comps_with_ids("Old")[0]
+        old_comp.start_date = date.today() - timedelta(days=30)
+        with SQLiteKnownCompetitions(path, expiry_days=None) as known_competitions:
+            known_competitions.filter_competitions([old_comp])
+
+        with SQLiteKnownCompetitions(path) as known_competitions:
+            known_competitions.filter_competitions(self.comps_with_ids("A"))
+            assert known_competitions.first_seen("Old") is None
+            assert known_competitions.first_seen("A") is not None
+
+    def test_adds_columns_to_old_databases(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.db"
+        connection = sqlite3.connect(path)
+        connection.execute(
+            "CREATE TABLE known_competitions (subscriber TEXT NOT NULL,"
+            " competition_id TEXT NOT NULL, first_seen TEXT NOT NULL,"
+            " PRIMARY KEY (subscriber, competition_id)) WITHOUT ROWID"
+        )
+        connection.execute(
+            "INSERT INTO known_competitions VALUES ('default', 'A', '2024-01-01')"
+        )
+        connection.commit()
+        connection.close()
+
+        comp_a, comp_b = self.comps_with_ids("A", "B")
+        with SQLiteKnownCompetitions(path) as known_competitions:
+            changes = known_competitions.classify_competitions([comp_a, comp_b])
+
+        # Without a fingerprint, A cannot have changed
+        assert changes == CompetitionChanges(new=[comp_b], changed=[])
+        connection = sqlite3.connect(path)
+        rows = connection.execute(
+            "SELECT competition_id, start_date, fingerprint FROM known_competitions"
+        ).fetchall()
+        connection.close()
+        today = date.today().isoformat()
+        assert sorted(rows) == [
+            ("A", today, competition_fingerprint(comp_a)),
+            ("B", today, competition_fingerprint(comp_b)),
+        ]
+
+    def test_bloom_filter(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.db"
+        with SQLiteKnownCompetitions(path, "alice") as alice:
+            alice.filter_competitions(self.comps_with_ids("A", "B"))
+
+        with SQLiteKnownCompetitions(path, "alice", bloom_filter=True) as alice:
+            # Recorded by another notifier after the filter was built
+            with SQLiteKnownCompetitions(path, "alice") as other:
+                other.filter_competitions(self.comps_with_ids("C"))
+            filtered_comps = alice.filter_competitions(
+                self.comps_with_ids("A", "C", "D")
+            )
+            again = alice.filter_competitions(self.comps_with_ids("A", "D"))
+
+        assert [c.id for c in filtered_comps] == ["D"]
+        assert again == []
+
+    def test_bloom_filter_changed_comps(self, tmp_path: Path) -> None:
+        path = tmp_path / "known.db"
+        with SQLiteKnownCompetitions(path) as known_competitions:
+            known_competitions.filter_competitions(self.comps_with_ids("A"))
+        (moved_a,) = self.comps_with_ids("A")
+        moved_a.start_date += timedelta(days=1)
+
+        with SQLiteKnownCompetitions(path, bloom_filter=True) as known_competitions:
+            changes = known_competitions.classify_competitions([moved_a])
+
+        assert changes == CompetitionChanges(new=[], changed=[moved_a])
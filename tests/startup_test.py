@@ -0,0 +1,87 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Modules that must only be imported when they are used. See "Startup time" in
+# README.md.
+HEAVY_MODULES = ["requests", "urllib3", "jinja2", "smtplib", "asyncio", "aiohttp"]
+
+# Modules that only some commands and options use
+OPTIONAL_MODULES = [
+    "sqlite3",
+    "tomllib",
+    "uuid",
+    "mmap",
+    "cube_comp.email_spool",
+    "cube_comp.geo_index",
+    "cube_comp.output_writers",
+    "cube_comp.search_index",
+    "cube_comp.snapshot_competition_api",
+    "cube_comp.sqlite_known_competitions",
+    "cube_comp.subscriptions",
+]
+
+# Import budget for command_line, in microseconds. Wall clock times depend on
+# the machine, so the budget is only checked when this variable is set.
+STARTUP_BUDGET_VARIABLE = "CUBE_COMP_CHECK_STARTUP_BUDGET"
+STARTUP_BUDGET_US = 100_000
+
+HELP_SCRIPT = """
+import sys
+from cube_comp.command_line import main
+sys.argv = ["cube-comp", "--help"]
+main()
+"""
+
+
+def import_times(script: str) -> dict[str, int]:
+    "Returns the cumulative import time of each module imported by `script`"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        capture_output=True,
+        text=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line.split("|")
+        if not fields[1].strip().isdigit():
+            # The header line
+            continue
+        times[fields[2].strip()] = int(fields[1])
+    return times
+
+
+class TestStartup:
+    def test_help_does_not_import_heavy_modules(self) -> None:
+        times = import_times(HELP_SCRIPT)
+
+        assert "cube_comp.command_line" in times
+        assert [module for module in HEAVY_MODULES if module in times] == []
+
+    def test_package_import_does_not_import_heavy_modules(self) -> None:
+        times = import_times("import cube_comp")
+
+        assert [module for module in HEAVY_MODULES if module in times] == []
+
+    def test_command_line_import_does_not_import_optional_modules(self) -> None:
+        times = import_times("import cube_comp.command_line")
+
+        assert "cube_comp.command_line" in times
+        assert [module for module in OPTIONAL_MODULES if module in times] == []
+
+    @pytest.mark.skipif(
+        STARTUP_BUDGET_VARIABLE not in os.environ,
+        reason=f"Set {STARTUP_BUDGET_VARIABLE} to check the startup budget",
+    )
+    def test_command_line_import_within_budget(self) -> None:
+        # Best of a few runs, to ignore a busy machine
+        best = min(
+            import_times("import cube_comp.command_line")["cube_comp.command_line"]
+            for _ in range(3)
+        )
+
+        assert best < STARTUP_BUDGET_US
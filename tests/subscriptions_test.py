@@ -0,0 +1,92 @@
+from pathlib import Path
+
+import pytest
+
+from cube_comp import Subscription, load_subscriptions
+from cube_comp.command_error import CommandError
+
+
+class TestLoadSubscriptions:
+    def test_load_toml(self, tmp_path: Path) -> None:
+        path = tmp_path / "subscriptions.toml"
+        path.write_text(
+            """
+            [[subscriptions]]
+            name = "alice"
+            query = "illinois"
+            country = "US"
+            known = "sqlite:known.db"
+            email_to = "alice@example.com"
+
+            [[subscriptions]]
+            name = "bob"
+            country = "CA"
+            """
+        )
+
+        subscriptions = load_subscriptions(path)
+
+        assert subscriptions == [
+            Subscription(
+                name="alice",
+                query="illinois",
+                country="US",
+                known="sqlite:known.db",
+                email_to="alice@example.com",
+            ),
+            Subscription(name="bob", country="CA"),
+        ]
+        assert subscriptions[0].fetch_key == ("illinois", "US")
+
+    def test_load_json(self, tmp_path: Path) -> None:
+        path = tmp_path / "subscriptions.json"
+        path.write_text('{"subscriptions": [{"name": "alice", "country": "US"}]}')
+
+        subscriptions = load_subscriptions(path)
+
+        assert subscriptions == [Subscription(name="alice", country="US")]
+
+    def test_unknown_key(self, tmp_path: Path) -> None:
+        path = tmp_path / "subscriptions.json"
+        path.write_text('{"subscriptions": [{"name": "alice", "contry": "US"}]}')
+
+        with pytest.raises(CommandError, match="contry"):
+            load_subscriptions(path)
+
+    def test_missing_name(self, tmp_path: Path) -> None:
+        path = tmp_path / "subscriptions.json"
+        path.write_text('{"subscriptions": [{"country": "US"}]}')
+
+        with pytest.raises(CommandError, match="without a name"):
+            load_subscriptions(path)
+
+    def test_load_near(self, tmp_path: Path) -> None:
+        path = tmp_path / "subscriptions.toml"
+        path.write_text(
+            """
+            [[subscriptions]]
+            name = "alice"
+            near = [41.88, -87.63]
+            radius_km = 150
+            """
+        )
+
+        subscriptions = load_subscriptions(path)
+
+        assert subscriptions == [
+            Subscription(name="alice", near=[41.88, -87.63], radius_km=150)
+        ]
+
+    def test_invalid_near(self, tmp_path: Path) -> None:
+        path = tmp_path / "subscriptions.json"
+        path.write_text('{"subscriptions": [{"name": "alice", "near": [95, 0]}]}')
+
+        with pytest.raises(CommandError, match="invalid near"):
+            load_subscriptions(path)
+
+    def test_invalid_radius(self, tmp_path: Path) -> None:
+        path = tmp_path / "subscriptions.json"
+        path.write_text('{"subscriptions": [{"name": "alice", "radius_km": -1}]}')
+
+        with pytest.raises(CommandError, match="invalid radius_km"):
+            load_subscriptions(path)